@@ -0,0 +1,343 @@
+"""
+Servidor falso da Bot API do Telegram, para testes de carga sem rede
+
+Responde como https://api.telegram.org/bot<token>/<método> aos métodos que
+o RoteiroBot usa (getMe, getUpdates, setWebhook, deleteWebhook,
+sendMessage, editMessageText, answerCallbackQuery...). O bot é apontado
+para ele com TELEGRAM_API_URL.
+
+Os updates criados por enviar_texto() e clicar() são entregues pelo
+getUpdates (modo polling) ou por POST no webhook registrado (modo webhook).
+Cada mensagem enviada ou editada pelo bot vai para a fila do chat, lida
+por proxima_resposta(). Uma fração das chamadas de envio pode receber 429
+(taxa_429), para exercitar o RetryAfter do bot.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from webhook_server import WebhookServer
+
+logger = logging.getLogger(__name__)
+
+# Usuário do bot devolvido pelo getMe
+BOT_FALSO = {'id': 1, 'is_bot': True, 'first_name': 'RoteiroBot', 'username': 'roteiro_falso_bot'}
+
+# Métodos cuja resposta vai para a fila do chat (mensagens que o motorista vê)
+METODOS_RESPOSTA = {'sendmessage', 'editmessagetext', 'editmessagereplymarkup', 'senddocument'}
+
+# Conexões simultâneas usadas para entregar updates no webhook
+CONEXOES_WEBHOOK = 16
+
+# Campo chat_id em um corpo multipart (sendDocument)
+_CHAT_ID_MULTIPART = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+class ApiTelegramFalsa(WebhookServer):
+    """Bot API falsa sobre o servidor HTTP mínimo do webhook_server"""
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 8081, taxa_429: float = 0.0, semente: int = 0):
+        super().__init__(None, None, host=host, port=port)
+        self.taxa_429 = taxa_429
+        self.aleatorio = random.Random(semente)
+        self.proximo_update = 1
+        self.pendentes: Deque[dict] = deque()
+        self.novos_updates = asyncio.Condition()
+        self.webhook_url = ''
+        self.webhook_secret = ''
+        self.entregas: Optional[asyncio.Queue] = None
+        self.entregadores: List[asyncio.Task] = []
+        self.polling_ativo = asyncio.Event()
+        self.webhook_ativo = asyncio.Event()
+        self.mensagens: Dict[int, int] = {}
+        self.respostas: Dict[int, asyncio.Queue] = {}
+        self.callbacks: Dict[str, int] = {}
+        self.chamadas: Counter = Counter()
+        self.erros_429 = 0
+        self.erros_entrega = 0
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Bot API falsa ouvindo em http://{self.host}:{self.port}")
+    
+    async def stop(self):
+        for tarefa in self.entregadores:
+            tarefa.cancel()
+        self.entregadores = []
+        await super().stop()
+    
+    # Updates do lado do "Telegram"
+    
+    def enviar_texto(self, chat_id: int, texto: str) -> dict:
+        """Cria e entrega o update de uma mensagem de texto (ou comando) do usuário"""
+        mensagem = {
+            'message_id': self._novo_message_id(chat_id),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f'Motorista {chat_id}'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'Motorista {chat_id}'},
+            'text': texto,
+        }
+        if texto.startswith('/'):
+            mensagem['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(texto.split()[0])}]
+        return self._entregar({'message': mensagem})
+    
+    def clicar(self, chat_id: int, mensagem: dict, callback_data: str) -> dict:
+        """Cria e entrega o update do clique em um botão de uma mensagem do bot"""
+        query_id = f'{chat_id}-{self.proximo_update}'
+        self.callbacks[query_id] = chat_id
+        return self._entregar({'callback_query': {
+            'id': query_id,
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'Motorista {chat_id}'},
+            'chat_instance': str(chat_id),
+            'message': mensagem,
+            'data': callback_data,
+        }})
+    
+    def _entregar(self, conteudo: dict) -> dict:
+        update = dict(conteudo, update_id=self.proximo_update)
+        self.proximo_update += 1
+        if self.webhook_url:
+            self.entregas.put_nowait(update)
+        else:
+            self.pendentes.append(update)
+            asyncio.get_running_loop().create_task(self._avisar_polling())
+        return update
+    
+    async def _avisar_polling(self):
+        async with self.novos_updates:
+            self.novos_updates.notify_all()
+    
+    async def proxima_resposta(self, chat_id: int, timeout: float) -> Tuple[str, dict]:
+        """
+        Espera a próxima mensagem enviada ou editada pelo bot no chat
+        
+        Returns:
+            Tupla (método, mensagem)
+        
+        Raises:
+            asyncio.TimeoutError: Se o bot não responder a tempo
+        """
+        return await asyncio.wait_for(self._fila(chat_id).get(), timeout)
+    
+    def descartar_respostas(self, chat_id: int):
+        """Descarta respostas atrasadas do chat (depois de um timeout)"""
+        fila = self._fila(chat_id)
+        while not fila.empty():
+            fila.get_nowait()
+    
+    def _fila(self, chat_id: int) -> asyncio.Queue:
+        fila = self.respostas.get(chat_id)
+        if fila is None:
+            fila = self.respostas[chat_id] = asyncio.Queue()
+        return fila
+    
+    def _novo_message_id(self, chat_id: int) -> int:
+        self.mensagens[chat_id] = self.mensagens.get(chat_id, 0) + 1
+        return self.mensagens[chat_id]
+    
+    # Bot API
+    
+    async def _route(self, method: str, path: str, headers: Dict[str, str], body: Optional[bytes]):
+        """Atende /bot<token>/<método>"""
+        partes = path.strip('/').split('/')
+        if len(partes) != 2 or not partes[0].startswith('bot'):
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+        
+        metodo = partes[1].lower()
+        self.chamadas[partes[1]] += 1
+        parametros = self._parametros(headers.get('content-type', ''), body or b'')
+        
+        if metodo in METODOS_RESPOSTA and self.taxa_429 and self.aleatorio.random() < self.taxa_429:
+            self.erros_429 += 1
+            return 429, {
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            }
+        
+        tratar = getattr(self, f'_api_{metodo}', None)
+        resultado = await tratar(parametros) if tratar else True
+        return 200, {'ok': True, 'result': resultado}
+    
+    def _parametros(self, content_type: str, body: bytes) -> dict:
+        """Lê os parâmetros (form-urlencoded, JSON ou multipart) de uma chamada"""
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        if content_type.startswith('multipart/form-data'):
+            encontrado = _CHAT_ID_MULTIPART.search(body)
+            return {'chat_id': encontrado.group(1).decode()} if encontrado else {}
+        
+        parametros = {}
+        for nome, valor in parse_qsl(body.decode('utf-8'), keep_blank_values=True):
+            # Valores complexos (reply_markup, allowed_updates...) chegam em JSON
+            if valor[:1] in ('{', '['):
+                valor = json.loads(valor)
+            parametros[nome] = valor
+        return parametros
+    
+    async def _api_getme(self, p: dict):
+        return BOT_FALSO
+    
+    async def _api_getupdates(self, p: dict):
+        offset = int(p.get('offset', 0) or 0)
+        limite = int(p.get('limit', 100) or 100)
+        timeout = float(p.get('timeout', 0) or 0)
+        
+        if offset < 0:
+            # Como no Telegram: só os últimos -offset updates continuam na fila
+            while len(self.pendentes) > -offset:
+                self.pendentes.popleft()
+        else:
+            while self.pendentes and self.pendentes[0]['update_id'] < offset:
+                self.pendentes.popleft()
+        
+        if timeout > 0:
+            self.polling_ativo.set()
+            async with self.novos_updates:
+                try:
+                    await asyncio.wait_for(self.novos_updates.wait_for(lambda: self.pendentes), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        
+        return [self.pendentes[i] for i in range(min(limite, len(self.pendentes)))]
+    
+    async def _api_setwebhook(self, p: dict):
+        self.webhook_url = p.get('url', '')
+        self.webhook_secret = p.get('secret_token', '')
+        if self.webhook_url and not self.entregadores:
+            self.entregas = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+            self.entregadores = [loop.create_task(self._entregador()) for _ in range(CONEXOES_WEBHOOK)]
+        self.webhook_ativo.set()
+        return True
+    
+    async def _api_deletewebhook(self, p: dict):
+        self.webhook_url = ''
+        if str(p.get('drop_pending_updates', '')).lower() == 'true':
+            self.pendentes.clear()
+        return True
+    
+    async def _api_getwebhookinfo(self, p: dict):
+        return {'url': self.webhook_url, 'has_custom_certificate': False, 'pending_update_count': len(self.pendentes)}
+    
+    async def _api_sendmessage(self, p: dict):
+        chat_id = int(p['chat_id'])
+        mensagem = {
+            'message_id': self._novo_message_id(chat_id),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_FALSO,
+            'text': p.get('text', ''),
+        }
+        if p.get('reply_markup'):
+            mensagem['reply_markup'] = p['reply_markup']
+        self._fila(chat_id).put_nowait(('sendMessage', mensagem))
+        return mensagem
+    
+    async def _api_senddocument(self, p: dict):
+        chat_id = int(p.get('chat_id', 0))
+        mensagem = {
+            'message_id': self._novo_message_id(chat_id),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_FALSO,
+            'document': {'file_id': 'arquivo', 'file_unique_id': 'arquivo'},
+        }
+        self._fila(chat_id).put_nowait(('sendDocument', mensagem))
+        return mensagem
+    
+    async def _api_editmessagetext(self, p: dict):
+        chat_id = int(p['chat_id'])
+        mensagem = {
+            'message_id': int(p['message_id']),
+            'date': int(time.time()),
+            'edit_date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_FALSO,
+            'text': p.get('text', ''),
+        }
+        if p.get('reply_markup'):
+            mensagem['reply_markup'] = p['reply_markup']
+        self._fila(chat_id).put_nowait(('editMessageText', mensagem))
+        return mensagem
+    
+    async def _api_editmessagereplymarkup(self, p: dict):
+        chat_id = int(p['chat_id'])
+        mensagem = {
+            'message_id': int(p['message_id']),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_FALSO,
+            'text': '',
+            'reply_markup': p.get('reply_markup') or {'inline_keyboard': []},
+        }
+        self._fila(chat_id).put_nowait(('editMessageReplyMarkup', mensagem))
+        return mensagem
+    
+    async def _api_answercallbackquery(self, p: dict):
+        self.callbacks.pop(p.get('callback_query_id'), None)
+        return True
+    
+    # Entrega por webhook
+    
+    async def _entregador(self):
+        """Entrega os updates no webhook do bot por uma conexão keep-alive"""
+        url = urlsplit(self.webhook_url)
+        conexao = None
+        while True:
+            update = await self.entregas.get()
+            for tentativa in range(2):
+                try:
+                    if conexao is None:
+                        conexao = await asyncio.open_connection(url.hostname, url.port or 80)
+                    await self._post_webhook(conexao, url.path or '/', update)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError, OSError, ValueError) as e:
+                    if conexao is not None:
+                        conexao[1].close()
+                        conexao = None
+                    if tentativa == 1:
+                        self.erros_entrega += 1
+                        logger.warning(f"Falha ao entregar o update {update['update_id']}: {e}")
+    
+    async def _post_webhook(self, conexao, caminho: str, update: dict):
+        reader, writer = conexao
+        corpo = json.dumps(update).encode('utf-8')
+        cabecalho = (
+            f"POST {caminho} HTTP/1.1\r\n"
+            f"Host: bot\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+        )
+        if self.webhook_secret:
+            cabecalho += f"X-Telegram-Bot-Api-Secret-Token: {self.webhook_secret}\r\n"
+        writer.write((cabecalho + "\r\n").encode('latin-1') + corpo)
+        await writer.drain()
+        
+        status = (await reader.readline()).split(b' ', 2)
+        tamanho = 0
+        while True:
+            linha = await reader.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            if nome.strip().lower() == 'content-length':
+                tamanho = int(valor.strip())
+        await reader.readexactly(tamanho)
+        
+        if len(status) < 2 or status[1] != b'200':
+            raise ValueError(f"webhook respondeu {b' '.join(status).strip().decode('latin-1')}")
+    
+    def estatisticas(self) -> Dict:
+        """Chamadas recebidas por método e erros injetados/de entrega"""
+        return {
+            'chamadas': dict(self.chamadas.most_common()),
+            'erros_429': self.erros_429,
+            'erros_entrega_webhook': self.erros_entrega,
+        }
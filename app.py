@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+RoteiroBot - Ponto de entrada único
+Fábrica da Application e linha de comando com perfis de execução
+
+Uso:
+    python app.py                      # perfil local (ou BOT_PROFILE)
+    python app.py --perfil render
+    python app.py --perfil webhook
+    python app.py --medir-inicializacao
+
+Os imports pesados (python-telegram-bot, handlers, servidor webhook) só
+são feitos quando o modo escolhido precisa deles, e cada fase da
+inicialização é medida.
+"""
+
+import time
+
+_INICIO_PROCESSO = time.perf_counter()
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import signal
+import sys
+from typing import Dict, Optional
+
+from config import (
+    TELEGRAM_BOT_TOKEN, BOT_MODE, BOT_PROFILE, WEBHOOK_URL, WEBHOOK_PATH,
+    WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, METRICAS_PORTA, TELEGRAM_API_URL, ROTA_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Perfis de execução: modo de recebimento de updates e política de reinício
+PERFIS = {
+    'local': {'modo': 'polling', 'max_restarts': 5, 'espera_base': 10, 'espera_max': 60},
+    'render': {'modo': 'polling', 'max_restarts': 3, 'espera_base': 5, 'espera_max': 30},
+    'railway': {'modo': 'polling', 'max_restarts': 5, 'espera_base': 5, 'espera_max': 30},
+    'webhook': {'modo': 'webhook', 'max_restarts': 3, 'espera_base': 5, 'espera_max': 30},
+}
+
+# Duração (segundos) de cada fase da inicialização
+tempos_inicializacao: Dict[str, float] = {}
+
+def _marcar_tempo(fase: str, inicio: float) -> float:
+    """Registra a duração de uma fase da inicialização e devolve o instante atual"""
+    agora = time.perf_counter()
+    tempos_inicializacao[fase] = agora - inicio
+    return agora
+
+def criar_application(token: str = None):
+    """
+    Cria a Application do bot com todos os handlers registrados
+    
+    Este é o único lugar onde os handlers são registrados; todos os
+    pontos de entrada usam esta função.
+    
+    Args:
+        token: Token do bot (padrão: TELEGRAM_BOT_TOKEN)
+        
+    Returns:
+        Application configurada
+    """
+    from telegram import Update
+    from telegram.ext import (
+        Application, CallbackQueryHandler, CommandHandler, ConversationHandler,
+        MessageHandler, TypeHandler, filters
+    )
+    from handlers import (
+        start, help_command, rota_start, rota_data, rota_nome, rota_carro,
+        rota_data_callback, rota_calendario_callback, rota_nome_callback,
+        rota_carro_callback, rota_nada_callback, rota_cancelar_callback,
+        rota_expirada_callback, rota_timeout, rota_cancel, r_command, lote_command, espelho_command, hoje_command, todas_command,
+        todas_pagina_callback, exportar_command, deletar_command, DATA, ROTA, CARRO
+    )
+    
+    from persistencia import PersistenciaSQLite
+    from processamento import ProcessadorUpdates, FilaUpdates, ATUALIZACOES_SIMULTANEAS
+    from envio import LimitadorEnvio
+    import metricas
+    
+    # Estado das conversas e user_data sobrevivem aos reinícios (ver persistencia.py)
+    builder = Application.builder().token(token or TELEGRAM_BOT_TOKEN).persistence(PersistenciaSQLite())
+    
+    # Bot API em outro endereço (servidor próprio ou o falso do teste de carga)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_URL}/bot").base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+    
+    # Vários updates ao mesmo tempo, em ordem dentro de cada chat (ver processamento.py)
+    if ATUALIZACOES_SIMULTANEAS > 1:
+        builder = builder.concurrent_updates(ProcessadorUpdates())
+    # Entrada limitada: com FILA_UPDATES_MAX updates pendentes o polling/webhook espera
+    builder = builder.update_queue(FilaUpdates())
+    
+    # Envios dentro dos limites do Telegram, com RetryAfter e junção de mensagens (ver envio.py)
+    builder = builder.rate_limiter(LimitadorEnvio())
+    
+    application = builder.build()
+    
+    # Um /rota abandonado expira; sem JobQueue só o /rota de novo o substitui.
+    # O builder só cria a JobQueue com o APScheduler instalado (ler
+    # application.job_queue sem ela emite um PTBUserWarning)
+    rota_timeout_s = None
+    if ROTA_TIMEOUT > 0:
+        if importlib.util.find_spec('apscheduler') is not None:
+            rota_timeout_s = ROTA_TIMEOUT
+        else:
+            logger.warning('ROTA_TIMEOUT ignorado: instale "python-telegram-bot[job-queue]"')
+    
+    # Handler para o comando /rota (conversa guiada por botões, editando uma única mensagem)
+    # /rota no meio de um registro recomeça do zero (allow_reentry), inclusive
+    # quando o estado veio de antes de um reinício (persistent)
+    rota_handler = ConversationHandler(
+        entry_points=[CommandHandler("rota", rota_start)],
+        name="rota",
+        persistent=True,
+        allow_reentry=True,
+        conversation_timeout=rota_timeout_s,
+        states={
+            DATA: [
+                CallbackQueryHandler(rota_data_callback, pattern=r"^rota:data:"),
+                CallbackQueryHandler(rota_calendario_callback, pattern=r"^rota:cal:"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, rota_data),
+            ],
+            ROTA: [
+                CallbackQueryHandler(rota_nome_callback, pattern=r"^rota:nome:"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, rota_nome),
+            ],
+            CARRO: [
+                CallbackQueryHandler(rota_carro_callback, pattern=r"^rota:carro:"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, rota_carro),
+            ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, rota_timeout)],
+        },
+        fallbacks=[
+            CommandHandler("cancel", rota_cancel),
+            CallbackQueryHandler(rota_cancelar_callback, pattern=r"^rota:cancelar$"),
+            CallbackQueryHandler(rota_nada_callback, pattern=r"^rota:nada$"),
+        ],
+    )
+    
+    # Adiciona os handlers
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(rota_handler)
+    application.add_handler(CallbackQueryHandler(rota_expirada_callback, pattern=r"^rota:"))
+    application.add_handler(CommandHandler("r", r_command))
+    application.add_handler(CommandHandler("lote", lote_command))
+    application.add_handler(CommandHandler("espelho", espelho_command))
+    application.add_handler(CommandHandler("hoje", hoje_command))
+    application.add_handler(CommandHandler("todas", todas_command))
+    application.add_handler(CallbackQueryHandler(todas_pagina_callback, pattern=r"^todas:"))
+    application.add_handler(CommandHandler("exportar", exportar_command))
+    application.add_handler(CommandHandler("deletar", deletar_command))
+    
+    # Duração e erros de cada handler e profundidade das filas (ver metricas.py)
+    metricas.instrumentar_handlers(application)
+    metricas.observar_filas(application)
+    
+    return application
+
+class RoteiroBot:
+    """Classe principal do RoteiroBot com tratamento robusto de erros"""
+    
+    def __init__(self, perfil: str = 'local'):
+        if perfil not in PERFIS:
+            raise ValueError(f"Perfil inválido: {perfil}")
+            
+        config = PERFIS[perfil]
+        self.perfil = perfil
+        self.modo = BOT_MODE or config['modo']
+        self.application = None
+        self.running = False
+        self.restart_count = 0
+        self.max_restarts = config['max_restarts']
+        self.espera_base = config['espera_base']
+        self.espera_max = config['espera_max']
+        self.stop_event: Optional[asyncio.Event] = None
+        
+    async def setup_application(self):
+        """Configura a aplicação do bot"""
+        inicio = time.perf_counter()
+        self.application = criar_application()
+        _marcar_tempo('application', inicio)
+        
+    async def cleanup_bot_state(self):
+        """Limpa o estado do bot antes do polling (webhook e fila de updates)"""
+        from limpar_updates import limpar_estado_bot
+        
+        try:
+            print("🧹 Limpando estado do bot...")
+            
+            duracao = await limpar_estado_bot(self.application.bot)
+            
+            print(f"✅ Estado do bot limpo com sucesso ({duracao * 1000:.0f} ms)")
+            
+        except Exception as e:
+            logger.warning(f"Erro durante limpeza: {e}")
+            
+    async def _run_polling(self):
+        """Recebe updates por polling até stop_event ser sinalizado"""
+        from telegram import Update
+        
+        await self.cleanup_bot_state()
+        
+        # Sem webhook, /healthz e /metrics só respondem se METRICAS_PORTA estiver definida
+        servidor = None
+        if METRICAS_PORTA:
+            from webhook_server import WebhookServer
+            servidor = WebhookServer(self.application, None, host=WEBHOOK_HOST, port=METRICAS_PORTA)
+            
+        async with self.application:
+            await self.application.start()
+            await self.application.updater.start_polling(
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+            if servidor:
+                await servidor.start()
+            self._registrar_pronto()
+            try:
+                await self.stop_event.wait()
+            finally:
+                if servidor:
+                    await servidor.stop()
+                await self.application.updater.stop()
+                await self.application.stop()
+                
+    async def _run_webhook(self):
+        """Recebe updates pelo servidor webhook até stop_event ser sinalizado"""
+        from webhook_server import run_webhook
+        
+        self._registrar_pronto()
+        await run_webhook(
+            self.application, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+            WEBHOOK_HOST, WEBHOOK_PORT, stop_event=self.stop_event
+        )
+        
+    def _registrar_pronto(self):
+        """Registra o tempo total até o bot ficar pronto (só na primeira vez)"""
+        if 'pronto' not in tempos_inicializacao:
+            _marcar_tempo('pronto', _INICIO_PROCESSO)
+            logger.info(
+                "Tempos de inicialização (ms): " +
+                ", ".join(f"{fase}={duracao * 1000:.0f}" for fase, duracao in tempos_inicializacao.items())
+            )
+            
+    async def start_bot(self):
+        """Inicia o bot com tratamento robusto de erros"""
+        from telegram.error import Conflict, NetworkError, TimedOut
+        
+        self.running = True
+        self.stop_event = self.stop_event or asyncio.Event()
+        
+        while self.running and self.restart_count < self.max_restarts:
+            try:
+                logger.info(f"Iniciando RoteiroBot (perfil {self.perfil}, modo {self.modo})...")
+                print("🚛 RoteiroBot iniciado com sucesso!")
+                print("📱 Bot está online e pronto para receber comandos")
+                print("🛑 Pressione Ctrl+C para parar o bot")
+                
+                if self.modo == "webhook":
+                    await self._run_webhook()
+                else:
+                    await self._run_polling()
+                break
+                
+            except Conflict as e:
+                logger.error(f"Conflito detectado: {e}")
+                print("⚠️ Conflito detectado: Múltiplas instâncias do bot detectadas")
+                await self._aguardar_reinicio(self.espera_base * 2, 'conflito')
+                
+            except (NetworkError, TimedOut) as e:
+                logger.error(f"Erro de rede: {e}")
+                print(f"🌐 Erro de rede: {e}")
+                print("🔄 Tentando reconectar...")
+                await self._aguardar_reinicio(self.espera_base * 2, 'rede')
+                
+            except Exception as e:
+                logger.error(f"Erro inesperado: {e}")
+                print(f"❌ Erro inesperado: {e}")
+                await self._aguardar_reinicio(self.espera_base, 'erro')
+                
+        if self.restart_count >= self.max_restarts:
+            print("❌ Máximo de tentativas de reinicialização atingido")
+            print("💡 Execute 'python fix_conflict.py' para limpeza manual")
+            
+    async def _aguardar_reinicio(self, espera_base: int, motivo: str):
+        """Conta uma reinicialização e aguarda o backoff (interrompível pelo stop)"""
+        from metricas import REINICIOS
+        
+        self.restart_count += 1
+        REINICIOS.inc(motivo=motivo)
+        if self.restart_count >= self.max_restarts:
+            return
+            
+        wait_time = min(espera_base * self.restart_count, self.espera_max)
+        print(f"⏳ Aguardando {wait_time} segundos antes de tentar novamente...")
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=wait_time)
+            self.running = False
+        except asyncio.TimeoutError:
+            pass
+            
+    def stop(self):
+        """Pede a parada do bot (seguro para chamar de handlers de sinal)"""
+        self.running = False
+        if self.stop_event:
+            self.stop_event.set()
+
+async def executar(perfil: str = None):
+    """
+    Inicializa o banco e executa o bot no perfil indicado
+    
+    Args:
+        perfil: Nome do perfil (padrão: BOT_PROFILE)
+    """
+    perfil = perfil or BOT_PROFILE
+    
+    # Verifica se o token foi configurado
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("Token do Telegram não configurado!")
+        print("❌ ERRO: Token do Telegram não encontrado!")
+        print("📝 Crie um arquivo .env com: TELEGRAM_BOT_TOKEN=seu_token_aqui")
+        print("🔗 Obtenha seu token em: https://t.me/BotFather")
+        return
+        
+    from db import init_database, close_connections
+    from pdf_espelho import fila_pdf
+    import db_async
+    
+    # Inicializa o banco de dados
+    inicio = time.perf_counter()
+    try:
+        init_database()
+        db_async.configurar()
+        logger.info("Banco de dados inicializado com sucesso")
+    except Exception as e:
+        logger.error(f"Erro ao inicializar banco de dados: {e}")
+        print(f"❌ Erro ao inicializar banco de dados: {e}")
+        return
+    _marcar_tempo('banco', inicio)
+    
+    bot = RoteiroBot(perfil)
+    bot.stop_event = asyncio.Event()
+    _instalar_sinais(bot)
+    
+    try:
+        await bot.setup_application()
+        await bot.start_bot()
+    finally:
+        fila_pdf.shutdown()
+        db_async.shutdown()
+        close_connections()
+
+def _instalar_sinais(bot: RoteiroBot):
+    """Faz SIGINT/SIGTERM pararem o bot de forma limpa"""
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sinal, bot.stop)
+        except (NotImplementedError, RuntimeError):
+            # Windows: sem add_signal_handler, o Ctrl+C encerra o processo
+            pass
+
+def medir_inicializacao() -> Dict[str, float]:
+    """
+    Mede as fases da inicialização sem conectar ao Telegram
+    
+    Returns:
+        Dicionário fase -> milissegundos
+    """
+    import shutil
+    import tempfile
+    import db
+    
+    inicio = time.perf_counter()
+    pasta = tempfile.mkdtemp()
+    db.DATABASE_FILE = os.path.join(pasta, 'rotas.db')
+    db.init_database()
+    inicio = _marcar_tempo('banco', inicio)
+    
+    criar_application(TELEGRAM_BOT_TOKEN or '123456:TESTE')
+    _marcar_tempo('application', inicio)
+    _marcar_tempo('total', _INICIO_PROCESSO)
+    
+    db.close_connections()
+    shutil.rmtree(pasta, ignore_errors=True)
+    return {fase: round(duracao * 1000, 2) for fase, duracao in tempos_inicializacao.items()}
+
+def main(argv=None):
+    """Linha de comando do RoteiroBot"""
+    parser = argparse.ArgumentParser(description="RoteiroBot - Bot do Telegram para controle de rotas")
+    parser.add_argument('--perfil', choices=sorted(PERFIS), default=BOT_PROFILE,
+                        help="perfil de execução (padrão: BOT_PROFILE ou local)")
+    parser.add_argument('--medir-inicializacao', action='store_true',
+                        help="mede o tempo de inicialização em JSON e sai, sem conectar ao Telegram")
+    args = parser.parse_args(argv)
+    
+    # Configuração de logging
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    if args.medir_inicializacao:
+        print(json.dumps(medir_inicializacao(), indent=2))
+        return
+        
+    try:
+        asyncio.run(executar(args.perfil))
+    except KeyboardInterrupt:
+        print("\n🛑 Bot interrompido pelo usuário")
+        sys.exit(0)
+
+_marcar_tempo('imports', _INICIO_PROCESSO)
+
+if __name__ == '__main__':
+    main()
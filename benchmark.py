@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Benchmark reprodutível do banco (db.py) e da montagem dos relatórios
+
+Gera históricos sintéticos de rotas (de 1 mil a 10 milhões de linhas,
+divididas entre vários tenants) em um banco temporário e mede:
+
+- inserção em lote (upsert_rotas_lote) e rota a rota (insert_rota)
+- consultas por período (get_rotas_por_periodo, get_espelho), resumos e
+  totais (get_espelho_resumo, get_total_periodo), /todas (get_todas_rotas,
+  get_rotas_pagina)
+- montagem do texto das mensagens (_formatar_espelho,
+  _formatar_espelho_resumo, _formatar_pagina_todas)
+
+O resultado (p50/p99 em ms e linhas/s) sai em JSON. Com uma baseline
+gravada, cada medida é comparada com ela e o script termina com código 1
+se alguma piorou além da tolerância, para barrar o deploy.
+
+Uso:
+    python benchmark.py                               # 1k, 10k e 100k linhas
+    python benchmark.py --linhas 1000 10000000 --tenants 500
+    python benchmark.py --salvar-baseline             # grava a baseline
+    python benchmark.py --tolerancia 0.3 --saida resultado.json
+
+Os dados dependem só de --semente, --tenants e --linhas; o banco é criado
+do zero a cada tamanho e apagado no fim.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import db
+
+# Tamanhos padrão (linhas no banco)
+LINHAS_PADRAO = [1000, 10000, 100000]
+
+# Arquivo padrão da baseline
+BASELINE_PADRAO = 'benchmark_baseline.json'
+
+# Piora aceita em relação à baseline (0.25 = até 25% mais lento)
+TOLERANCIA_PADRAO = 0.25
+
+# Rotas por dia de cada tenant e último dia do histórico sintético
+ROTAS_POR_DIA = 4
+ULTIMO_DIA = date(2025, 12, 31)
+
+# Linhas por chamada de upsert_rotas_lote na carga
+LOTE_CARGA = 5000
+
+# Medidas comparadas com a baseline pela vazão (linhas_por_s); as demais, pelo p50
+MEDIDAS_VAZAO = {'insercao_lote'}
+
+# Diferença de p50 (ms) abaixo da qual uma piora é tratada como ruído
+RUIDO_MS = 0.05
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por posição mais próxima (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    posicao = math.ceil(p / 100 * len(valores))
+    return valores[min(len(valores), max(1, posicao)) - 1]
+
+def _resumir(tempos: List[float], linhas: int) -> Dict:
+    """Resume tempos (s) de execuções que processaram linhas no total"""
+    tempos = sorted(tempos)
+    total = sum(tempos)
+    return {
+        'amostras': len(tempos),
+        'p50_ms': round(percentil(tempos, 50) * 1000, 3),
+        'p99_ms': round(percentil(tempos, 99) * 1000, 3),
+        'media_ms': round(total / len(tempos) * 1000, 3) if tempos else 0.0,
+        'linhas_por_s': round(linhas / total, 1) if total else 0.0,
+    }
+
+def medir(funcao: Callable[[], int], amostras: int) -> Dict:
+    """
+    Executa funcao várias vezes e resume os tempos
+    
+    Args:
+        funcao: Função sem argumentos que retorna quantas linhas processou
+        amostras: Número de execuções
+    
+    Returns:
+        Dicionário com amostras, p50_ms, p99_ms, media_ms e linhas_por_s
+    """
+    tempos = []
+    linhas = 0
+    for _ in range(amostras):
+        inicio = time.perf_counter()
+        linhas += funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _resumir(tempos, linhas)
+
+class HistoricoSintetico:
+    """
+    Histórico de rotas determinístico dividido entre tenants
+    
+    Cada tenant tem ROTAS_POR_DIA rotas por dia, com nomes distintos no dia,
+    em dias consecutivos terminando em ULTIMO_DIA.
+    """
+    
+    def __init__(self, linhas: int, tenants: int, semente: int):
+        self.linhas = linhas
+        self.tenants = min(tenants, linhas)
+        self.semente = semente
+        self.por_tenant = [linhas // self.tenants + (1 if t < linhas % self.tenants else 0)
+                           for t in range(self.tenants)]
+        dias = -(-max(self.por_tenant) // ROTAS_POR_DIA)
+        self.primeiro_dia = ULTIMO_DIA - timedelta(days=dias - 1)
+    
+    def tenant_id(self, indice: int) -> int:
+        """Id (sintético) do tenant de índice indice"""
+        return 1000 + indice
+    
+    def rotas(self, indice: int) -> Iterator[Tuple[str, str, str, bool]]:
+        """Gera as rotas (data, rota, carro, ilha) de um tenant"""
+        aleatorio = random.Random(self.semente * 1000003 + indice)
+        dia = self.primeiro_dia
+        for n in range(self.por_tenant[indice]):
+            if n and n % ROTAS_POR_DIA == 0:
+                dia += timedelta(days=1)
+            periodo = 'AM' if n % 2 == 0 else 'PM'
+            rota = f"{'PGE'[aleatorio.randrange(3)]}{(n % ROTAS_POR_DIA) * 10 + aleatorio.randrange(10)}-{periodo}"
+            carro = 'Van' if aleatorio.random() < 0.6 else 'Fiorino'
+            yield dia.strftime('%d/%m/%Y'), rota, carro, aleatorio.random() < 0.3
+    
+    def janela(self, aleatorio: random.Random, dias: int) -> Tuple[int, str, str]:
+        """Sorteia um tenant e um período de dias dentro do histórico dele"""
+        indice = aleatorio.randrange(self.tenants)
+        ultimo = self.primeiro_dia + timedelta(days=max(0, (self.por_tenant[indice] - 1) // ROTAS_POR_DIA))
+        total_dias = (ultimo - self.primeiro_dia).days + 1
+        inicio = self.primeiro_dia + timedelta(days=aleatorio.randrange(max(1, total_dias - dias + 1)))
+        fim = inicio + timedelta(days=dias - 1)
+        return self.tenant_id(indice), inicio.strftime('%d/%m/%Y'), fim.strftime('%d/%m/%Y')
+
+def _carregar(historico: HistoricoSintetico) -> Dict:
+    """Insere o histórico em lotes, medindo cada chamada de upsert_rotas_lote"""
+    tempos = []
+    linhas = 0
+    for indice in range(historico.tenants):
+        tenant = historico.tenant_id(indice)
+        lote = []
+        for rota in historico.rotas(indice):
+            lote.append(rota)
+            if len(lote) == LOTE_CARGA:
+                tempos.append(_inserir_lote(lote, tenant))
+                linhas += len(lote)
+                lote = []
+        if lote:
+            tempos.append(_inserir_lote(lote, tenant))
+            linhas += len(lote)
+    return _resumir(tempos, linhas)
+
+def _inserir_lote(lote: List[Tuple], tenant: int) -> float:
+    """Insere um lote e retorna a duração (s), conferindo que nada foi descartado"""
+    inicio = time.perf_counter()
+    resultado = db.upsert_rotas_lote(lote, tenant)
+    duracao = time.perf_counter() - inicio
+    if resultado['inseridas'] != len(lote):
+        raise RuntimeError(f"Carga inconsistente: {resultado} para {len(lote)} rotas")
+    return duracao
+
+def executar_tamanho(linhas: int, tenants: int, semente: int, amostras: int) -> Dict:
+    """
+    Cria um banco com o histórico sintético e executa todas as medidas
+    
+    Args:
+        linhas: Total de rotas no banco
+        tenants: Quantidade de tenants entre os quais as rotas são divididas
+        semente: Semente dos dados e dos sorteios
+        amostras: Execuções de cada consulta
+    
+    Returns:
+        Dicionário medida -> resumo (ver medir)
+    """
+    from handlers import (
+        _formatar_espelho, _formatar_espelho_resumo, _formatar_pagina_todas, TODAS_POR_PAGINA
+    )
+    
+    historico = HistoricoSintetico(linhas, tenants, semente)
+    aleatorio = random.Random(semente)
+    resultados = {}
+    
+    resultados['insercao_lote'] = _carregar(historico)
+    
+    # Rotas novas, uma transação por rota, como o /rota
+    novas = itertools.count()
+    def inserir_uma():
+        tenant, data_rota, _ = historico.janela(aleatorio, 1)
+        db.insert_rota(data_rota, f"B{next(novas)}-AM", 'Van', False, tenant)
+        return 1
+    resultados['insert_rota'] = medir(inserir_uma, amostras)
+    
+    def periodo(dias: int, funcao: Callable) -> Callable[[], int]:
+        def consultar():
+            tenant, inicio, fim = historico.janela(aleatorio, dias)
+            return funcao(inicio, fim, tenant)
+        return consultar
+    
+    resultados['rotas_periodo_7d'] = medir(
+        periodo(7, lambda i, f, t: len(db.get_rotas_por_periodo(i, f, t))), amostras
+    )
+    resultados['espelho_31d'] = medir(
+        periodo(31, lambda i, f, t: db.get_espelho(i, f, t)['quantidade']), amostras
+    )
+    resultados['espelho_resumo_365d'] = medir(
+        periodo(365, lambda i, f, t: db.get_espelho_resumo(i, f, t)['quantidade']), amostras
+    )
+    resultados['total_periodo_365d'] = medir(
+        periodo(365, lambda i, f, t: 1 if db.get_total_periodo(i, f, t) is not None else 0), amostras
+    )
+    resultados['todas_rotas'] = medir(
+        periodo(1, lambda i, f, t: len(db.get_todas_rotas(t))), max(1, amostras // 10)
+    )
+    resultados['rotas_pagina'] = medir(
+        periodo(1, lambda i, f, t: len(db.get_rotas_pagina(TODAS_POR_PAGINA, None, t)['rotas'])), amostras
+    )
+    
+    # Montagem das mensagens, sobre resultados já consultados
+    espelhos = [(db.get_espelho(inicio, fim, tenant), inicio, fim)
+                for tenant, inicio, fim in (historico.janela(aleatorio, 31) for _ in range(10))]
+    resumos = [(db.get_espelho_resumo(inicio, fim, tenant), inicio, fim)
+               for tenant, inicio, fim in (historico.janela(aleatorio, 365) for _ in range(10))]
+    paginas = [db.get_rotas_pagina(TODAS_POR_PAGINA, None, historico.tenant_id(i % historico.tenants))
+               for i in range(10)]
+    
+    def renderizar(itens: List, funcao: Callable[..., str], linhas: Callable) -> Callable[[], int]:
+        posicao = itertools.count()
+        def montar():
+            item = itens[next(posicao) % len(itens)]
+            funcao(*item)
+            return linhas(item)
+        return montar
+    
+    resultados['render_espelho'] = medir(
+        renderizar(espelhos, _formatar_espelho, lambda e: e[0]['quantidade']), amostras
+    )
+    resultados['render_espelho_resumo'] = medir(
+        renderizar(resumos, _formatar_espelho_resumo, lambda e: len(e[0]['meses']) + len(e[0]['carros'])),
+        amostras
+    )
+    resultados['render_todas'] = medir(
+        renderizar([(p, 1) for p in paginas], _formatar_pagina_todas, lambda e: len(e[0]['rotas'])),
+        amostras
+    )
+    
+    return resultados
+
+def comparar(atual: Dict, baseline: Dict, tolerancia: float) -> List[Dict]:
+    """
+    Compara os resultados com a baseline
+    
+    A carga em lote é comparada pela vazão (linhas_por_s); as demais
+    medidas, pelo p50, ignorando diferenças menores que RUIDO_MS. Tamanhos
+    ou medidas ausentes na baseline são ignorados.
+    
+    Returns:
+        Lista de comparações com 'tamanho', 'medida', 'baseline', 'atual',
+        'variacao' (fração; positiva = pior) e 'regressao'
+    """
+    comparacoes = []
+    for tamanho, medidas in atual['resultados'].items():
+        for medida, valores in medidas.items():
+            base = baseline.get('resultados', {}).get(tamanho, {}).get(medida)
+            if base is None:
+                continue
+            
+            campo = 'linhas_por_s' if medida in MEDIDAS_VAZAO else 'p50_ms'
+            if not base[campo] or not valores[campo]:
+                continue
+            if campo == 'linhas_por_s':
+                variacao = base[campo] / valores[campo] - 1
+                regressao = variacao > tolerancia
+            else:
+                variacao = valores[campo] / base[campo] - 1
+                regressao = variacao > tolerancia and valores[campo] - base[campo] > RUIDO_MS
+            
+            comparacoes.append({
+                'tamanho': tamanho,
+                'medida': medida,
+                'campo': campo,
+                'baseline': base[campo],
+                'atual': valores[campo],
+                'variacao': round(variacao, 3),
+                'regressao': regressao,
+            })
+    return comparacoes
+
+def main(argv=None):
+    """Linha de comando do benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark do banco e dos relatórios do RoteiroBot")
+    parser.add_argument('--linhas', type=int, nargs='+', default=LINHAS_PADRAO,
+                        help="tamanhos do histórico (padrão: 1000 10000 100000)")
+    parser.add_argument('--tenants', type=int, default=50, help="tenants entre os quais as rotas são divididas")
+    parser.add_argument('--amostras', type=int, default=200, help="execuções de cada consulta")
+    parser.add_argument('--semente', type=int, default=42, help="semente dos dados sintéticos")
+    parser.add_argument('--baseline', default=BASELINE_PADRAO, help="arquivo da baseline")
+    parser.add_argument('--salvar-baseline', action='store_true', help="grava o resultado como baseline")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="piora aceita em relação à baseline (padrão: 0.25)")
+    parser.add_argument('--saida', help="grava o JSON do resultado neste arquivo")
+    args = parser.parse_args(argv)
+    
+    resultado = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(),
+        },
+        'parametros': {
+            'tenants': args.tenants,
+            'amostras': args.amostras,
+            'semente': args.semente,
+            'rotas_por_dia': ROTAS_POR_DIA,
+        },
+        'resultados': {},
+    }
+    
+    arquivo_original = db.DATABASE_FILE
+    for linhas in args.linhas:
+        pasta = tempfile.mkdtemp(prefix='roteirobot-bench-')
+        db.DATABASE_FILE = os.path.join(pasta, 'rotas.db')
+        print(f"⏱️ {linhas} linhas, {args.tenants} tenants...", file=sys.stderr)
+        try:
+            db.init_database()
+            resultado['resultados'][str(linhas)] = executar_tamanho(
+                linhas, args.tenants, args.semente, args.amostras
+            )
+        finally:
+            db.close_connections()
+            shutil.rmtree(pasta, ignore_errors=True)
+    db.DATABASE_FILE = arquivo_original
+    
+    regressoes = []
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"💾 Baseline gravada em {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        resultado['comparacao'] = comparar(resultado, baseline, args.tolerancia)
+        regressoes = [c for c in resultado['comparacao'] if c['regressao']]
+        for c in regressoes:
+            print(
+                f"❌ {c['medida']} ({c['tamanho']} linhas): {c['campo']} "
+                f"{c['baseline']} -> {c['atual']} ({c['variacao']:+.0%})",
+                file=sys.stderr
+            )
+    
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    print(texto)
+    
+    if regressoes:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
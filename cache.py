@@ -0,0 +1,112 @@
+"""
+Cache em memória dos relatórios por período (/espelho e /hoje)
+
+Guarda o resultado agregado e o texto já renderizado, com política LRU e
+tempo de vida (TTL). insert_rota/delete_rota invalidam apenas as entradas
+do mesmo tenant cujo período contém o dia alterado. Quem usa o cache põe na
+chave a versão dos dados do tenant (db.versao_dados), mantida no banco, para
+que gravações de outros processos também deixem as entradas antigas de lado.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Configuração do cache (variáveis de ambiente)
+CACHE_MAX_ITENS = int(os.environ.get('CACHE_MAX_ITENS', 256))
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 300))
+
+class CacheRelatorios:
+    """
+    Cache LRU/TTL de relatórios por período
+    
+    As chaves são tuplas (data_inicial_iso, data_final_iso, tenant, *filtros). O
+    acesso é protegido por lock porque as invalidações vêm da thread
+    escritora do banco (db_async), enquanto as leituras vêm do event loop.
+    """
+    
+    def __init__(self, max_itens: int = CACHE_MAX_ITENS, ttl: float = CACHE_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.itens: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.versao = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+    
+    def get(self, chave: Tuple) -> Optional[Any]:
+        """Retorna o valor em cache ou None (conta hit/miss)"""
+        with self.lock:
+            item = self.itens.get(chave)
+            if item is None or time.monotonic() - item[0] > self.ttl:
+                if item is not None:
+                    del self.itens[chave]
+                self.misses += 1
+                return None
+            
+            self.itens.move_to_end(chave)
+            self.hits += 1
+            return item[1]
+    
+    def set(self, chave: Tuple, valor: Any, versao: int = None):
+        """
+        Guarda um valor no cache
+        
+        Args:
+            chave: (data_inicial_iso, data_final_iso, tenant, *filtros)
+            valor: Valor a guardar
+            versao: Valor de self.versao lido antes da consulta ao banco; se
+                houve alguma invalidação desde então o valor pode estar
+                desatualizado e não é guardado
+        """
+        with self.lock:
+            if versao is not None and versao != self.versao:
+                return
+            
+            self.itens[chave] = (time.monotonic(), valor)
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+    
+    def invalidar_dia(self, data_iso: str, tenant: int = None):
+        """Remove as entradas do tenant (ou de todos) cujo período contém o dia (AAAA-MM-DD)"""
+        with self.lock:
+            self.versao += 1
+            for chave in [c for c in self.itens
+                          if c[0] <= data_iso <= c[1] and (tenant is None or c[2] == tenant)]:
+                del self.itens[chave]
+                self.invalidacoes += 1
+    
+    def invalidar_periodo(self, inicio_iso: str, fim_iso: str, tenant: int = None):
+        """Remove as entradas do tenant (ou de todos) com algum dia em comum com o período"""
+        with self.lock:
+            self.versao += 1
+            for chave in [c for c in self.itens
+                          if c[0] <= fim_iso and inicio_iso <= c[1] and (tenant is None or c[2] == tenant)]:
+                del self.itens[chave]
+                self.invalidacoes += 1
+    
+    def limpar(self):
+        """Remove todas as entradas"""
+        with self.lock:
+            self.versao += 1
+            self.invalidacoes += len(self.itens)
+            self.itens.clear()
+    
+    def estatisticas(self) -> Dict:
+        """Retorna os contadores do cache"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'itens': len(self.itens),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidacoes': self.invalidacoes,
+                'taxa_acerto': round(self.hits / total, 3) if total else 0.0,
+            }
+
+# Instância usada pelos handlers e pelo módulo db
+relatorios = CacheRelatorios()
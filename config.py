@@ -27,4 +27,34 @@ if not TELEGRAM_BOT_TOKEN:
 if not TELEGRAM_BOT_TOKEN:
     print("⚠️  AVISO: Token do Telegram não encontrado!")
     print("Configure a variável de ambiente TELEGRAM_BOT_TOKEN")
-    print("Obtenha seu token em: https://t.me/BotFather")
\ No newline at end of file
+    print("Obtenha seu token em: https://t.me/BotFather")
+
+# Endereço da Bot API (padrão: api.telegram.org). Use para um servidor Bot API
+# próprio ou para o servidor falso do teste de carga (teste_carga.py)
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', '').rstrip('/')
+
+# Perfil de execução usado por app.py: local, render, railway ou webhook
+BOT_PROFILE = os.environ.get('BOT_PROFILE', 'local').strip().lower()
+
+# Modo de recebimento de updates: "polling" ou "webhook"
+# Vazio usa o modo do perfil (webhook só no perfil webhook)
+BOT_MODE = os.environ.get('BOT_MODE', '').strip().lower()
+
+# Tempo (s) sem resposta para um /rota pela metade expirar (0 = nunca).
+# Requer o JobQueue: pip install "python-telegram-bot[job-queue]"
+ROTA_TIMEOUT = int(os.environ.get('ROTA_TIMEOUT', 900))
+
+# Configuração do modo webhook
+# URL pública do serviço (ex: https://roteiro-bot.onrender.com)
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '').rstrip('/')
+# Caminho que recebe os updates do Telegram
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram')
+# Token secreto enviado pelo Telegram no header X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+# Endereço e porta do servidor HTTP local (Render/Railway definem PORT)
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.environ.get('PORT', 8080))
+
+# Porta do servidor de métricas no modo polling (0 = desligado; no modo
+# webhook, GET /metrics responde na porta do webhook)
+METRICAS_PORTA = int(os.environ.get('METRICAS_PORTA', 0))
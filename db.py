@@ -1,13 +1,139 @@
+import logging
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
+import re
+import threading
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from typing import Iterator, List, Dict, Optional, Tuple
+from cache import relatorios
+from tarifas import tabela as tabela_tarifas, TARIFAS_PADRAO, VIGENCIA_MINIMA
+
+logger = logging.getLogger(__name__)
 
 DATABASE_FILE = "rotas.db"
 
+# Configuração das conexões persistentes (uma por thread)
+SQLITE_CACHE_KB = int(os.environ.get('SQLITE_CACHE_KB', 8192))
+SQLITE_MMAP_BYTES = int(os.environ.get('SQLITE_MMAP_BYTES', 64 * 1024 * 1024))
+SQLITE_STATEMENT_CACHE = 128
+
+# Versão do schema, gravada em PRAGMA user_version
+SCHEMA_VERSION = 7
+
+# Dono (tenant) das rotas gravadas antes do suporte a vários motoristas e
+# das chamadas sem tenant explícito (scripts). Use o id do Telegram do
+# motorista que já usava o bot para que ele continue vendo as suas rotas.
+TENANT_PADRAO = int(os.environ.get('TENANT_PADRAO', 0))
+
+# Quantidade de linhas reescritas por transação durante as migrações
+MIGRACAO_LOTE = 5000
+
+_local = threading.local()
+_conexoes: List[sqlite3.Connection] = []
+_conexoes_lock = threading.Lock()
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Retorna a conexão persistente da thread atual, abrindo-a se necessário
+    
+    Cada thread (worker) mantém uma única conexão aberta durante toda a vida
+    do processo, em modo WAL, com cache de prepared statements. Assim os
+    comandos não pagam a abertura do arquivo nem o parse do schema, e as
+    leituras não bloqueiam a escrita.
+    
+    Returns:
+        Conexão SQLite configurada
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.arquivo == DATABASE_FILE:
+        return conn
+    
+    conn = sqlite3.connect(
+        DATABASE_FILE,
+        cached_statements=SQLITE_STATEMENT_CACHE,
+        check_same_thread=False
+    )
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_BYTES}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA busy_timeout = 5000')
+    
+    _local.conn = conn
+    _local.arquivo = DATABASE_FILE
+    with _conexoes_lock:
+        _conexoes.append(conn)
+    
+    return conn
+
+def close_connections():
+    """Fecha todas as conexões persistentes (usar no encerramento do bot)"""
+    with _conexoes_lock:
+        for conn in _conexoes:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _conexoes.clear()
+    _local.__dict__.clear()
+
+def _rota_from_row(row) -> Dict:
+    """Converte uma linha (id, data, rota, carro, ilha, valor) em dicionário"""
+    return {
+        'id': row[0],
+        'data': row[1],
+        'rota': row[2],
+        'carro': row[3],
+        'ilha': bool(row[4]),
+        'valor': row[5]
+    }
+
+_DATA_BR = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+_SEPARADORES_ROTA = re.compile(r'[\s_-]+')
+
+@lru_cache(maxsize=4096)
+def normalizar_data(data: str) -> Tuple[str, str]:
+    """
+    Valida uma data DD/MM/AAAA e retorna as suas duas representações
+    
+    Equivale a datetime.strptime(data, "%d/%m/%Y"), mas bem mais rápido e
+    com cache, já que importações e consultas repetem muito as mesmas datas.
+    
+    Args:
+        data: Data no formato DD/MM/AAAA (dia e mês podem ter um dígito)
+    
+    Returns:
+        Tupla (DD/MM/AAAA com zeros, AAAA-MM-DD)
+    
+    Raises:
+        ValueError: Se a data for inválida
+    """
+    match = _DATA_BR.fullmatch(data.strip())
+    if not match:
+        raise ValueError(f"Data inválida: {data}")
+    
+    dia, mes, ano = (int(parte) for parte in match.groups())
+    date(ano, mes, dia)  # valida dia/mês (ex: 31/02 levanta ValueError)
+    
+    return f"{dia:02d}/{mes:02d}/{ano:04d}", f"{ano:04d}-{mes:02d}-{dia:02d}"
+
+def data_para_iso(data: str) -> str:
+    """
+    Converte uma data DD/MM/AAAA para o formato ISO (AAAA-MM-DD)
+    
+    Args:
+        data: Data no formato DD/MM/AAAA
+    
+    Returns:
+        Data no formato AAAA-MM-DD, que ordena corretamente como texto
+    """
+    return normalizar_data(data)[1]
+
 def init_database():
     """Inicializa o banco de dados e cria a tabela se não existir"""
-    conn = sqlite3.connect(DATABASE_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -17,81 +143,818 @@ def init_database():
             rota TEXT NOT NULL,
             carro TEXT NOT NULL,
             ilha INTEGER NOT NULL,
-            valor REAL NOT NULL
+            valor REAL NOT NULL,
+            data_iso TEXT,
+            rota_chave TEXT,
+            tenant INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    conn.commit()
+    
+    _migrar_schema(conn)
+
+def _migrar_schema(conn: sqlite3.Connection):
+    """Aplica as migrações pendentes de acordo com PRAGMA user_version"""
+    versao = conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    if versao < 1:
+        _migracao_v1_data_iso(conn)
+        conn.execute('PRAGMA user_version = 1')
+        conn.commit()
+    
+    if versao < 2:
+        # Índice de cobertura: SUM/COUNT por período sem ler a tabela
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_rotas_totais
+            ON rotas (data_iso, carro, ilha, valor)
+        ''')
+        conn.execute('PRAGMA user_version = 2')
+        conn.commit()
+    
+    if versao < 3:
+        _migracao_v3_rota_unica(conn)
+        conn.execute('PRAGMA user_version = 3')
+        conn.commit()
+    
+    if versao < 4:
+        _migracao_v4_tarifas(conn)
+        conn.execute('PRAGMA user_version = 4')
+        conn.commit()
+    
+    if versao < 5:
+        # v5 sem efeito, mantida só pela numeração. Ela criava totais_diarios
+        # sem tenant; bancos que já passaram por ela têm essa tabela antiga,
+        # que a v6 apaga e recria com o tenant (ver _criar_totais_diarios)
+        conn.execute('PRAGMA user_version = 5')
+        conn.commit()
+    
+    if versao < 6:
+        _migracao_v6_tenant(conn)
+        conn.execute('PRAGMA user_version = 6')
+        conn.commit()
+    
+    if versao < 7:
+        _migracao_v7_estado_bot(conn)
+        conn.execute('PRAGMA user_version = 7')
+        conn.commit()
+    
+    if versao < 8:
+        _migracao_v8_versao_dados(conn)
+        conn.execute('PRAGMA user_version = 8')
+        conn.commit()
+    
+    recarregar_tarifas(conn)
+
+def _migracao_v1_data_iso(conn: sqlite3.Connection):
+    """
+    Migração v1: adiciona a coluna data_iso (AAAA-MM-DD) com índice
+    
+    As linhas existentes são reescritas em lotes de MIGRACAO_LOTE, cada lote
+    na sua própria transação, para não travar o banco durante a migração.
+    """
+    colunas = [row[1] for row in conn.execute('PRAGMA table_info(rotas)')]
+    if 'data_iso' not in colunas:
+        conn.execute('ALTER TABLE rotas ADD COLUMN data_iso TEXT')
+        conn.commit()
+    
+    ultimo_id = 0
+    while True:
+        lote = conn.execute('''
+            SELECT id, data FROM rotas
+            WHERE id > ? AND data_iso IS NULL
+            ORDER BY id
+            LIMIT ?
+        ''', (ultimo_id, MIGRACAO_LOTE)).fetchall()
+        
+        if not lote:
+            break
+        
+        atualizacoes = []
+        for rota_id, data in lote:
+            try:
+                atualizacoes.append((data_para_iso(data), rota_id))
+            except ValueError:
+                # Data inválida fica sem data_iso e não aparece nas consultas por período
+                pass
+        
+        conn.executemany('UPDATE rotas SET data_iso = ? WHERE id = ?', atualizacoes)
+        conn.commit()
+        ultimo_id = lote[-1][0]
+    
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_rotas_data_iso ON rotas (data_iso, id)')
+    conn.commit()
+
+def _migracao_v3_rota_unica(conn: sqlite3.Connection):
+    """
+    Migração v3: adiciona rota_chave e o índice único (data_iso, rota_chave)
+    
+    rota_chave é o nome da rota normalizado (ver normalizar_rota). As linhas
+    existentes são preenchidas em lotes. Duplicatas já gravadas (mesma data e
+    rota) não são apagadas: fica a de menor id e as outras são movidas para
+    rotas_duplicadas, com o id da que ficou, e registradas no log, para que
+    possam ser conferidas antes de criar o índice único.
+    """
+    colunas = [row[1] for row in conn.execute('PRAGMA table_info(rotas)')]
+    if 'rota_chave' not in colunas:
+        conn.execute('ALTER TABLE rotas ADD COLUMN rota_chave TEXT')
+        conn.commit()
+    
+    ultimo_id = 0
+    while True:
+        lote = conn.execute('''
+            SELECT id, rota FROM rotas
+            WHERE id > ? AND rota_chave IS NULL
+            ORDER BY id
+            LIMIT ?
+        ''', (ultimo_id, MIGRACAO_LOTE)).fetchall()
+        
+        if not lote:
+            break
+        
+        conn.executemany(
+            'UPDATE rotas SET rota_chave = ? WHERE id = ?',
+            [(normalizar_rota(rota), rota_id) for rota_id, rota in lote]
+        )
+        conn.commit()
+        ultimo_id = lote[-1][0]
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rotas_duplicadas (
+            id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            rota TEXT NOT NULL,
+            carro TEXT NOT NULL,
+            ilha INTEGER NOT NULL,
+            valor REAL NOT NULL,
+            data_iso TEXT,
+            rota_chave TEXT,
+            mantida_id INTEGER NOT NULL,
+            movida_em TEXT NOT NULL
+        )
+    ''')
+    duplicadas = conn.execute('''
+        SELECT r.id, r.data, r.rota, r.carro, r.ilha, r.valor, r.data_iso, r.rota_chave, m.mantida_id
+        FROM rotas r
+        JOIN (
+            SELECT data_iso, rota_chave, MIN(id) AS mantida_id
+            FROM rotas
+            WHERE data_iso IS NOT NULL
+            GROUP BY data_iso, rota_chave
+            HAVING COUNT(*) > 1
+        ) m ON r.data_iso = m.data_iso AND r.rota_chave = m.rota_chave
+        WHERE r.id <> m.mantida_id
+        ORDER BY r.id
+    ''').fetchall()
+    
+    if duplicadas:
+        movida_em = datetime.now().isoformat(timespec='seconds')
+        for rota_id, data, rota, carro, ilha, valor, _, _, mantida_id in duplicadas:
+            logger.warning(
+                f"Rota duplicada movida para rotas_duplicadas: id {rota_id} ({data} {rota} "
+                f"{carro}{' ilha' if ilha else ''} R$ {valor:.2f}); mantida a de id {mantida_id}"
+            )
+        conn.executemany(
+            'INSERT INTO rotas_duplicadas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [linha + (movida_em,) for linha in duplicadas]
+        )
+        conn.executemany('DELETE FROM rotas WHERE id = ?', [(linha[0],) for linha in duplicadas])
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_rotas_data_rota
+        ON rotas (data_iso, rota_chave)
+    ''')
+    conn.commit()
+
+def _migracao_v4_tarifas(conn: sqlite3.Connection):
+    """
+    Migração v4: cria a tabela de tarifas por carro e período de vigência
+    
+    É preenchida com as tarifas que antes estavam fixas no código (ver
+    tarifas.TARIFAS_PADRAO), vigentes desde sempre, para que os valores já
+    gravados continuem corretos.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tarifas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            carro TEXT NOT NULL,
+            valor REAL NOT NULL,
+            adicional_ilha REAL NOT NULL,
+            inicio TEXT NOT NULL,
+            fim TEXT
         )
     ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tarifas_carro ON tarifas (carro, inicio)')
     
+    if conn.execute('SELECT COUNT(*) FROM tarifas').fetchone()[0] == 0:
+        conn.executemany(
+            'INSERT INTO tarifas (carro, valor, adicional_ilha, inicio, fim) VALUES (?, ?, ?, ?, NULL)',
+            [(carro, valor, adicional, VIGENCIA_MINIMA) for carro, valor, adicional in TARIFAS_PADRAO]
+        )
     conn.commit()
-    conn.close()
 
-def insert_rota(data: str, rota: str, carro: str, ilha: bool) -> int:
+def _migracao_v6_tenant(conn: sqlite3.Connection):
+    """
+    Migração v6: adiciona o dono (tenant) de cada rota
+    
+    As rotas existentes ficam com TENANT_PADRAO (preenchido pelo próprio
+    ALTER TABLE, sem reescrever linhas). Os índices passam a começar pelo
+    tenant, para que as consultas de um motorista leiam só as rotas dele, e
+    totais_diarios é recriada com o tenant na chave. Sem a variável
+    TENANT_PADRAO as rotas antigas ficam com o tenant 0, que nenhum
+    motorista enxerga: a migração avisa no log como passá-las ao dono
+    (mover_tenant, `python verificar_banco.py --mover-tenant <id>`).
+    """
+    colunas = [row[1] for row in conn.execute('PRAGMA table_info(rotas)')]
+    if 'tenant' not in colunas:
+        conn.execute(f'ALTER TABLE rotas ADD COLUMN tenant INTEGER NOT NULL DEFAULT {TENANT_PADRAO}')
+        
+        existentes = conn.execute('SELECT COUNT(*) FROM rotas').fetchone()[0]
+        if existentes and 'TENANT_PADRAO' not in os.environ:
+            logger.warning(
+                f"⚠️ ATENÇÃO: TENANT_PADRAO não definido; as {existentes} rota(s) já gravadas "
+                f"ficaram com o tenant {TENANT_PADRAO} e não aparecem para nenhum motorista. "
+                f"Para passá-las ao dono rode: python verificar_banco.py --mover-tenant <id_do_telegram>"
+            )
+    
+    for indice in ('idx_rotas_data_iso', 'idx_rotas_totais', 'idx_rotas_data_rota'):
+        conn.execute(f'DROP INDEX IF EXISTS {indice}')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_rotas_tenant_data ON rotas (tenant, data_iso, id)')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_rotas_tenant_rota
+        ON rotas (tenant, data_iso, rota_chave)
+    ''')
+    
+    for trigger in ('trg_rotas_totais_insert', 'trg_rotas_totais_delete', 'trg_rotas_totais_update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS totais_diarios')
+    conn.commit()
+    
+    _criar_totais_diarios(conn)
+
+def _migracao_v7_estado_bot(conn: sqlite3.Connection):
+    """
+    Migração v7: cria a tabela estado_bot (ver persistencia.py)
+    
+    Guarda o user_data e o estado das conversas do bot, serializados, para
+    que um reinício não perca um /rota pela metade. tipo é 'user_data' ou
+    'conversa:<nome>'; chave identifica o usuário ou a conversa.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS estado_bot (
+            tipo TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            valor BLOB NOT NULL,
+            atualizado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tipo, chave)
+        ) WITHOUT ROWID
+    ''')
+    conn.commit()
+
+def _migracao_v8_versao_dados(conn: sqlite3.Connection):
+    """
+    Migração v8: cria versao_dados, um contador de alterações por tenant
+    
+    Mantido por triggers em rotas, então muda com qualquer gravação, seja do
+    bot, da importação, da reprecificação ou de outro processo/réplica. Os
+    caches de relatórios e de PDFs usam esse número na chave (ver
+    versao_dados), e não só as invalidações feitas dentro do processo.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS versao_dados (
+            tenant INTEGER PRIMARY KEY,
+            versao INTEGER NOT NULL
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_rotas_versao_insert
+        AFTER INSERT ON rotas
+        BEGIN
+            INSERT INTO versao_dados (tenant, versao) VALUES (NEW.tenant, 1)
+            ON CONFLICT (tenant) DO UPDATE SET versao = versao + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_rotas_versao_delete
+        AFTER DELETE ON rotas
+        BEGIN
+            INSERT INTO versao_dados (tenant, versao) VALUES (OLD.tenant, 1)
+            ON CONFLICT (tenant) DO UPDATE SET versao = versao + 1;
+        END
+    ''')
+    # Rota trocada de dono: muda a versão dos dois
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_rotas_versao_update
+        AFTER UPDATE ON rotas
+        BEGIN
+            INSERT INTO versao_dados (tenant, versao) VALUES (OLD.tenant, 1)
+            ON CONFLICT (tenant) DO UPDATE SET versao = versao + 1;
+            INSERT INTO versao_dados (tenant, versao)
+            SELECT NEW.tenant, 1 WHERE NEW.tenant <> OLD.tenant
+            ON CONFLICT (tenant) DO UPDATE SET versao = versao + 1;
+        END
+    ''')
+    conn.commit()
+
+def _criar_totais_diarios(conn: sqlite3.Connection):
+    """
+    Cria a tabela de totais por tenant, dia, carro e ilha e os seus triggers
+    
+    totais_diarios é mantida por triggers em rotas, então qualquer gravação
+    (bot, importação, reprecificação ou outro processo) a atualiza na mesma
+    transação. Os totais das rotas já gravadas são calculados uma vez aqui.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS totais_diarios (
+            tenant INTEGER NOT NULL,
+            data_iso TEXT NOT NULL,
+            carro TEXT NOT NULL,
+            ilha INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL,
+            total REAL NOT NULL,
+            PRIMARY KEY (tenant, data_iso, carro, ilha)
+        ) WITHOUT ROWID
+    ''')
+    
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_rotas_totais_insert
+        AFTER INSERT ON rotas
+        WHEN NEW.data_iso IS NOT NULL
+        BEGIN
+            INSERT INTO totais_diarios (tenant, data_iso, carro, ilha, quantidade, total)
+            VALUES (NEW.tenant, NEW.data_iso, NEW.carro, NEW.ilha, 1, NEW.valor)
+            ON CONFLICT (tenant, data_iso, carro, ilha) DO UPDATE SET
+                quantidade = quantidade + 1,
+                total = total + excluded.total;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_rotas_totais_delete
+        AFTER DELETE ON rotas
+        WHEN OLD.data_iso IS NOT NULL
+        BEGIN
+            UPDATE totais_diarios
+            SET quantidade = quantidade - 1, total = total - OLD.valor
+            WHERE tenant = OLD.tenant AND data_iso = OLD.data_iso AND carro = OLD.carro AND ilha = OLD.ilha;
+            DELETE FROM totais_diarios
+            WHERE tenant = OLD.tenant AND data_iso = OLD.data_iso AND carro = OLD.carro AND ilha = OLD.ilha
+              AND quantidade <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_rotas_totais_update
+        AFTER UPDATE OF tenant, data_iso, carro, ilha, valor ON rotas
+        BEGIN
+            UPDATE totais_diarios
+            SET quantidade = quantidade - 1, total = total - OLD.valor
+            WHERE tenant = OLD.tenant AND data_iso = OLD.data_iso AND carro = OLD.carro AND ilha = OLD.ilha;
+            DELETE FROM totais_diarios
+            WHERE tenant = OLD.tenant AND data_iso = OLD.data_iso AND carro = OLD.carro AND ilha = OLD.ilha
+              AND quantidade <= 0;
+            INSERT INTO totais_diarios (tenant, data_iso, carro, ilha, quantidade, total)
+            SELECT NEW.tenant, NEW.data_iso, NEW.carro, NEW.ilha, 1, NEW.valor
+            WHERE NEW.data_iso IS NOT NULL
+            ON CONFLICT (tenant, data_iso, carro, ilha) DO UPDATE SET
+                quantidade = quantidade + 1,
+                total = total + excluded.total;
+        END
+    ''')
+    conn.commit()
+    
+    reconstruir_totais(conn)
+
+def reconstruir_totais(conn: sqlite3.Connection = None) -> int:
+    """
+    Recalcula totais_diarios a partir das rotas (reparo)
+    
+    Normalmente desnecessário, já que os triggers mantêm a tabela em dia;
+    serve para corrigir divergências, por exemplo após editar o banco com
+    os triggers desativados. Roda em uma única transação.
+    
+    Returns:
+        Quantidade de linhas (tenant × dia × carro × ilha) em totais_diarios
+    """
+    conn = conn or get_connection()
+    
+    with conn:
+        conn.execute('DELETE FROM totais_diarios')
+        conn.execute('''
+            INSERT INTO totais_diarios (tenant, data_iso, carro, ilha, quantidade, total)
+            SELECT tenant, data_iso, carro, ilha, COUNT(*), SUM(valor)
+            FROM rotas
+            WHERE data_iso IS NOT NULL
+            GROUP BY tenant, data_iso, carro, ilha
+        ''')
+    
+    relatorios.limpar()
+    return conn.execute('SELECT COUNT(*) FROM totais_diarios').fetchone()[0]
+
+def mover_tenant(destino: int, origem: int = 0) -> Dict:
+    """
+    Passa as rotas de um tenant para outro (reparo)
+    
+    Serve para entregar ao dono as rotas gravadas antes da migração v6 sem
+    TENANT_PADRAO definido, que ficaram com o tenant 0. Os triggers de rotas
+    mantêm totais_diarios e versao_dados em dia. Uma rota que o destino já
+    tem (mesma data e nome) não é movida e fica no tenant de origem.
+    
+    Args:
+        destino: Novo dono das rotas (id do usuário no Telegram)
+        origem: Tenant atual das rotas
+    
+    Returns:
+        Dicionário com 'movidas' e 'mantidas' (as que o destino já tinha)
+    """
+    conn = get_connection()
+    
+    with conn:
+        movidas = conn.execute(
+            'UPDATE OR IGNORE rotas SET tenant = ? WHERE tenant = ?', (destino, origem)
+        ).rowcount
+        mantidas = conn.execute('SELECT COUNT(*) FROM rotas WHERE tenant = ?', (origem,)).fetchone()[0]
+    
+    relatorios.limpar()
+    return {'movidas': movidas, 'mantidas': mantidas}
+
+def recarregar_tarifas(conn: sqlite3.Connection = None):
+    """Lê a tabela de tarifas e recompila a versão em memória"""
+    conn = conn or get_connection()
+    linhas = conn.execute('SELECT carro, valor, adicional_ilha, inicio, fim FROM tarifas').fetchall()
+    tabela_tarifas.compilar(linhas)
+    _local.data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+
+def _verificar_tarifas(conn: sqlite3.Connection):
+    """
+    Recarrega as tarifas se outro processo alterou o banco
+    
+    PRAGMA data_version só muda quando outra conexão grava no arquivo (por
+    exemplo `python tarifas.py definir` rodando ao lado do bot), então na
+    maior parte das gravações isto custa uma única consulta trivial.
+    """
+    data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+    if data_version != getattr(_local, 'data_version', None):
+        recarregar_tarifas(conn)
+
+def calcular_valor(data: str, carro: str, ilha: bool) -> float:
+    """
+    Calcula o valor de uma rota pela tarifa vigente na data
+    
+    Args:
+        data: Data da rota (DD/MM/AAAA)
+        carro: Tipo do carro (Van ou Fiorino)
+        ilha: Se teve entrega em ilha
+    
+    Returns:
+        Valor da rota
+    
+    Raises:
+        ValueError: Se a data for inválida ou não houver tarifa para o carro
+    """
+    _verificar_tarifas(get_connection())
+    return tabela_tarifas.calcular(carro, data_para_iso(data), ilha)
+
+def calcular_valores(rotas: List[Tuple[str, str, str, bool]]) -> List[float]:
+    """
+    Calcula o valor de várias rotas com uma única verificação das tarifas
+    
+    Args:
+        rotas: Lista de tuplas (data, rota, carro, ilha), como em upsert_rotas_lote
+    
+    Returns:
+        Valores na mesma ordem das rotas
+    
+    Raises:
+        ValueError: Na primeira rota com data inválida ou sem tarifa para o carro
+    """
+    _verificar_tarifas(get_connection())
+    return [tabela_tarifas.calcular(carro, data_para_iso(data), ilha) for data, rota, carro, ilha in rotas]
+
+def tarifas_vigentes(data: str = None) -> Dict[str, Tuple[float, float]]:
+    """
+    Retorna as tarifas vigentes em uma data (padrão: hoje)
+    
+    Lê a tabela em memória; do banco só consulta PRAGMA data_version, para
+    enxergar tarifas alteradas por outro processo (ver _verificar_tarifas).
+    
+    Returns:
+        Dicionário {carro: (valor, adicional_ilha)}
+    """
+    _verificar_tarifas(get_connection())
+    data_iso = data_para_iso(data) if data else date.today().isoformat()
+    return tabela_tarifas.vigentes(data_iso)
+
+def listar_tarifas() -> List[Dict]:
+    """Lista todas as tarifas cadastradas, por carro e início da vigência"""
+    cursor = get_connection().execute('''
+        SELECT carro, valor, adicional_ilha, inicio, fim
+        FROM tarifas
+        ORDER BY carro, inicio
+    ''')
+    
+    return [
+        {'carro': row[0], 'valor': row[1], 'adicional_ilha': row[2], 'inicio': row[3], 'fim': row[4]}
+        for row in cursor.fetchall()
+    ]
+
+def definir_tarifa(carro: str, valor: float, adicional_ilha: float,
+                   data_inicial: str, data_final: str = None):
+    """
+    Cadastra uma tarifa para um carro a partir de uma data
+    
+    As vigências já cadastradas que se sobrepõem ao novo período são
+    recortadas (ficam só as partes antes e depois dele). Rotas já gravadas
+    não mudam de valor; para aplicar a nova tarifa a elas use
+    reprecificar_periodo.
+    
+    Args:
+        carro: Tipo do carro (ex: Van)
+        valor: Valor da rota sem ilha
+        adicional_ilha: Valor somado quando teve entrega em ilha
+        data_inicial: Início da vigência (DD/MM/AAAA)
+        data_final: Fim da vigência (DD/MM/AAAA) ou None para vigência aberta
+    
+    Raises:
+        ValueError: Se as datas ou os valores forem inválidos
+    """
+    carro = carro.strip().lower()
+    inicio = data_para_iso(data_inicial)
+    fim = data_para_iso(data_final) if data_final else None
+    if fim is not None and fim < inicio:
+        raise ValueError("A data final da tarifa é anterior à inicial")
+    if valor < 0 or adicional_ilha < 0:
+        raise ValueError("Valores da tarifa não podem ser negativos")
+    
+    conn = get_connection()
+    
+    with conn:
+        sobrepostas = conn.execute('''
+            SELECT id, valor, adicional_ilha, inicio, fim
+            FROM tarifas
+            WHERE carro = ? AND inicio <= COALESCE(?, '9999-12-31')
+              AND COALESCE(fim, '9999-12-31') >= ?
+        ''', (carro, fim, inicio)).fetchall()
+        
+        recortes = []
+        for tarifa_id, valor_antigo, adicional_antigo, inicio_antigo, fim_antigo in sobrepostas:
+            if inicio_antigo < inicio:
+                dia_anterior = (date.fromisoformat(inicio) - timedelta(days=1)).isoformat()
+                recortes.append((carro, valor_antigo, adicional_antigo, inicio_antigo, dia_anterior))
+            if fim is not None and (fim_antigo is None or fim_antigo > fim):
+                dia_seguinte = (date.fromisoformat(fim) + timedelta(days=1)).isoformat()
+                recortes.append((carro, valor_antigo, adicional_antigo, dia_seguinte, fim_antigo))
+        
+        conn.executemany('DELETE FROM tarifas WHERE id = ?', [(row[0],) for row in sobrepostas])
+        conn.executemany(
+            'INSERT INTO tarifas (carro, valor, adicional_ilha, inicio, fim) VALUES (?, ?, ?, ?, ?)',
+            recortes + [(carro, valor, adicional_ilha, inicio, fim)]
+        )
+    
+    recarregar_tarifas(conn)
+
+# Tarifa vigente para a linha de rotas sendo atualizada (subconsulta correlacionada)
+_TARIFA_DA_ROTA = '''
+    (SELECT t.valor + CASE WHEN rotas.ilha THEN t.adicional_ilha ELSE 0 END
+     FROM tarifas t
+     WHERE t.carro = LOWER(rotas.carro)
+       AND t.inicio <= rotas.data_iso
+       AND (t.fim IS NULL OR t.fim >= rotas.data_iso))
+'''
+
+def reprecificar_periodo(data_inicial: str, data_final: str) -> int:
+    """
+    Recalcula o valor de todas as rotas do período pelas tarifas cadastradas
+    
+    Um único UPDATE no banco (sem ler as rotas para o Python); rotas cujo
+    valor já está correto, ou sem tarifa para o carro, não são alteradas.
+    
+    Args:
+        data_inicial: Data inicial (DD/MM/AAAA)
+        data_final: Data final (DD/MM/AAAA)
+    
+    Returns:
+        Quantidade de rotas com valor alterado
+    """
+    inicio_iso = data_para_iso(data_inicial)
+    fim_iso = data_para_iso(data_final)
+    
+    conn = get_connection()
+    
+    with conn:
+        cursor = conn.execute(f'''
+            UPDATE rotas
+            SET valor = COALESCE({_TARIFA_DA_ROTA}, valor)
+            WHERE data_iso BETWEEN ? AND ?
+              AND valor IS NOT COALESCE({_TARIFA_DA_ROTA}, valor)
+        ''', (inicio_iso, fim_iso))
+    
+    if cursor.rowcount:
+        relatorios.invalidar_periodo(inicio_iso, fim_iso)
+    
+    return cursor.rowcount
+
+def normalizar_rota(rota: str) -> str:
+    """
+    Normaliza o nome de uma rota para detectar duplicatas
+    
+    Ignora maiúsculas/minúsculas e trata espaço, hífen e sublinhado como o
+    mesmo separador: "p27-am2", "P27_AM2" e "P27 AM2" viram "P27_AM2".
+    """
+    return _SEPARADORES_ROTA.sub('_', rota.strip().upper())
+
+def _preparar_rota(data: str, rota: str, carro: str, ilha: bool, tenant: int) -> Tuple:
+    """
+    Normaliza uma rota e calcula o seu valor
+    
+    Returns:
+        Tupla (data, rota, carro, ilha, valor, data_iso, rota_chave, tenant) pronta para o INSERT
+    """
+    # Normaliza a data (ex: 1/9/2025 -> 01/09/2025) e calcula a versão ISO
+    data, data_iso = normalizar_data(data)
+    rota = rota.strip()
+    
+    # Valor pela tarifa vigente na data (consulta em memória, ver tarifas.py)
+    valor_final = tabela_tarifas.calcular(carro, data_iso, ilha)
+    
+    return (data, rota, carro, 1 if ilha else 0, valor_final, data_iso, normalizar_rota(rota), tenant)
+
+# Insere a rota ou, se o mesmo tenant já tiver uma com a mesma data e nome
+# normalizado, atualiza carro/ilha/valor. Se nada mudou, a linha não é tocada.
+_UPSERT_ROTA = '''
+    INSERT INTO rotas (data, rota, carro, ilha, valor, data_iso, rota_chave, tenant)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (tenant, data_iso, rota_chave) DO UPDATE SET
+        carro = excluded.carro,
+        ilha = excluded.ilha,
+        valor = excluded.valor
+    WHERE rotas.carro IS NOT excluded.carro
+       OR rotas.ilha IS NOT excluded.ilha
+       OR rotas.valor IS NOT excluded.valor
+'''
+
+def _executar_upsert(conn: sqlite3.Connection, valores: List[Tuple]) -> Dict:
+    """
+    Executa o upsert de várias rotas e conta inseridas/atualizadas/ignoradas
+    
+    Deve ser chamada dentro de uma transação. As inseridas são as que
+    receberam id maior que o maior id anterior; as demais alterações são
+    atualizações; o resto já existia igual e foi ignorado. O rowcount do
+    executemany não inclui as linhas alteradas pelos triggers de totais.
+    """
+    maior_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM rotas').fetchone()[0]
+    
+    alteradas = conn.executemany(_UPSERT_ROTA, valores).rowcount
+    inseridas = conn.execute('SELECT COUNT(*) FROM rotas WHERE id > ?', (maior_id,)).fetchone()[0]
+    
+    return {
+        'inseridas': inseridas,
+        'atualizadas': alteradas - inseridas,
+        'ignoradas': len(valores) - alteradas
+    }
+
+def upsert_rota(data: str, rota: str, carro: str, ilha: bool, tenant: int = TENANT_PADRAO) -> Dict:
+    """
+    Registra uma rota sem criar duplicata (mesma data + mesmo nome normalizado)
+    
+    Args:
+        data: Data da rota (DD/MM/AAAA)
+        rota: Nome da rota (ex: P10-AM)
+        carro: Tipo do carro (Van ou Fiorino)
+        ilha: Se teve entrega em ilha (True/False)
+        tenant: Dono das rotas (id do usuário no Telegram)
+    
+    Returns:
+        Dicionário com 'id' e 'valor' da rota e 'status' ('inserida',
+        'atualizada' ou 'ignorada')
+    """
+    conn = get_connection()
+    _verificar_tarifas(conn)
+    
+    valores = _preparar_rota(data, rota, carro, ilha, tenant)
+    
+    with conn:
+        resultado = _executar_upsert(conn, [valores])
+        rota_id = conn.execute(
+            'SELECT id FROM rotas WHERE tenant = ? AND data_iso = ? AND rota_chave = ?',
+            (tenant, valores[5], valores[6])
+        ).fetchone()[0]
+    
+    if resultado['ignoradas'] == 0:
+        relatorios.invalidar_dia(valores[5], tenant)
+    
+    if resultado['inseridas']:
+        status = 'inserida'
+    elif resultado['atualizadas']:
+        status = 'atualizada'
+    else:
+        status = 'ignorada'
+    
+    return {'id': rota_id, 'valor': valores[4], 'status': status}
+
+def insert_rota(data: str, rota: str, carro: str, ilha: bool, tenant: int = TENANT_PADRAO) -> int:
     """
     Insere uma nova rota no banco de dados
     
+    Se já existir uma rota com a mesma data e nome, ela é atualizada em vez
+    de duplicada (ver upsert_rota).
+    
     Args:
         data: Data da rota (DD/MM/AAAA)
         rota: Nome da rota (ex: P10-AM)
         carro: Tipo do carro (Van ou Fiorino)
         ilha: Se teve entrega em ilha (True/False)
+        tenant: Dono das rotas (id do usuário no Telegram)
     
     Returns:
-        ID da rota inserida
+        ID da rota inserida (ou da já existente)
+    """
+    return upsert_rota(data, rota, carro, ilha, tenant)['id']
+
+def upsert_rotas_lote(rotas: List[Tuple], tenant: int = TENANT_PADRAO) -> Dict:
     """
-    # Calcula o valor baseado no carro e se teve ilha
-    valor_base = 130 if carro.lower() == "van" else 110
-    valor_final = valor_base + (10 if ilha else 0)
+    Registra várias rotas em uma única transação (executemany com upsert)
     
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    Args:
+        rotas: Lista de tuplas (data, rota, carro, ilha), como em insert_rota
+        tenant: Dono das rotas (id do usuário no Telegram)
     
-    cursor.execute('''
-        INSERT INTO rotas (data, rota, carro, ilha, valor)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (data, rota, carro, 1 if ilha else 0, valor_final))
+    Returns:
+        Dicionário com 'inseridas', 'atualizadas' e 'ignoradas'
+    """
+    conn = get_connection()
+    _verificar_tarifas(conn)
     
-    rota_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    valores = [_preparar_rota(*rota, tenant) for rota in rotas]
+    if not valores:
+        return {'inseridas': 0, 'atualizadas': 0, 'ignoradas': 0}
+    
+    with conn:
+        resultado = _executar_upsert(conn, valores)
     
-    return rota_id
+    if resultado['ignoradas'] < len(valores):
+        for data_iso in {v[5] for v in valores}:
+            relatorios.invalidar_dia(data_iso, tenant)
+    
+    return resultado
 
-def get_rotas_por_periodo(data_inicial: str, data_final: str) -> List[Dict]:
+def get_rotas_por_periodo(data_inicial: str, data_final: str, tenant: int = TENANT_PADRAO) -> List[Dict]:
     """
     Busca rotas por período
     
     Args:
         data_inicial: Data inicial (DD/MM/AAAA)
         data_final: Data final (DD/MM/AAAA)
+        tenant: Dono das rotas (id do usuário no Telegram)
     
     Returns:
         Lista de dicionários com as rotas
     """
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     
-    # Como as datas estão no formato DD/MM/YYYY no banco, fazemos comparação direta
+    # Compara pela coluna data_iso (AAAA-MM-DD), que usa o índice idx_rotas_tenant_data
     cursor.execute('''
         SELECT id, data, rota, carro, ilha, valor
         FROM rotas
-        WHERE data >= ? AND data <= ?
-        ORDER BY data, id
-    ''', (data_inicial, data_final))
-    
-    rotas = []
-    for row in cursor.fetchall():
-        rotas.append({
-            'id': row[0],
-            'data': row[1],
-            'rota': row[2],
-            'carro': row[3],
-            'ilha': bool(row[4]),
-            'valor': row[5]
-        })
-    
-    conn.close()
-    return rotas
-
-def get_rotas_hoje() -> List[Dict]:
+        WHERE tenant = ? AND data_iso BETWEEN ? AND ?
+        ORDER BY data_iso, id
+    ''', (tenant, data_para_iso(data_inicial), data_para_iso(data_final)))
+    
+    return [_rota_from_row(row) for row in cursor.fetchall()]
+
+def iterar_rotas_periodo(data_inicial: str, data_final: str, tenant: int = TENANT_PADRAO,
+                         tamanho_lote: int = 1000) -> Iterator[Tuple]:
+    """
+    Percorre as rotas de um período sem carregá-las todas na memória
+    
+    O cursor é lido com fetchmany, um lote por vez; deve ser consumido
+    inteiro na mesma thread que o criou (a conexão é da thread).
+    
+    Args:
+        data_inicial: Data inicial (DD/MM/AAAA)
+        data_final: Data final (DD/MM/AAAA)
+        tenant: Dono das rotas (id do usuário no Telegram)
+        tamanho_lote: Linhas lidas do banco por vez
+    
+    Yields:
+        Tuplas (id, data, rota, carro, ilha, valor, data_iso), em ordem de data
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT id, data, rota, carro, ilha, valor, data_iso
+        FROM rotas
+        WHERE tenant = ? AND data_iso BETWEEN ? AND ?
+        ORDER BY data_iso, id
+    ''', (tenant, data_para_iso(data_inicial), data_para_iso(data_final)))
+    
+    try:
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            yield from lote
+    finally:
+        cursor.close()
+
+def get_rotas_hoje(tenant: int = TENANT_PADRAO) -> List[Dict]:
     """
     Busca todas as rotas da data atual
     
@@ -99,79 +962,376 @@ def get_rotas_hoje() -> List[Dict]:
         Lista de dicionários com as rotas de hoje
     """
     hoje = datetime.now().strftime("%d/%m/%Y")
-    return get_rotas_por_periodo(hoje, hoje)
+    return get_rotas_por_periodo(hoje, hoje, tenant)
 
-def get_todas_rotas() -> List[Dict]:
+def get_todas_rotas(tenant: int = TENANT_PADRAO) -> List[Dict]:
     """
-    Busca todas as rotas cadastradas
+    Busca todas as rotas cadastradas de um tenant
     
     Returns:
         Lista de dicionários com todas as rotas
     """
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     
     cursor.execute('''
         SELECT id, data, rota, carro, ilha, valor
         FROM rotas
-        ORDER BY data DESC, id DESC
-    ''')
+        WHERE tenant = ?
+        ORDER BY data_iso DESC, id DESC
+    ''', (tenant,))
     
-    rotas = []
-    for row in cursor.fetchall():
-        rotas.append({
-            'id': row[0],
-            'data': row[1],
-            'rota': row[2],
-            'carro': row[3],
-            'ilha': bool(row[4]),
-            'valor': row[5]
-        })
+    return [_rota_from_row(row) for row in cursor.fetchall()]
+
+def get_rotas_pagina(limite: int, antes: Optional[Tuple[str, int]] = None,
+                     tenant: int = TENANT_PADRAO) -> Dict:
+    """
+    Busca uma página de rotas, da mais recente para a mais antiga (keyset)
     
-    conn.close()
-    return rotas
+    Em vez de OFFSET, a página seguinte começa logo após a última rota da
+    anterior: cada página custa uma busca no índice (tenant, data_iso, id),
+    qualquer que seja o tamanho da tabela. Rotas sem data_iso (NULL) vêm
+    depois de todas as datadas, por id, em uma segunda busca no mesmo índice.
+    
+    Args:
+        limite: Quantidade máxima de rotas na página
+        antes: Cursor (data_iso, id) da última rota da página anterior,
+            ou None para a primeira página; data_iso é None quando a página
+            anterior terminou numa rota sem data_iso
+        tenant: Dono das rotas (id do usuário no Telegram)
+    
+    Returns:
+        Dicionário com 'rotas' e 'proximo' (cursor da próxima página,
+        ou None se esta for a última)
+    """
+    cursor = get_connection().cursor()
+    
+    # Busca uma rota a mais para saber se existe próxima página
+    rows = []
+    if antes is None:
+        cursor.execute('''
+            SELECT id, data, rota, carro, ilha, valor, data_iso
+            FROM rotas
+            WHERE tenant = ? AND data_iso IS NOT NULL
+            ORDER BY data_iso DESC, id DESC
+            LIMIT ?
+        ''', (tenant, limite + 1))
+        rows = cursor.fetchall()
+    elif antes[0] is not None:
+        cursor.execute('''
+            SELECT id, data, rota, carro, ilha, valor, data_iso
+            FROM rotas
+            WHERE tenant = ? AND (data_iso, id) < (?, ?)
+            ORDER BY data_iso DESC, id DESC
+            LIMIT ?
+        ''', (tenant, antes[0], antes[1], limite + 1))
+        rows = cursor.fetchall()
+    
+    # Acabaram as rotas datadas: completa com as sem data_iso, que a
+    # comparação (data_iso, id) < (?, ?) nunca alcança
+    if len(rows) <= limite:
+        ultimo_id = antes[1] if antes is not None and antes[0] is None else None
+        cursor.execute('''
+            SELECT id, data, rota, carro, ilha, valor, data_iso
+            FROM rotas
+            WHERE tenant = ? AND data_iso IS NULL AND (? IS NULL OR id < ?)
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (tenant, ultimo_id, ultimo_id, limite + 1 - len(rows)))
+        rows += cursor.fetchall()
+    
+    proximo = None
+    if len(rows) > limite:
+        rows = rows[:limite]
+        proximo = (rows[-1][6], rows[-1][0])
+    
+    return {
+        'rotas': [_rota_from_row(row) for row in rows],
+        'proximo': proximo
+    }
+
+# Rotas mais recentes examinadas por get_rotas_recentes
+RECENTES_JANELA = 200
+
+def get_rotas_recentes(limite: int = 6, tenant: int = TENANT_PADRAO) -> List[str]:
+    """
+    Nomes de rota usados recentemente, do mais recente para o mais antigo
+    
+    Olha só as últimas RECENTES_JANELA rotas, lidas em ordem pelo índice
+    (tenant, data_iso, id), e agrupa pelo nome normalizado: o custo não
+    depende do tamanho do histórico.
+    
+    Args:
+        limite: Quantidade máxima de nomes
+        tenant: Dono das rotas (id do usuário no Telegram)
+    
+    Returns:
+        Lista de nomes de rota (como foram digitados na última vez)
+    """
+    cursor = get_connection().execute('''
+        SELECT rota, MAX(data_iso || printf('%010d', id)) AS ultima
+        FROM (
+            SELECT id, rota, rota_chave, data_iso
+            FROM rotas
+            WHERE tenant = ?
+            ORDER BY data_iso DESC, id DESC
+            LIMIT ?
+        )
+        GROUP BY rota_chave
+        ORDER BY ultima DESC
+        LIMIT ?
+    ''', (tenant, RECENTES_JANELA, limite))
+    return [row[0] for row in cursor.fetchall()]
 
-def delete_rota(rota_id: int) -> bool:
+def delete_rota(rota_id: int, tenant: int = TENANT_PADRAO) -> bool:
     """
     Remove uma rota pelo ID
     
     Args:
         rota_id: ID da rota a ser removida
+        tenant: Dono da rota; rotas de outro tenant não são removidas
     
     Returns:
         True se a rota foi removida, False se não foi encontrada
     """
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    conn = get_connection()
     
-    cursor.execute('DELETE FROM rotas WHERE id = ?', (rota_id,))
+    with conn:
+        row = conn.execute(
+            'SELECT data_iso FROM rotas WHERE id = ? AND tenant = ?', (rota_id, tenant)
+        ).fetchone()
+        cursor = conn.execute('DELETE FROM rotas WHERE id = ? AND tenant = ?', (rota_id, tenant))
     rows_affected = cursor.rowcount
     
-    conn.commit()
-    conn.close()
+    if row and row[0]:
+        relatorios.invalidar_dia(row[0], tenant)
     
     return rows_affected > 0
 
-def get_total_periodo(data_inicial: str, data_final: str) -> float:
+def salvar_estados(gravar: List[Tuple[str, str, bytes]], apagar: List[Tuple[str, str]]):
+    """
+    Grava e apaga itens do estado do bot em uma única transação
+    
+    Args:
+        gravar: Tuplas (tipo, chave, valor serializado)
+        apagar: Tuplas (tipo, chave)
+    """
+    conn = get_connection()
+    with conn:
+        if gravar:
+            conn.executemany('''
+                INSERT INTO estado_bot (tipo, chave, valor, atualizado_em)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (tipo, chave) DO UPDATE SET
+                    valor = excluded.valor,
+                    atualizado_em = excluded.atualizado_em
+            ''', gravar)
+        if apagar:
+            conn.executemany('DELETE FROM estado_bot WHERE tipo = ? AND chave = ?', apagar)
+
+def versao_dados(tenant: int = TENANT_PADRAO) -> int:
+    """
+    Versão das rotas de um tenant, gravada no banco (ver _migracao_v8_versao_dados)
+    
+    Muda a cada rota inserida, alterada ou removida, por qualquer processo;
+    é uma leitura por chave primária, feita para compor chaves de cache.
+    """
+    row = get_connection().execute(
+        'SELECT versao FROM versao_dados WHERE tenant = ?', (tenant,)
+    ).fetchone()
+    return row[0] if row else 0
+
+def ler_estado(tipo: str, chave: str) -> Optional[bytes]:
+    """Retorna o valor serializado de um item do estado do bot, ou None"""
+    row = get_connection().execute(
+        'SELECT valor FROM estado_bot WHERE tipo = ? AND chave = ?', (tipo, chave)
+    ).fetchone()
+    return row[0] if row else None
+
+def ler_estados(tipo: str, max_dias: int) -> List[Tuple[str, bytes]]:
+    """
+    Retorna os itens (chave, valor serializado) de um tipo do estado do bot
+    
+    Itens sem alteração há mais de max_dias são apagados em vez de
+    carregados (ex: um /rota abandonado há semanas).
+    """
+    conn = get_connection()
+    limite = f'-{int(max_dias)} days'
+    with conn:
+        conn.execute(
+            "DELETE FROM estado_bot WHERE tipo = ? AND atualizado_em < datetime('now', ?)",
+            (tipo, limite)
+        )
+    return conn.execute('SELECT chave, valor FROM estado_bot WHERE tipo = ?', (tipo,)).fetchall()
+
+# Agrupamentos aceitos por get_resumo_periodo (nome -> expressão SQL sobre totais_diarios)
+AGRUPAMENTOS = {
+    'carro': 'carro',
+    'ilha': 'ilha',
+    'dia': 'data_iso',
+    'mes': 'substr(data_iso, 1, 7)',
+}
+
+# Meses por extenso usados nos resumos
+MESES = [
+    'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
+]
+
+def get_espelho(data_inicial: str, data_final: str, tenant: int = TENANT_PADRAO) -> Dict:
+    """
+    Busca as rotas de um período junto com os totais, em uma única consulta
+    
+    Args:
+        data_inicial: Data inicial (DD/MM/AAAA)
+        data_final: Data final (DD/MM/AAAA)
+        tenant: Dono das rotas (id do usuário no Telegram)
+    
+    Returns:
+        Dicionário com 'rotas' (lista de rotas), 'total' e 'quantidade'
+    """
+    cursor = get_connection().cursor()
+    
+    # SUM/COUNT como funções de janela: totais calculados no mesmo passe
+    cursor.execute('''
+        SELECT id, data, rota, carro, ilha, valor,
+               SUM(valor) OVER (), COUNT(*) OVER ()
+        FROM rotas
+        WHERE tenant = ? AND data_iso BETWEEN ? AND ?
+        ORDER BY data_iso, id
+    ''', (tenant, data_para_iso(data_inicial), data_para_iso(data_final)))
+    
+    rows = cursor.fetchall()
+    
+    return {
+        'rotas': [_rota_from_row(row) for row in rows],
+        'total': rows[0][6] if rows else 0.0,
+        'quantidade': rows[0][7] if rows else 0
+    }
+
+def get_espelho_resumo(data_inicial: str, data_final: str, tenant: int = TENANT_PADRAO) -> Dict:
+    """
+    Calcula o espelho resumido de um período pelos totais diários
+    
+    Lê só totais_diarios (no máximo uma linha por dia, carro e ilha), então
+    o custo depende do número de dias e não do número de rotas; usado para
+    períodos longos, em que listar rota a rota não faz sentido.
+    
+    Args:
+        data_inicial: Data inicial (DD/MM/AAAA)
+        data_final: Data final (DD/MM/AAAA)
+        tenant: Dono das rotas (id do usuário no Telegram)
+    
+    Returns:
+        Dicionário com 'meses' e 'carros' (listas com 'chave', 'quantidade'
+        e 'total'), 'total' e 'quantidade'
+    """
+    cursor = get_connection().cursor()
+    
+    cursor.execute('''
+        SELECT substr(data_iso, 1, 7), carro, SUM(quantidade), SUM(total)
+        FROM totais_diarios
+        WHERE tenant = ? AND data_iso BETWEEN ? AND ?
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    ''', (tenant, data_para_iso(data_inicial), data_para_iso(data_final)))
+    
+    meses: Dict[str, List] = {}
+    carros: Dict[str, List] = {}
+    for mes, carro, quantidade, total in cursor.fetchall():
+        ano, numero = mes.split('-')
+        chave_mes = f"{MESES[int(numero) - 1]}/{ano}"
+        for grupo, chave in ((meses, chave_mes), (carros, carro)):
+            soma = grupo.setdefault(chave, [0, 0.0])
+            soma[0] += quantidade
+            soma[1] += total
+    
+    return {
+        'meses': [{'chave': k, 'quantidade': q, 'total': t} for k, (q, t) in meses.items()],
+        'carros': [{'chave': k, 'quantidade': q, 'total': t} for k, (q, t) in sorted(carros.items())],
+        'total': sum(t for q, t in carros.values()),
+        'quantidade': sum(q for q, t in carros.values())
+    }
+
+def get_espelho_hoje(tenant: int = TENANT_PADRAO) -> Dict:
+    """
+    Busca as rotas de hoje junto com os totais
+    
+    Returns:
+        Dicionário no mesmo formato de get_espelho
+    """
+    hoje = datetime.now().strftime("%d/%m/%Y")
+    return get_espelho(hoje, hoje, tenant)
+
+def get_resumo_periodo(data_inicial: str, data_final: str, agrupar_por: str = 'carro',
+                       tenant: int = TENANT_PADRAO) -> List[Dict]:
+    """
+    Calcula quantidade e total de um período agrupados por carro, ilha ou dia
+    
+    Args:
+        data_inicial: Data inicial (DD/MM/AAAA)
+        data_final: Data final (DD/MM/AAAA)
+        agrupar_por: 'carro', 'ilha', 'dia' ou 'mes'
+        tenant: Dono das rotas (id do usuário no Telegram)
+    
+    Returns:
+        Lista de dicionários com 'chave', 'quantidade' e 'total'
+    """
+    if agrupar_por not in AGRUPAMENTOS:
+        raise ValueError(f"Agrupamento inválido: {agrupar_por}")
+    
+    coluna = AGRUPAMENTOS[agrupar_por]
+    cursor = get_connection().cursor()
+    
+    # Lê os totais diários, não as rotas (ver _criar_totais_diarios)
+    cursor.execute(f'''
+        SELECT {coluna}, SUM(quantidade), SUM(total)
+        FROM totais_diarios
+        WHERE tenant = ? AND data_iso BETWEEN ? AND ?
+        GROUP BY {coluna}
+        ORDER BY {coluna}
+    ''', (tenant, data_para_iso(data_inicial), data_para_iso(data_final)))
+    
+    resumo = []
+    for chave, quantidade, total in cursor.fetchall():
+        if agrupar_por == 'ilha':
+            chave = bool(chave)
+        elif agrupar_por == 'dia':
+            chave = datetime.strptime(chave, "%Y-%m-%d").strftime("%d/%m/%Y")
+        elif agrupar_por == 'mes':
+            ano, mes = chave.split('-')
+            chave = f"{MESES[int(mes) - 1]}/{ano}"
+        resumo.append({'chave': chave, 'quantidade': quantidade, 'total': total})
+    
+    return resumo
+
+def get_total_periodo(data_inicial: str, data_final: str, tenant: int = TENANT_PADRAO) -> float:
     """
     Calcula o total de valores em um período
     
     Args:
         data_inicial: Data inicial (DD/MM/AAAA)
         data_final: Data final (DD/MM/AAAA)
+        tenant: Dono das rotas (id do usuário no Telegram)
     
     Returns:
         Total dos valores no período
     """
-    rotas = get_rotas_por_periodo(data_inicial, data_final)
-    return sum(rota['valor'] for rota in rotas)
+    cursor = get_connection().cursor()
+    
+    cursor.execute('''
+        SELECT COALESCE(SUM(total), 0.0)
+        FROM totais_diarios
+        WHERE tenant = ? AND data_iso BETWEEN ? AND ?
+    ''', (tenant, data_para_iso(data_inicial), data_para_iso(data_final)))
+    
+    return cursor.fetchone()[0]
 
-def get_total_hoje() -> float:
+def get_total_hoje(tenant: int = TENANT_PADRAO) -> float:
     """
     Calcula o total de valores de hoje
     
     Returns:
         Total dos valores de hoje
     """
-    rotas = get_rotas_hoje()
-    return sum(rota['valor'] for rota in rotas)
\ No newline at end of file
+    hoje = datetime.now().strftime("%d/%m/%Y")
+    return get_total_periodo(hoje, hoje, tenant)
@@ -0,0 +1,142 @@
+"""
+Acesso assíncrono ao banco de dados para os handlers do bot
+
+As funções do módulo db são síncronas; chamá-las direto de um handler
+async trava o event loop do python-telegram-bot para todos os chats.
+Aqui elas rodam fora do loop:
+
+- escritas: uma única thread escritora (fila FIFO), evitando disputa
+  pelo lock de escrita do SQLite
+- leituras: um pool de threads leitoras, que em modo WAL não bloqueiam
+  nem são bloqueadas pela escrita
+
+Cada thread usa a sua própria conexão persistente (db.get_connection).
+A duração de cada função e a espera na fila vão para as métricas
+(roteirobot_db_segundos, ver metricas.py).
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import db
+import metricas
+
+# Quantidade de threads leitoras (configurável por variável de ambiente)
+DB_READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', 4))
+
+_leitores: Optional[ThreadPoolExecutor] = None
+_escritor: Optional[ThreadPoolExecutor] = None
+
+def configurar(pool_size: int = None):
+    """
+    Cria os executores de leitura e escrita
+    
+    Args:
+        pool_size: Número de threads leitoras (padrão: DB_READ_POOL_SIZE)
+    """
+    global _leitores, _escritor
+    
+    shutdown()
+    _leitores = ThreadPoolExecutor(
+        max_workers=pool_size or DB_READ_POOL_SIZE,
+        thread_name_prefix='db-leitor'
+    )
+    _escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-escritor')
+
+def shutdown():
+    """Encerra os executores, aguardando as operações em andamento"""
+    global _leitores, _escritor
+    
+    for executor in (_leitores, _escritor):
+        if executor is not None:
+            executor.shutdown(wait=True)
+    _leitores = None
+    _escritor = None
+
+def _medir(tipo: str, enfileirado: float, func: Callable, *args, **kwargs):
+    """Executa func na thread do executor, medindo a espera na fila e a duração"""
+    inicio = time.perf_counter()
+    metricas.DB_ESPERA.observar(inicio - enfileirado, tipo=tipo)
+    nome = getattr(func, '__name__', type(func).__name__)
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        metricas.DB_ERROS.inc(funcao=nome)
+        raise
+    finally:
+        metricas.DB_SEGUNDOS.observar(time.perf_counter() - inicio, funcao=nome, tipo=tipo)
+
+async def ler(func: Callable, *args, **kwargs):
+    """Executa uma função de leitura do db no pool de leitores"""
+    if _leitores is None:
+        configurar()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _leitores, partial(_medir, 'leitura', time.perf_counter(), func, *args, **kwargs)
+    )
+
+async def escrever(func: Callable, *args, **kwargs):
+    """Executa uma função de escrita do db na thread escritora"""
+    if _escritor is None:
+        configurar()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _escritor, partial(_medir, 'escrita', time.perf_counter(), func, *args, **kwargs)
+    )
+
+async def insert_rota(data: str, rota: str, carro: str, ilha: bool, tenant: int = db.TENANT_PADRAO) -> int:
+    """Versão assíncrona de db.insert_rota"""
+    return await escrever(db.insert_rota, data, rota, carro, ilha, tenant)
+
+async def upsert_rota(data: str, rota: str, carro: str, ilha: bool, tenant: int = db.TENANT_PADRAO) -> Dict:
+    """Versão assíncrona de db.upsert_rota"""
+    return await escrever(db.upsert_rota, data, rota, carro, ilha, tenant)
+
+async def upsert_rotas_lote(rotas: List[Tuple], tenant: int = db.TENANT_PADRAO) -> Dict:
+    """Versão assíncrona de db.upsert_rotas_lote"""
+    return await escrever(db.upsert_rotas_lote, rotas, tenant)
+
+async def delete_rota(rota_id: int, tenant: int = db.TENANT_PADRAO) -> bool:
+    """Versão assíncrona de db.delete_rota"""
+    return await escrever(db.delete_rota, rota_id, tenant)
+
+async def get_espelho(data_inicial: str, data_final: str, tenant: int = db.TENANT_PADRAO) -> Dict:
+    """Versão assíncrona de db.get_espelho"""
+    return await ler(db.get_espelho, data_inicial, data_final, tenant)
+
+async def get_espelho_resumo(data_inicial: str, data_final: str, tenant: int = db.TENANT_PADRAO) -> Dict:
+    """Versão assíncrona de db.get_espelho_resumo"""
+    return await ler(db.get_espelho_resumo, data_inicial, data_final, tenant)
+
+async def get_espelho_hoje(tenant: int = db.TENANT_PADRAO) -> Dict:
+    """Versão assíncrona de db.get_espelho_hoje"""
+    return await ler(db.get_espelho_hoje, tenant)
+
+async def get_todas_rotas(tenant: int = db.TENANT_PADRAO) -> List[Dict]:
+    """Versão assíncrona de db.get_todas_rotas"""
+    return await ler(db.get_todas_rotas, tenant)
+
+async def get_rotas_pagina(limite: int, antes: Optional[Tuple[str, int]] = None,
+                           tenant: int = db.TENANT_PADRAO) -> Dict:
+    """Versão assíncrona de db.get_rotas_pagina"""
+    return await ler(db.get_rotas_pagina, limite, antes, tenant)
+
+async def get_versao_dados(tenant: int = db.TENANT_PADRAO) -> int:
+    """Versão assíncrona de db.versao_dados"""
+    return await ler(db.versao_dados, tenant)
+
+async def get_tarifas_vigentes(data: str = None) -> Dict[str, Tuple[float, float]]:
+    """Versão assíncrona de db.tarifas_vigentes"""
+    return await ler(db.tarifas_vigentes, data)
+
+async def calcular_valores(rotas: List[Tuple]) -> List[float]:
+    """Versão assíncrona de db.calcular_valores"""
+    return await ler(db.calcular_valores, rotas)
+
+async def get_rotas_recentes(limite: int = 6, tenant: int = db.TENANT_PADRAO) -> List[str]:
+    """Versão assíncrona de db.get_rotas_recentes"""
+    return await ler(db.get_rotas_recentes, limite, tenant)
@@ -0,0 +1,247 @@
+"""
+Limites de envio para a API do Telegram
+
+O Telegram aceita cerca de 30 mensagens por segundo no total, 1 por segundo
+no mesmo chat privado e 20 por minuto no mesmo grupo; acima disso responde
+429 (RetryAfter). LimitadorEnvio é o rate limiter do python-telegram-bot
+usado pelo bot (toda chamada à API passa por ele):
+
+- Baldes de tokens: um global e um por chat. Cada envio reserva um token;
+  sem token disponível, o envio espera a sua vez em vez de falhar.
+- RetryAfter: se mesmo assim o Telegram pedir para esperar, o chat (ou o bot
+  todo) pausa pelo tempo pedido e o envio é repetido, até
+  ENVIO_MAX_TENTATIVAS vezes.
+- Junção: mensagens de texto simples para o mesmo chat que chegam enquanto
+  a anterior espera a vez são enviadas como uma só (até o limite de 4096
+  caracteres). Cada chamador recebe a mensagem enviada.
+
+A duração e os erros de cada chamada à API vão para as métricas
+(roteirobot_telegram_api_segundos, ver metricas.py).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# Limites do Telegram (mensagens por segundo)
+ENVIO_GLOBAL_POR_SEGUNDO = float(os.environ.get('ENVIO_GLOBAL_POR_SEGUNDO', 30))
+ENVIO_CHAT_POR_SEGUNDO = float(os.environ.get('ENVIO_CHAT_POR_SEGUNDO', 1))
+ENVIO_GRUPO_POR_SEGUNDO = float(os.environ.get('ENVIO_GRUPO_POR_SEGUNDO', 20 / 60))
+
+# Tentativas de um envio que recebeu RetryAfter
+ENVIO_MAX_TENTATIVAS = int(os.environ.get('ENVIO_MAX_TENTATIVAS', 3))
+
+# Tamanho máximo de uma mensagem de texto
+TAMANHO_MAX_MENSAGEM = 4096
+
+# Separador entre mensagens juntadas
+SEPARADOR_JUNCAO = "\n\n"
+
+# Parâmetros de sendMessage que permitem juntar mensagens (texto simples)
+PARAMETROS_JUNTAVEIS = {'chat_id', 'text'}
+
+class BaldeTokens:
+    """
+    Balde de tokens que reserva a vez de cada envio
+    
+    O saldo pode ficar negativo: cada reserva recebe quanto tempo esperar
+    para respeitar a taxa, e os envios saem na ordem das reservas.
+    """
+    
+    def __init__(self, taxa: float, capacidade: float, agora: Optional[float] = None):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado = time.monotonic() if agora is None else agora
+    
+    def reservar(self, agora: float) -> float:
+        """Reserva um token e retorna a espera (s) até ele estar disponível"""
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.taxa
+    
+    def ocioso(self, agora: float) -> bool:
+        """True se o balde já estaria cheio (pode ser descartado)"""
+        return self.tokens + (agora - self.atualizado) * self.taxa >= self.capacidade
+
+class _Juncao:
+    """Mensagens de texto para um chat esperando a vez de sair juntas"""
+    
+    def __init__(self, texto: str):
+        self.textos: List[str] = [texto]
+        self.tamanho = len(texto)
+        self.resultado = asyncio.get_running_loop().create_future()
+    
+    def cabe(self, texto: str) -> bool:
+        return self.tamanho + len(SEPARADOR_JUNCAO) + len(texto) <= TAMANHO_MAX_MENSAGEM
+    
+    def adicionar(self, texto: str):
+        self.textos.append(texto)
+        self.tamanho += len(SEPARADOR_JUNCAO) + len(texto)
+
+class LimitadorEnvio(BaseRateLimiter):
+    """Rate limiter com baldes global e por chat, RetryAfter e junção de mensagens"""
+    
+    # Baldes por chat guardados antes de descartar os ociosos
+    MAX_BALDES = 1000
+    
+    def __init__(self, global_por_segundo: float = ENVIO_GLOBAL_POR_SEGUNDO,
+                 chat_por_segundo: float = ENVIO_CHAT_POR_SEGUNDO,
+                 grupo_por_segundo: float = ENVIO_GRUPO_POR_SEGUNDO,
+                 max_tentativas: int = ENVIO_MAX_TENTATIVAS):
+        self.balde_global = BaldeTokens(global_por_segundo, global_por_segundo)
+        self.chat_por_segundo = chat_por_segundo
+        self.grupo_por_segundo = grupo_por_segundo
+        self.max_tentativas = max_tentativas
+        self.baldes: Dict[Any, BaldeTokens] = {}
+        # Pausas pedidas pelo Telegram (RetryAfter): chat (None = todos) -> até quando
+        self.pausas: Dict[Any, float] = {}
+        # Junção aberta de cada chat (só enquanto for o último envio reservado)
+        self.juncoes: Dict[Any, _Juncao] = {}
+        self.enviados = 0
+        self.juntados = 0
+        self.retry_after = 0
+        self.espera_total = 0.0
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass
+    
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Any],
+    ) -> Any:
+        """Espera a vez do envio (ou junta com o anterior) e chama a API"""
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            # Sem chat (ex: answerCallbackQuery): só respeita pausas globais
+            await self._esperar(self._pausa(None))
+            return await self._chamar(callback, args, kwargs, endpoint, None)
+        
+        por_chat = endpoint.startswith('send')
+        juntavel = endpoint == 'sendMessage' and set(data) <= PARAMETROS_JUNTAVEIS
+        
+        if juntavel:
+            juncao = self.juncoes.get(chat_id)
+            if juncao is not None and juncao.cabe(data['text']):
+                juncao.adicionar(data['text'])
+                self.juntados += 1
+                return await asyncio.shield(juncao.resultado)
+        
+        espera = self._reservar(chat_id, por_chat)
+        
+        if not juntavel:
+            # Um envio de outro tipo fecha a junção: as mensagens seguintes saem depois dele
+            self.juncoes.pop(chat_id, None)
+            await self._esperar(espera)
+            return await self._chamar(callback, args, kwargs, endpoint, chat_id)
+        
+        juncao = self.juncoes[chat_id] = _Juncao(data['text'])
+        try:
+            try:
+                await self._esperar(espera)
+            finally:
+                if self.juncoes.get(chat_id) is juncao:
+                    del self.juncoes[chat_id]
+            
+            dados = dict(data, text=SEPARADOR_JUNCAO.join(juncao.textos))
+            resultado = await self._chamar(callback, (args[0], dados), kwargs, endpoint, chat_id)
+        except asyncio.CancelledError:
+            juncao.resultado.cancel()
+            raise
+        except BaseException as e:
+            # As mensagens juntadas falham junto
+            juncao.resultado.set_exception(e)
+            # Marca a exceção como recuperada (este chamador já a recebe pelo raise)
+            juncao.resultado.exception()
+            raise
+        
+        juncao.resultado.set_result(resultado)
+        return resultado
+    
+    def _balde_chat(self, chat_id: Any, agora: float) -> BaldeTokens:
+        """Balde do chat (grupos têm id negativo e limite menor)"""
+        balde = self.baldes.get(chat_id)
+        if balde is None:
+            if len(self.baldes) >= self.MAX_BALDES:
+                for chave in [c for c, b in self.baldes.items() if b.ocioso(agora)]:
+                    del self.baldes[chave]
+            
+            grupo = str(chat_id).startswith('-')
+            balde = self.baldes[chat_id] = BaldeTokens(
+                self.grupo_por_segundo if grupo else self.chat_por_segundo, 1, agora
+            )
+        return balde
+    
+    def _reservar(self, chat_id: Any, por_chat: bool) -> float:
+        """Reserva os tokens de um envio e retorna quanto esperar"""
+        agora = time.monotonic()
+        espera = max(self.balde_global.reservar(agora), self._pausa(chat_id))
+        if por_chat:
+            espera = max(espera, self._balde_chat(chat_id, agora).reservar(agora))
+        return espera
+    
+    def _pausa(self, chat_id: Any) -> float:
+        """Tempo restante das pausas pedidas pelo Telegram para o chat e globais"""
+        agora = time.monotonic()
+        fim = max(self.pausas.get(None, 0.0), self.pausas.get(chat_id, 0.0) if chat_id is not None else 0.0)
+        return max(0.0, fim - agora)
+    
+    async def _esperar(self, espera: float):
+        if espera > 0:
+            self.espera_total += espera
+            await asyncio.sleep(espera)
+    
+    async def _chamar(self, callback, args, kwargs, endpoint: str, chat_id: Any):
+        """Chama a API, repetindo após o tempo pedido em caso de RetryAfter"""
+        for tentativa in range(1, self.max_tentativas + 1):
+            inicio = time.perf_counter()
+            try:
+                resultado = await callback(*args, **kwargs)
+                self.enviados += 1
+                return resultado
+            except RetryAfter as e:
+                metricas.TELEGRAM_ERROS.inc(endpoint=endpoint, erro='RetryAfter')
+                self.retry_after += 1
+                retry = e.retry_after
+                segundos = retry.total_seconds() if isinstance(retry, timedelta) else float(retry)
+                logger.warning(f"Telegram pediu espera de {segundos:.0f}s (chat {chat_id}, tentativa {tentativa})")
+                
+                if tentativa == self.max_tentativas:
+                    raise
+            except Exception as e:
+                metricas.TELEGRAM_ERROS.inc(endpoint=endpoint, erro=type(e).__name__)
+                raise
+            finally:
+                metricas.TELEGRAM_SEGUNDOS.observar(time.perf_counter() - inicio, endpoint=endpoint)
+            
+            self.pausas[chat_id] = time.monotonic() + segundos
+            await self._esperar(self._pausa(chat_id))
+    
+    def estatisticas(self) -> Dict:
+        """Retorna os contadores de envio"""
+        return {
+            'enviados': self.enviados,
+            'juntados': self.juntados,
+            'retry_after': self.retry_after,
+            'espera_total_s': round(self.espera_total, 1),
+            'chats': len(self.baldes),
+        }
@@ -0,0 +1,139 @@
+"""
+Exportação do espelho de um período como arquivo (CSV ou XLSX)
+
+As rotas são lidas do banco em lotes (db.iterar_rotas_periodo) e escritas
+direto em um SpooledTemporaryFile, que fica na memória até
+EXPORTAR_SPOOL_BYTES e depois passa para o disco. Assim a memória usada
+depende do tamanho do lote, não do tamanho do período.
+
+gerar_arquivo é síncrona e deve rodar fora do event loop (db_async.ler).
+"""
+
+import codecs
+import csv
+import os
+from datetime import date
+from tempfile import SpooledTemporaryFile
+from typing import Dict
+
+from db import iterar_rotas_periodo, normalizar_data, TENANT_PADRAO
+
+# Linhas lidas do banco por vez
+EXPORTAR_LOTE = int(os.environ.get('EXPORTAR_LOTE', 1000))
+
+# A partir deste tamanho o arquivo temporário sai da memória para o disco
+EXPORTAR_SPOOL_BYTES = int(os.environ.get('EXPORTAR_SPOOL_BYTES', 4 * 1024 * 1024))
+
+# Limite de tamanho de documento enviado por bots no Telegram
+EXPORTAR_MAX_BYTES = 50 * 1024 * 1024
+
+FORMATOS = ('csv', 'xlsx')
+
+# Mesmos nomes de coluna aceitos por importar_rotas.py
+CABECALHO = ['data', 'rota', 'carro', 'ilha', 'valor', 'id']
+
+# Primeira célula da linha de total (importar_rotas.py pula essa linha)
+ROTULO_TOTAL = 'Total'
+
+def gerar_arquivo(data_inicial: str, data_final: str, formato: str = 'csv',
+                  tenant: int = TENANT_PADRAO) -> Dict:
+    """
+    Gera o arquivo com as rotas e o total de um período
+    
+    Args:
+        data_inicial: Data inicial (DD/MM/AAAA)
+        data_final: Data final (DD/MM/AAAA)
+        formato: 'csv' ou 'xlsx'
+        tenant: Dono das rotas (id do usuário no Telegram)
+    
+    Returns:
+        Dicionário com 'arquivo' (SpooledTemporaryFile posicionado no
+        início; quem chama deve fechá-lo), 'nome', 'tamanho', 'quantidade'
+        e 'total'
+    
+    Raises:
+        ValueError: Se o formato ou as datas forem inválidos
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (use {' ou '.join(FORMATOS)})")
+    
+    inicio_iso = normalizar_data(data_inicial)[1]
+    fim_iso = normalizar_data(data_final)[1]
+    
+    rotas = iterar_rotas_periodo(data_inicial, data_final, tenant, EXPORTAR_LOTE)
+    arquivo = SpooledTemporaryFile(max_size=EXPORTAR_SPOOL_BYTES, mode='w+b')
+    
+    try:
+        if formato == 'csv':
+            quantidade, total = _escrever_csv(arquivo, rotas)
+        else:
+            quantidade, total = _escrever_xlsx(arquivo, rotas)
+    except BaseException:
+        arquivo.close()
+        raise
+    
+    tamanho = arquivo.tell()
+    arquivo.seek(0)
+    
+    return {
+        'arquivo': arquivo,
+        'nome': f"espelho_{inicio_iso}_{fim_iso}.{formato}",
+        'tamanho': tamanho,
+        'quantidade': quantidade,
+        'total': total
+    }
+
+def _escrever_csv(arquivo, rotas) -> tuple:
+    """
+    Escreve o CSV (separador ';', vírgula decimal, UTF-8 com BOM)
+    
+    Esse é o formato que o Excel em português abre direto, com acentos e
+    valores numéricos corretos.
+    """
+    saida = codecs.getwriter('utf-8')(arquivo)
+    saida.write('\ufeff')
+    writer = csv.writer(saida, delimiter=';', lineterminator='\r\n')
+    writer.writerow(CABECALHO)
+    
+    quantidade, total = 0, 0.0
+    for rota_id, data, rota, carro, ilha, valor, data_iso in rotas:
+        writer.writerow([
+            data, rota, carro, 'Sim' if ilha else 'Não',
+            f"{valor:.2f}".replace('.', ','), rota_id
+        ])
+        quantidade += 1
+        total += valor
+    
+    writer.writerow([])
+    writer.writerow([ROTULO_TOTAL, f"{quantidade} rota(s)", '', '', f"{total:.2f}".replace('.', ','), ''])
+    return quantidade, total
+
+def _escrever_xlsx(arquivo, rotas) -> tuple:
+    """
+    Escreve o XLSX com um workbook write-only (linhas não ficam na memória)
+    
+    Requer openpyxl, importado aqui para não pesar na inicialização do bot.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("Para exportar XLSX instale o openpyxl: pip install openpyxl")
+    
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet('Espelho')
+    planilha.append(CABECALHO)
+    
+    quantidade, total = 0, 0.0
+    for rota_id, data, rota, carro, ilha, valor, data_iso in rotas:
+        planilha.append([
+            date.fromisoformat(data_iso) if data_iso else data,
+            rota, carro, 'Sim' if ilha else 'Não', valor, rota_id
+        ])
+        quantidade += 1
+        total += valor
+    
+    planilha.append([])
+    planilha.append([ROTULO_TOTAL, f"{quantidade} rota(s)", None, None, total, None])
+    
+    workbook.save(arquivo)
+    return quantidade, total
@@ -8,6 +8,7 @@ import asyncio
 import logging
 from telegram import Bot
 from config import TELEGRAM_BOT_TOKEN
+from limpar_updates import limpar_estado_bot
 
 # Configuração de logging
 logging.basicConfig(
@@ -30,64 +31,17 @@ async def fix_bot_conflict():
         
         print("🔧 Iniciando correção agressiva de conflitos...")
         
-        # 1. Remove webhook se existir
-        print("📡 Removendo webhook...")
-        await bot.delete_webhook(drop_pending_updates=True)
+        # 1. Remove webhook e limpa updates pendentes de uma só vez
+        print("📡 Removendo webhook e limpando updates pendentes...")
+        duracao = await limpar_estado_bot(bot)
+        print(f"✅ Limpeza concluída em {duracao * 1000:.0f} ms")
         
-        # 2. Aguarda um pouco
-        print("⏳ Aguardando 3 segundos...")
-        await asyncio.sleep(3)
-        
-        # 3. Limpa updates pendentes de forma mais agressiva
-        print("🧹 Limpando updates pendentes...")
-        total_cleaned = 0
-        
-        # Múltiplas tentativas de limpeza
-        for attempt in range(3):
-            try:
-                updates = await bot.get_updates(limit=100, timeout=1)
-                if updates:
-                    print(f"📨 Tentativa {attempt + 1}: {len(updates)} updates encontrados")
-                    
-                    # Processa todos os updates para limpar a fila
-                    for update in updates:
-                        try:
-                            await bot.get_updates(
-                                offset=update.update_id + 1, 
-                                limit=1, 
-                                timeout=1
-                            )
-                            total_cleaned += 1
-                        except Exception as e:
-                            logger.warning(f"Erro ao processar update {update.update_id}: {e}")
-                    
-                    # Aguarda entre tentativas
-                    if attempt < 2:
-                        await asyncio.sleep(2)
-                else:
-                    print(f"✅ Tentativa {attempt + 1}: Nenhum update pendente")
-                    break
-                    
-            except Exception as e:
-                print(f"⚠️ Erro na tentativa {attempt + 1}: {e}")
-                if attempt < 2:
-                    await asyncio.sleep(2)
-        
-        if total_cleaned > 0:
-            print(f"✅ Total de {total_cleaned} updates limpos")
-        else:
-            print("✅ Nenhum update pendente encontrado")
-        
-        # 4. Aguarda mais um pouco
-        print("⏳ Aguardando 2 segundos...")
-        await asyncio.sleep(2)
-        
-        # 5. Verifica informações do bot
+        # 2. Verifica informações do bot
         print("🤖 Verificando informações do bot...")
         bot_info = await bot.get_me()
         print(f"✅ Bot conectado: @{bot_info.username} ({bot_info.first_name})")
         
-        # 6. Verificação final
+        # 3. Verificação final
         print("🔍 Verificação final...")
         final_updates = await bot.get_updates(limit=1, timeout=1)
         if final_updates:
@@ -1,14 +1,40 @@
+import calendar
 import re
-from datetime import datetime
-from telegram import Update
+from datetime import datetime, date, timedelta
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram.constants import ChatAction, MessageLimit
 from telegram.ext import ContextTypes, ConversationHandler
-from db import (
-    init_database, insert_rota, get_rotas_por_periodo, get_rotas_hoje, 
-    get_todas_rotas, delete_rota, get_total_periodo, get_total_hoje
+from db import data_para_iso, calcular_valor, normalizar_rota, MESES
+from db_async import (
+    ler, upsert_rota, upsert_rotas_lote, delete_rota, get_espelho, get_espelho_resumo, get_espelho_hoje,
+    get_rotas_pagina, get_rotas_recentes, get_versao_dados, get_tarifas_vigentes, calcular_valores
 )
+from cache import relatorios
+from exportar import gerar_arquivo, FORMATOS, EXPORTAR_MAX_BYTES
+from pdf_espelho import fila_pdf
+from registro_rapido import LeitorRotas
 
 # Estados da conversa para o comando /rota
-DATA, ROTA, CARRO, ILHA = range(4)
+DATA, ROTA, CARRO = range(3)
+
+# Nomes de rota recentes oferecidos como botões no /rota
+ROTAS_RECENTES = 6
+
+BOTAO_CANCELAR_ROTA = InlineKeyboardButton("❌ Cancelar", callback_data="rota:cancelar")
+
+# Quantidade de rotas por página no comando /todas
+TODAS_POR_PAGINA = 20
+
+# Máximo de rotas registradas por um /r ou /lote
+RAPIDO_MAX_ROTAS = 60
+
+# Períodos maiores que isto (em dias) mostram o espelho resumido por mês,
+# calculado pelos totais diários, em vez de listar rota a rota
+ESPELHO_DETALHADO_MAX_DIAS = 31
+
+def _tenant(update: Update) -> int:
+    """Dono dos dados consultados/gravados: o usuário do Telegram que enviou o update"""
+    return update.effective_user.id
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Comando /start - Mensagem de boas-vindas"""
@@ -17,14 +43,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 *Comandos disponíveis:*
 /rota - Registrar nova rota
+/r [data] [rota] [carro] [ilha] - Registrar rotas em uma linha
+/lote - Registrar várias rotas, uma por linha
 /espelho [data_inicial] [data_final] - Consultar espelho de pagamento
 /hoje - Ver rotas de hoje
 /todas - Listar todas as rotas
+/exportar [data_inicial] [data_final] [csv|xlsx|pdf] - Baixar espelho em arquivo
 /deletar [id] - Remover rota por ID
 /help - Mostrar esta ajuda
 
 *Exemplo de uso:*
 /espelho 01/09/2025 07/09/2025
+/r hoje P10-AM van ilha
 /deletar 5
 
 Digite /rota para começar a registrar uma nova rota! 🚀
@@ -42,38 +72,194 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
    • Pergunta: data, nome da rota, carro, se teve ilha
    • Calcula valor automaticamente
 
+📝 `/lote` - Várias rotas, uma por linha
+   • Exemplo: /lote e nas linhas seguintes "01/09 P10-AM van ilha", "02/09 G20-PM fio"...
+   • Grava tudo de uma vez só se todas as linhas estiverem certas
+
+⚡ `/r [data] [rota] [carro] [ilha]` - Registro rápido
+   • Exemplo: /r hoje P10-AM van ilha
+   • Várias rotas de uma vez: /r ontem P10-AM v i G20-PM fio
+   • Carro: van (v) ou fiorino (f, fio); data: hoje, ontem, DD/MM ou DD/MM/AAAA
+
 📊 `/espelho [data_inicial] [data_final]` - Espelho de pagamento
    • Exemplo: /espelho 01/09/2025 07/09/2025
    • Mostra rotas do período + total
+   • Períodos acima de 31 dias mostram o resumo por mês
 
 📅 `/hoje` - Rotas de hoje
    • Lista todas as rotas da data atual
 
 📋 `/todas` - Todas as rotas
-   • Lista todas as rotas cadastradas
+   • Lista as suas rotas cadastradas, 20 por página
+   • Use os botões para navegar entre as páginas
+
+📎 `/exportar [data_inicial] [data_final] [csv|xlsx|pdf]` - Espelho em arquivo
+   • Exemplo: /exportar 01/09/2025 30/09/2025 xlsx
+   • Envia todas as rotas do período + total como documento (padrão: csv)
 
 🗑️ `/deletar [id]` - Remover rota
    • Exemplo: /deletar 5
 
 *Valores:*
-• Van: R$ 130
-• Fiorino: R$ 110
-• +R$ 10 se teve entrega em ilha
-    """
+""" + _formatar_tarifas(await get_tarifas_vigentes())
     await update.message.reply_text(help_message, parse_mode='Markdown')
 
+def _formatar_tarifas(tarifas: dict) -> str:
+    """Monta a lista de valores do /help a partir das tarifas vigentes hoje"""
+    if not tarifas:
+        return "• Nenhuma tarifa vigente\n"
+    
+    adicionais = {adicional for valor, adicional in tarifas.values()}
+    linhas = []
+    for carro, (valor, adicional) in sorted(tarifas.items()):
+        extra = f" (+R$ {adicional:g} com ilha)" if len(adicionais) > 1 else ""
+        linhas.append(f"• {carro.capitalize()}: R$ {valor:g}{extra}")
+    if len(adicionais) == 1:
+        linhas.append(f"• +R$ {adicionais.pop():g} se teve entrega em ilha")
+    
+    return "\n".join(linhas) + "\n"
+
+def _teclado_data() -> InlineKeyboardMarkup:
+    """Botões da data da rota: hoje, ontem ou calendário"""
+    hoje = date.today()
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("📅 Hoje", callback_data="rota:data:hoje"),
+            InlineKeyboardButton("⏪ Ontem", callback_data="rota:data:ontem"),
+        ],
+        [InlineKeyboardButton("🗓️ Outra data", callback_data=f"rota:cal:{hoje.year}-{hoje.month:02d}")],
+        [BOTAO_CANCELAR_ROTA],
+    ])
+
+def _teclado_calendario(ano: int, mes: int) -> InlineKeyboardMarkup:
+    """Calendário de um mês (semana começando na segunda) com navegação"""
+    anterior = (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+    seguinte = (ano, mes + 1) if mes < 12 else (ano + 1, 1)
+    
+    linhas = [
+        [
+            InlineKeyboardButton("◀️", callback_data=f"rota:cal:{anterior[0]}-{anterior[1]:02d}"),
+            InlineKeyboardButton(f"{MESES[mes - 1]} {ano}", callback_data="rota:nada"),
+            InlineKeyboardButton("▶️", callback_data=f"rota:cal:{seguinte[0]}-{seguinte[1]:02d}"),
+        ],
+        [InlineKeyboardButton(dia, callback_data="rota:nada") for dia in "STQQSSD"],
+    ]
+    for semana in calendar.monthcalendar(ano, mes):
+        linhas.append([
+            InlineKeyboardButton(str(dia), callback_data=f"rota:data:{ano}-{mes:02d}-{dia:02d}")
+            if dia else InlineKeyboardButton(" ", callback_data="rota:nada")
+            for dia in semana
+        ])
+    linhas.append([BOTAO_CANCELAR_ROTA])
+    return InlineKeyboardMarkup(linhas)
+
+def _teclado_rotas(recentes: list) -> InlineKeyboardMarkup:
+    """Botões com os nomes de rota usados recentemente (dois por linha)"""
+    botoes = [
+        InlineKeyboardButton(f"🚛 {nome}", callback_data=f"rota:nome:{indice}")
+        for indice, nome in enumerate(recentes)
+    ]
+    linhas = [botoes[i:i + 2] for i in range(0, len(botoes), 2)]
+    linhas.append([BOTAO_CANCELAR_ROTA])
+    return InlineKeyboardMarkup(linhas)
+
+def _teclado_carro(tarifas: dict) -> InlineKeyboardMarkup:
+    """Botões de carro e ilha juntos, já com o valor de cada opção"""
+    linhas = [
+        [
+            InlineKeyboardButton(f"🚐 {carro.capitalize()} R$ {valor:g}", callback_data=f"rota:carro:{carro}:0"),
+            InlineKeyboardButton(f"🏝️ + ilha R$ {valor + adicional:g}", callback_data=f"rota:carro:{carro}:1"),
+        ]
+        for carro, (valor, adicional) in sorted(tarifas.items())
+    ]
+    linhas.append([BOTAO_CANCELAR_ROTA])
+    return InlineKeyboardMarkup(linhas)
+
+def _texto_rota(dados: dict, pergunta: str) -> str:
+    """Texto da mensagem do /rota: o que já foi escolhido e a próxima pergunta"""
+    linhas = ["🚛 Registro de Nova Rota", ""]
+    if 'data' in dados:
+        linhas.append(f"📅 Data: {dados['data']}")
+    if 'rota' in dados:
+        linhas.append(f"🚛 Rota: {dados['rota']}")
+    if len(linhas) > 2:
+        linhas.append("")
+    linhas.append(pergunta)
+    return "\n".join(linhas)
+
+async def _editar_rota(context: ContextTypes.DEFAULT_TYPE, texto: str,
+                       teclado: InlineKeyboardMarkup = None) -> None:
+    """Edita a mensagem do /rota (respostas digitadas não têm callback para editar)"""
+    chat_id, message_id = context.user_data['rota_mensagem']
+    await context.bot.edit_message_text(texto, chat_id=chat_id, message_id=message_id, reply_markup=teclado)
+
 async def rota_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Inicia o processo de registro de rota"""
-    await update.message.reply_text(
-        "🚛 *Registro de Nova Rota*\n\n"
-        "Qual a data da rota?\n"
-        "📅 Digite no formato DD/MM/AAAA ou 'hoje'",
-        parse_mode='Markdown'
+    context.user_data.clear()
+    mensagem = await update.message.reply_text(
+        _texto_rota({}, "Qual a data da rota?\n📅 Escolha abaixo ou digite DD/MM/AAAA"),
+        reply_markup=_teclado_data()
+    )
+    context.user_data['rota_mensagem'] = (mensagem.chat_id, mensagem.message_id)
+    return DATA
+
+async def _pedir_rota(update: Update, context: ContextTypes.DEFAULT_TYPE, data: str) -> int:
+    """Guarda a data e pergunta o nome da rota, oferecendo as recentes como botões"""
+    context.user_data['data'] = data
+    recentes = await get_rotas_recentes(ROTAS_RECENTES, _tenant(update))
+    context.user_data['recentes'] = recentes
+    
+    pergunta = "Qual o nome da rota?\n🚛 Digite (ex: P10-AM, G20-PM)"
+    if recentes:
+        pergunta += " ou escolha uma recente"
+    await _editar_rota(context, _texto_rota(context.user_data, pergunta), _teclado_rotas(recentes))
+    return ROTA
+
+async def _pedir_carro(context: ContextTypes.DEFAULT_TYPE, rota: str) -> int:
+    """Guarda o nome da rota e pergunta o carro e a ilha"""
+    context.user_data['rota'] = rota
+    tarifas = await get_tarifas_vigentes(context.user_data['data'])
+    
+    if not tarifas:
+        context.user_data.clear()
+        await _editar_rota(context, "❌ Não há tarifa cadastrada para esta data.")
+        return ConversationHandler.END
+    
+    await _editar_rota(
+        context,
+        _texto_rota(context.user_data, "Qual o carro? Teve entrega em ilha?"),
+        _teclado_carro(tarifas)
     )
+    return CARRO
+
+async def rota_data_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Botões de data do /rota (hoje, ontem ou dia do calendário)"""
+    query = update.callback_query
+    await query.answer()
+    
+    # callback_data: "rota:data:hoje", "rota:data:ontem" ou "rota:data:<AAAA-MM-DD>"
+    escolha = query.data.split(":", 2)[2]
+    if escolha == "hoje":
+        dia = date.today()
+    elif escolha == "ontem":
+        dia = date.today() - timedelta(days=1)
+    else:
+        dia = date.fromisoformat(escolha)
+    
+    return await _pedir_rota(update, context, dia.strftime("%d/%m/%Y"))
+
+async def rota_calendario_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Botões do /rota que abrem o calendário ou trocam o mês"""
+    query = update.callback_query
+    await query.answer()
+    
+    # callback_data: "rota:cal:<AAAA-MM>"
+    ano, mes = query.data.split(":", 2)[2].split("-")
+    await query.edit_message_reply_markup(_teclado_calendario(int(ano), int(mes)))
     return DATA
 
 async def rota_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Processa a data da rota"""
+    """Processa a data da rota digitada"""
     data_input = update.message.text.strip()
     
     if data_input.lower() == "hoje":
@@ -84,106 +270,96 @@ async def rota_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             datetime.strptime(data_input, "%d/%m/%Y")
             data = data_input
         except ValueError:
-            await update.message.reply_text(
-                "❌ Formato de data inválido!\n"
-                "📅 Use DD/MM/AAAA ou digite 'hoje'"
+            await _editar_rota(
+                context,
+                _texto_rota({}, "❌ Formato de data inválido!\n📅 Escolha abaixo ou digite DD/MM/AAAA"),
+                _teclado_data()
             )
             return DATA
     
-    context.user_data['data'] = data
+    return await _pedir_rota(update, context, data)
+
+async def rota_nome_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Botões do /rota com os nomes de rota recentes"""
+    query = update.callback_query
+    await query.answer()
     
-    await update.message.reply_text(
-        f"📅 Data: {data}\n\n"
-        "Qual o nome da rota?\n"
-        "🚛 Exemplo: P10-AM, G20-PM, I7-AM"
-    )
-    return ROTA
+    # callback_data: "rota:nome:<índice em user_data['recentes']>"
+    indice = int(query.data.split(":", 2)[2])
+    return await _pedir_carro(context, context.user_data['recentes'][indice])
 
 async def rota_nome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Processa o nome da rota"""
-    rota = update.message.text.strip()
-    context.user_data['rota'] = rota
-    
-    await update.message.reply_text(
-        f"🚛 Rota: {rota}\n\n"
-        "Qual o carro usado?\n"
-        "🚐 Digite: Van ou Fiorino"
-    )
-    return CARRO
+    """Processa o nome da rota digitado"""
+    return await _pedir_carro(context, update.message.text.strip())
 
 async def rota_carro(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Processa o tipo de carro"""
-    carro = update.message.text.strip().lower()
-    
-    if carro not in ['van', 'fiorino']:
-        await update.message.reply_text(
-            "❌ Tipo de carro inválido!\n"
-            "🚐 Digite: Van ou Fiorino"
-        )
-        return CARRO
-    
-    context.user_data['carro'] = carro.capitalize()
-    
-    await update.message.reply_text(
-        f"🚐 Carro: {carro.capitalize()}\n\n"
-        "Teve entrega em ilha?\n"
-        "🏝️ Digite: Sim ou Não"
-    )
-    return ILHA
+    """Texto digitado quando o /rota espera os botões de carro"""
+    await update.message.reply_text("👆 Escolha o carro (e se teve ilha) nos botões da mensagem acima.")
+    return CARRO
 
-async def rota_ilha(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Processa se teve entrega em ilha e finaliza o registro"""
-    ilha_input = update.message.text.strip().lower()
+async def rota_carro_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Botões de carro/ilha do /rota: grava a rota e finaliza o registro"""
+    query = update.callback_query
+    await query.answer()
     
-    if ilha_input not in ['sim', 'não', 'nao', 's', 'n']:
-        await update.message.reply_text(
-            "❌ Resposta inválida!\n"
-            "🏝️ Digite: Sim ou Não"
-        )
-        return ILHA
+    # callback_data: "rota:carro:<carro>:<1 se teve ilha>"
+    _, _, carro, ilha = query.data.split(":")
+    ilha = ilha == "1"
+    dados = context.user_data
     
-    ilha = ilha_input in ['sim', 's']
-    
-    # Salva no banco de dados
     try:
-        rota_id = insert_rota(
-            context.user_data['data'],
-            context.user_data['rota'],
-            context.user_data['carro'],
-            ilha
-        )
+        resultado = await upsert_rota(dados['data'], dados['rota'], carro.capitalize(), ilha, tenant=_tenant(update))
         
-        # Calcula valor para exibição
-        valor_base = 130 if context.user_data['carro'].lower() == "van" else 110
-        valor_final = valor_base + (10 if ilha else 0)
+        # Mesma data e rota já registradas: atualiza em vez de duplicar
+        titulo = {
+            'inserida': "✅ Rota registrada com sucesso!",
+            'atualizada': "🔄 Rota já registrada nesta data - dados atualizados!",
+            'ignorada': "ℹ️ Rota já registrada nesta data com os mesmos dados.",
+        }[resultado['status']]
         
-        ilha_texto = "Sim" if ilha else "Não"
-        
-        await update.message.reply_text(
-            f"✅ Rota registrada com sucesso!\n\n"
-            f"🆔 ID: {rota_id}\n"
-            f"📅 Data: {context.user_data['data']}\n"
-            f"🚛 Rota: {context.user_data['rota']}\n"
-            f"🚐 Carro: {context.user_data['carro']}\n"
-            f"🏝️ Ilha: {ilha_texto}\n"
-            f"💰 Valor: R$ {valor_final:.2f}"
+        await query.edit_message_text(
+            f"{titulo}\n\n"
+            f"🆔 ID: {resultado['id']}\n"
+            f"📅 Data: {dados['data']}\n"
+            f"🚛 Rota: {dados['rota']}\n"
+            f"🚐 Carro: {carro.capitalize()}\n"
+            f"🏝️ Ilha: {'Sim' if ilha else 'Não'}\n"
+            f"💰 Valor: R$ {resultado['valor']:.2f}"
         )
-        
+    
     except Exception as e:
-        await update.message.reply_text(
-            f"❌ Erro ao registrar rota: {str(e)}"
-        )
+        await query.edit_message_text(f"❌ Erro ao registrar rota: {str(e)}")
     
     # Limpa dados da conversa
     context.user_data.clear()
     return ConversationHandler.END
 
+async def rota_nada_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Botões sem ação do calendário (título do mês, dias da semana, vazios)"""
+    await update.callback_query.answer()
+
 async def rota_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancela o registro de rota"""
     context.user_data.clear()
     await update.message.reply_text("❌ Registro de rota cancelado.")
     return ConversationHandler.END
 
+async def rota_cancelar_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Botão de cancelar do /rota"""
+    query = update.callback_query
+    await query.answer()
+    context.user_data.clear()
+    await query.edit_message_text("❌ Registro de rota cancelado.")
+    return ConversationHandler.END
+
+async def rota_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/rota abandonado por mais de ROTA_TIMEOUT segundos: descarta os dados da conversa"""
+    context.user_data.clear()
+
+async def rota_expirada_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Botões de um /rota que já terminou (ou de antes de reiniciar o bot)"""
+    await update.callback_query.answer("⌛ Este registro já terminou. Use /rota para começar outro.")
+
 async def espelho_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Comando /espelho - Mostra espelho de pagamento por período"""
     if not context.args or len(context.args) != 2:
@@ -209,85 +385,178 @@ async def espelho_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
     
     try:
-        rotas = get_rotas_por_periodo(data_inicial, data_final)
-        total = get_total_periodo(data_inicial, data_final)
-        
-        if not rotas:
-            await update.message.reply_text(
-                f"📅 Período: {data_inicial} até {data_final}\n\n"
-                "❌ Nenhuma rota encontrada neste período."
-            )
-            return
+        tenant = _tenant(update)
+        inicio_iso = data_para_iso(data_inicial)
+        fim_iso = data_para_iso(data_final)
+        # A versão vem do banco: gravações de outros processos também mudam a chave
+        chave = (inicio_iso, fim_iso, tenant, 'espelho', await get_versao_dados(tenant))
+        relatorio = relatorios.get(chave)
         
-        message = f"📅 Período: {data_inicial} até {data_final}\n\n"
-        
-        for rota in rotas:
-            ilha_texto = "Ilha" if rota['ilha'] else "Sem ilha"
-            message += f"• {rota['data']} | {rota['rota']} | {rota['carro']} | {ilha_texto} | R$ {rota['valor']:.2f}\n"
-        
-        message += f"\n💰 Total no período: R$ {total:.2f}"
-        
-        await update.message.reply_text(message)
+        if relatorio is None:
+            versao = relatorios.versao
+            dias = (date.fromisoformat(fim_iso) - date.fromisoformat(inicio_iso)).days + 1
+            
+            if dias > ESPELHO_DETALHADO_MAX_DIAS:
+                espelho = await get_espelho_resumo(data_inicial, data_final, tenant)
+                texto = _formatar_espelho_resumo(espelho, data_inicial, data_final)
+            else:
+                espelho = await get_espelho(data_inicial, data_final, tenant)
+                texto = _formatar_espelho(espelho, data_inicial, data_final)
+            
+            relatorio = {'espelho': espelho, 'texto': texto}
+            relatorios.set(chave, relatorio, versao)
         
+        await update.message.reply_text(relatorio['texto'])
+    
     except Exception as e:
         await update.message.reply_text(f"❌ Erro ao consultar espelho: {str(e)}")
 
+def _formatar_espelho(espelho: dict, data_inicial: str, data_final: str) -> str:
+    """Monta o texto do espelho de pagamento de um período"""
+    if not espelho['rotas']:
+        return (
+            f"📅 Período: {data_inicial} até {data_final}\n\n"
+            "❌ Nenhuma rota encontrada neste período."
+        )
+    
+    message = f"📅 Período: {data_inicial} até {data_final}\n\n"
+    
+    for rota in espelho['rotas']:
+        ilha_texto = "Ilha" if rota['ilha'] else "Sem ilha"
+        message += f"• {rota['data']} | {rota['rota']} | {rota['carro']} | {ilha_texto} | R$ {rota['valor']:.2f}\n"
+    
+    message += f"\n💰 Total no período: R$ {espelho['total']:.2f}"
+    return message
+
+def _formatar_espelho_resumo(espelho: dict, data_inicial: str, data_final: str) -> str:
+    """Monta o texto do espelho resumido (por mês e por carro) de um período longo"""
+    if not espelho['quantidade']:
+        return (
+            f"📅 Período: {data_inicial} até {data_final}\n\n"
+            "❌ Nenhuma rota encontrada neste período."
+        )
+    
+    message = f"📅 Período: {data_inicial} até {data_final}\n\n"
+    
+    message += "📆 Por mês:\n"
+    for mes in espelho['meses']:
+        message += f"• {mes['chave']} | {mes['quantidade']} rota(s) | R$ {mes['total']:.2f}\n"
+    
+    message += "\n🚐 Por carro:\n"
+    for carro in espelho['carros']:
+        message += f"• {carro['chave']} | {carro['quantidade']} rota(s) | R$ {carro['total']:.2f}\n"
+    
+    message += f"\n🚛 Rotas no período: {espelho['quantidade']}"
+    message += f"\n💰 Total no período: R$ {espelho['total']:.2f}"
+    message += f"\n\n💡 Para ver rota a rota, consulte até {ESPELHO_DETALHADO_MAX_DIAS} dias."
+    return message
+
 async def hoje_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Comando /hoje - Mostra rotas da data atual"""
     try:
-        rotas = get_rotas_hoje()
-        total = get_total_hoje()
         hoje = datetime.now().strftime("%d/%m/%Y")
+        hoje_iso = data_para_iso(hoje)
+        tenant = _tenant(update)
+        chave = (hoje_iso, hoje_iso, tenant, 'hoje', await get_versao_dados(tenant))
+        relatorio = relatorios.get(chave)
         
-        if not rotas:
-            await update.message.reply_text(
-                f"📅 Rotas de hoje ({hoje})\n\n"
-                "❌ Nenhuma rota registrada hoje."
-            )
-            return
-        
-        message = f"📅 Rotas de hoje ({hoje})\n\n"
-        
-        for rota in rotas:
-            ilha_texto = "Ilha" if rota['ilha'] else "Sem ilha"
-            message += f"• {rota['rota']} | {rota['carro']} | {ilha_texto} | R$ {rota['valor']:.2f}\n"
-        
-        message += f"\n💰 Total hoje: R$ {total:.2f}"
-        
-        await update.message.reply_text(message)
+        if relatorio is None:
+            versao = relatorios.versao
+            espelho = await get_espelho_hoje(tenant)
+            relatorio = {
+                'espelho': espelho,
+                'texto': _formatar_hoje(espelho, hoje)
+            }
+            relatorios.set(chave, relatorio, versao)
         
+        await update.message.reply_text(relatorio['texto'])
+    
     except Exception as e:
         await update.message.reply_text(f"❌ Erro ao consultar rotas de hoje: {str(e)}")
 
+def _formatar_hoje(espelho: dict, hoje: str) -> str:
+    """Monta o texto das rotas de hoje"""
+    if not espelho['rotas']:
+        return (
+            f"📅 Rotas de hoje ({hoje})\n\n"
+            "❌ Nenhuma rota registrada hoje."
+        )
+    
+    message = f"📅 Rotas de hoje ({hoje})\n\n"
+    
+    for rota in espelho['rotas']:
+        ilha_texto = "Ilha" if rota['ilha'] else "Sem ilha"
+        message += f"• {rota['rota']} | {rota['carro']} | {ilha_texto} | R$ {rota['valor']:.2f}\n"
+    
+    message += f"\n💰 Total hoje: R$ {espelho['total']:.2f}"
+    return message
+
+def _formatar_pagina_todas(pagina: dict, numero: int):
+    """Monta o texto e o teclado inline de uma página do /todas"""
+    message = f"📋 Todas as Rotas (página {numero})\n\n"
+    
+    for rota in pagina['rotas']:
+        ilha_texto = "Ilha" if rota['ilha'] else "Sem ilha"
+        message += f"• {rota['data']} | {rota['rota']} | {rota['carro']} | {ilha_texto} | R$ {rota['valor']:.2f} (ID: {rota['id']})\n"
+    
+    botoes = []
+    if numero > 1:
+        botoes.append(InlineKeyboardButton("⏮️ Início", callback_data="todas:inicio"))
+    if pagina['proximo']:
+        data_iso, rota_id = pagina['proximo']
+        botoes.append(InlineKeyboardButton(
+            "Próxima ➡️", callback_data=f"todas:{numero + 1}:{data_iso or ''}:{rota_id}"
+        ))
+    
+    teclado = InlineKeyboardMarkup([botoes]) if botoes else None
+    return message, teclado
+
 async def todas_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Comando /todas - Lista todas as rotas cadastradas"""
+    """Comando /todas - Lista as rotas cadastradas, paginadas"""
     try:
-        rotas = get_todas_rotas()
+        pagina = await get_rotas_pagina(TODAS_POR_PAGINA, tenant=_tenant(update))
         
-        if not rotas:
+        if not pagina['rotas']:
             await update.message.reply_text(
                 "📋 Todas as Rotas\n\n"
                 "❌ Nenhuma rota cadastrada."
             )
             return
         
-        message = "📋 Todas as Rotas\n\n"
+        message, teclado = _formatar_pagina_todas(pagina, 1)
+        await update.message.reply_text(message, reply_markup=teclado)
+    
+    except Exception as e:
+        await update.message.reply_text(f"❌ Erro ao listar rotas: {str(e)}")
+
+async def todas_pagina_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Botões do /todas - Edita a mensagem com a página pedida"""
+    query = update.callback_query
+    await query.answer()
+    
+    try:
+        # callback_data: "todas:inicio" ou "todas:<página>:<data_iso>:<id>"
+        # (data_iso vazia: a página anterior terminou numa rota sem data_iso)
+        partes = query.data.split(":")
+        if partes[1] == "inicio":
+            numero, antes = 1, None
+        else:
+            numero, antes = int(partes[1]), (partes[2] or None, int(partes[3]))
         
-        for rota in rotas:
-            ilha_texto = "Ilha" if rota['ilha'] else "Sem ilha"
-            message += f"• {rota['data']} | {rota['rota']} | {rota['carro']} | {ilha_texto} | R$ {rota['valor']:.2f} (ID: {rota['id']})\n"
+        pagina = await get_rotas_pagina(TODAS_POR_PAGINA, antes, _tenant(update))
         
-        # Se a mensagem for muito longa, divide em partes
-        if len(message) > 4000:
-            # Divide em chunks de 4000 caracteres
-            chunks = [message[i:i+4000] for i in range(0, len(message), 4000)]
-            for chunk in chunks:
-                await update.message.reply_text(chunk)
-        else:
-            await update.message.reply_text(message)
+        if not pagina['rotas']:
+            await query.edit_message_text(
+                "📋 Todas as Rotas\n\n"
+                "❌ Nenhuma rota nesta página."
+            )
+            return
         
+        message, teclado = _formatar_pagina_todas(pagina, numero)
+        await query.edit_message_text(message, reply_markup=teclado)
+    
     except Exception as e:
-        await update.message.reply_text(f"❌ Erro ao listar rotas: {str(e)}")
+        await query.edit_message_text(f"❌ Erro ao listar rotas: {str(e)}")
 
 async def deletar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Comando /deletar - Remove rota por ID"""
@@ -302,7 +571,7 @@ async def deletar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     try:
         rota_id = int(context.args[0])
         
-        if delete_rota(rota_id):
+        if await delete_rota(rota_id, _tenant(update)):
             await update.message.reply_text(
                 f"✅ Rota ID {rota_id} removida com sucesso!"
             )
@@ -310,10 +579,265 @@ async def deletar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text(
                 f"❌ Rota ID {rota_id} não encontrada!"
             )
-            
+    
     except ValueError:
         await update.message.reply_text(
             "❌ ID inválido! Digite um número inteiro."
         )
     except Exception as e:
-        await update.message.reply_text(f"❌ Erro ao deletar rota: {str(e)}")
\ No newline at end of file
+        await update.message.reply_text(f"❌ Erro ao deletar rota: {str(e)}")
+
+async def exportar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Comando /exportar - Envia o espelho do período como arquivo CSV, XLSX ou PDF"""
+    if not context.args or len(context.args) not in (2, 3):
+        await update.message.reply_text(
+            "❌ Uso incorreto!\n"
+            "📎 Use: /exportar [data_inicial] [data_final] [csv|xlsx|pdf]\n"
+            "📅 Exemplo: /exportar 01/09/2025 30/09/2025 pdf"
+        )
+        return
+    
+    data_inicial, data_final = context.args[0], context.args[1]
+    formato = context.args[2].lower() if len(context.args) == 3 else 'csv'
+    
+    if formato not in FORMATOS + ('pdf',):
+        await update.message.reply_text("❌ Formato inválido! Use csv, xlsx ou pdf.")
+        return
+    
+    try:
+        data_para_iso(data_inicial)
+        data_para_iso(data_final)
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Formato de data inválido!\n"
+            "📅 Use DD/MM/AAAA"
+        )
+        return
+    
+    try:
+        await update.message.chat.send_action(ChatAction.UPLOAD_DOCUMENT)
+        
+        if formato == 'pdf':
+            await _enviar_pdf(update, data_inicial, data_final)
+            return
+        
+        # Lê o banco e escreve o arquivo em uma thread leitora, fora do event loop
+        exportacao = await ler(gerar_arquivo, data_inicial, data_final, formato, _tenant(update))
+        
+        with exportacao['arquivo'] as arquivo:
+            if not exportacao['quantidade']:
+                await update.message.reply_text(
+                    f"📅 Período: {data_inicial} até {data_final}\n\n"
+                    "❌ Nenhuma rota encontrada neste período."
+                )
+                return
+            
+            if exportacao['tamanho'] > EXPORTAR_MAX_BYTES:
+                await update.message.reply_text(
+                    "❌ Arquivo maior que o limite do Telegram (50 MB).\n"
+                    "📅 Exporte um período menor."
+                )
+                return
+            
+            # O upload do python-telegram-bot lê o documento inteiro de uma vez;
+            # o tamanho já foi limitado acima ao máximo aceito pelo Telegram
+            await update.message.reply_document(
+                document=InputFile(arquivo.read(), filename=exportacao['nome']),
+                caption=(
+                    f"📅 {data_inicial} até {data_final}\n"
+                    f"🚛 {exportacao['quantidade']} rota(s)\n"
+                    f"💰 Total: R$ {exportacao['total']:.2f}"
+                )
+            )
+    
+    except Exception as e:
+        await update.message.reply_text(f"❌ Erro ao exportar espelho: {str(e)}")
+
+async def _enviar_pdf(update: Update, data_inicial: str, data_final: str) -> None:
+    """Envia o espelho em PDF (gerado no pool de processos ou vindo do cache)"""
+    espelho = await fila_pdf.gerar(data_inicial, data_final, _tenant(update), update.effective_user.full_name)
+    
+    if not espelho['quantidade']:
+        await update.message.reply_text(
+            f"📅 Período: {data_inicial} até {data_final}\n\n"
+            "❌ Nenhuma rota encontrada neste período."
+        )
+        return
+    
+    await update.message.reply_document(
+        document=InputFile(espelho['conteudo'], filename=espelho['nome']),
+        caption=(
+            f"📅 {data_inicial} até {data_final}\n"
+            f"🚛 {espelho['quantidade']} rota(s)\n"
+            f"💰 Total: R$ {espelho['total']:.2f}"
+        )
+    )
+
+def _formatar_rota_rapida(rota: tuple, valor: float) -> str:
+    """Uma rota (data, rota, carro, ilha) nas respostas do /r e do /lote"""
+    data, nome, carro, ilha = rota
+    ilha_texto = "Ilha" if ilha else "Sem ilha"
+    return f"{data} | {nome} | {carro} | {ilha_texto} | R$ {valor:.2f}"
+
+def _linhas_limitadas(linhas: list, espaco: int, unidade: str = "rota(s)") -> str:
+    """
+    Junta as linhas em no máximo espaco caracteres
+    
+    As que não couberem viram uma última linha "… e mais N rota(s)" (ou a
+    unidade indicada), para que a resposta nunca passe do limite de uma
+    mensagem do Telegram.
+    """
+    texto = "\n".join(linhas)
+    if len(texto) <= espaco:
+        return texto
+    
+    usadas, tamanho = [], 0
+    for posicao, linha in enumerate(linhas):
+        restante = f"… e mais {len(linhas) - posicao} {unidade}"
+        if tamanho + len(linha) + 1 + len(restante) > espaco:
+            return "\n".join(usadas + [restante])
+        usadas.append(linha)
+        tamanho += len(linha) + 1
+    return "\n".join(usadas)
+
+async def r_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Comando /r - Registra uma ou mais rotas em uma única mensagem"""
+    if not context.args:
+        await update.message.reply_text(
+            "❌ Uso incorreto!\n"
+            "⚡ Use: /r [data] [rota] [carro] [ilha]\n"
+            "📅 Exemplo: /r hoje P10-AM van ilha G20-PM fio"
+        )
+        return
+    
+    try:
+        rotas = LeitorRotas().ler(' '.join(context.args))
+        if len(rotas) > RAPIDO_MAX_ROTAS:
+            raise ValueError(f"Máximo de {RAPIDO_MAX_ROTAS} rotas por /r (use /lote ou a importação)")
+        # Mesmo cálculo do insert_rota; valida a tarifa antes de gravar
+        valores = await calcular_valores(rotas)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n"
+            "📅 Exemplo: /r hoje P10-AM van ilha"
+        )
+        return
+    
+    try:
+        # Todas as rotas da mensagem em uma única transação
+        resultado = await upsert_rotas_lote(rotas, _tenant(update))
+    except Exception as e:
+        await update.message.reply_text(f"❌ Erro ao registrar rotas: {str(e)}")
+        return
+    
+    # Daqui em diante as rotas já estão gravadas: a resposta só as descreve
+    cabecalho = f"✅ {len(rotas)} rota(s) registrada(s)\n\n"
+    rodape = ""
+    if resultado['atualizadas'] or resultado['ignoradas']:
+        rodape += (
+            f"\n\n🔄 {resultado['atualizadas']} atualizada(s), "
+            f"ℹ️ {resultado['ignoradas']} já registrada(s) igual"
+        )
+    rodape += f"\n\n💰 Total: R$ {sum(valores):.2f}"
+    
+    linhas = [f"• {_formatar_rota_rapida(rota, valor)}" for rota, valor in zip(rotas, valores)]
+    espaco = MessageLimit.MAX_TEXT_LENGTH - len(cabecalho) - len(rodape)
+    await update.message.reply_text(cabecalho + _linhas_limitadas(linhas, espaco) + rodape)
+
+def _validar_lote(linhas: list) -> tuple:
+    """
+    Lê e valida as linhas do /lote, calculando o valor de cada rota
+    
+    Roda fora do event loop (db_async.ler): calcular_valor pode recarregar
+    as tarifas do banco.
+    
+    Returns:
+        Tupla (rotas, valores, resumo, erros)
+    """
+    leitor = LeitorRotas()
+    rotas, valores, resumo, erros = [], [], [], []
+    vistas = {}
+    for numero, linha in linhas:
+        try:
+            lidas = leitor.ler(linha)
+            if not lidas:
+                # Linha só com a data: vale para as linhas seguintes
+                resumo.append(f"📅 {leitor.data}")
+                continue
+            
+            for rota in lidas:
+                data, nome, carro, ilha = rota
+                chave = (data_para_iso(data), normalizar_rota(nome))
+                if chave in vistas:
+                    raise ValueError(f"{nome} em {data} repete a linha {vistas[chave]}")
+                vistas[chave] = numero
+                
+                valor = calcular_valor(data, carro, ilha)
+                rotas.append(rota)
+                valores.append(valor)
+                resumo.append(f"{numero}. {_formatar_rota_rapida(rota, valor)}")
+        except ValueError as e:
+            erros.append(f"{numero}. {linha} → {e}")
+    
+    return rotas, valores, resumo, erros
+
+async def lote_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Comando /lote - Registra várias rotas, uma por linha, em uma única transação"""
+    partes = update.message.text.split(None, 1)
+    linhas = [
+        (numero, linha.strip())
+        for numero, linha in enumerate(partes[1].splitlines() if len(partes) > 1 else [], start=1)
+        if linha.strip()
+    ]
+    
+    if not linhas:
+        await update.message.reply_text(
+            "❌ Uso incorreto!\n"
+            "📝 Envie /lote e, nas linhas seguintes, uma rota por linha:\n"
+            "/lote\n"
+            "01/09 P10-AM van ilha\n"
+            "02/09 G20-PM fio\n"
+            "03/09 P10-AM v"
+        )
+        return
+    
+    # Valida todas as linhas antes de gravar qualquer uma
+    rotas, valores, resumo, erros = await ler(_validar_lote, linhas)
+    
+    if erros:
+        cabecalho = "❌ Nenhuma rota gravada. Corrija as linhas abaixo e envie o /lote de novo:\n\n"
+        await update.message.reply_text(
+            cabecalho + _linhas_limitadas(erros, MessageLimit.MAX_TEXT_LENGTH - len(cabecalho), "linha(s)")
+        )
+        return
+    
+    if not rotas:
+        await update.message.reply_text("❌ Nenhuma rota encontrada nas linhas enviadas.")
+        return
+    
+    # O limite é de rotas, não de linhas: uma linha pode ter várias rotas
+    if len(rotas) > RAPIDO_MAX_ROTAS:
+        await update.message.reply_text(
+            f"❌ Nenhuma rota gravada: o /lote tem {len(rotas)} rotas e o máximo é {RAPIDO_MAX_ROTAS}.\n"
+            "📝 Divida em mais de um /lote ou use a importação de planilhas."
+        )
+        return
+    
+    try:
+        # Uma transação (executemany) para o lote inteiro
+        resultado = await upsert_rotas_lote(rotas, _tenant(update))
+    except Exception as e:
+        await update.message.reply_text(f"❌ Erro ao registrar lote: {str(e)}")
+        return
+    
+    # Daqui em diante o lote já está gravado: a resposta só o descreve
+    cabecalho = f"📝 Lote com {len(rotas)} rota(s)\n\n"
+    rodape = (
+        "\n\n"
+        f"✅ {resultado['inseridas']} nova(s), "
+        f"🔄 {resultado['atualizadas']} atualizada(s), "
+        f"ℹ️ {resultado['ignoradas']} já registrada(s) igual\n"
+        f"💰 Total: R$ {sum(valores):.2f}"
+    )
+    espaco = MessageLimit.MAX_TEXT_LENGTH - len(cabecalho) - len(rodape)
+    await update.message.reply_text(cabecalho + _linhas_limitadas(resumo, espaco, "linha(s)") + rodape)
@@ -1,45 +1,48 @@
 #!/usr/bin/env python3
 """
 Script para importar rotas já realizadas para o banco de dados do RoteiroBot
+
+Uso:
+    python importar_rotas.py                   # importa as rotas da planilha embutida
+    python importar_rotas.py rotas.csv         # importa um arquivo CSV
+    python importar_rotas.py rotas.xlsx        # importa um arquivo XLSX (requer openpyxl)
+    python importar_rotas.py rotas.csv 123456  # importa para o usuário 123456 do Telegram
+
+Os arquivos devem ter as colunas data, rota, carro e ilha (nesta ordem ou
+com cabeçalho). São lidos em lotes de tamanho fixo, cada lote gravado com
+executemany em uma única transação. Sem o id do usuário, as rotas ficam
+com o tenant padrão (TENANT_PADRAO).
 """
 
-import sqlite3
-from datetime import datetime
-from db import init_database, insert_rota
-
-def limpar_rotas_duplicadas():
-    """Remove rotas duplicadas do banco de dados"""
-    conn = sqlite3.connect("rotas.db")
-    cursor = conn.cursor()
-    
-    # Remove duplicatas baseadas em data + rota
-    cursor.execute('''
-        DELETE FROM rotas 
-        WHERE id NOT IN (
-            SELECT MIN(id) 
-            FROM rotas 
-            GROUP BY data, rota
-        )
-    ''')
-    
-    duplicatas_removidas = cursor.rowcount
-    conn.commit()
-    conn.close()
-    
-    if duplicatas_removidas > 0:
-        print(f"🧹 Removidas {duplicatas_removidas} rotas duplicadas")
-    
-    return duplicatas_removidas
+import csv
+import sys
+import time
+from datetime import datetime, date
+from typing import Iterator, List, Tuple
+from db import init_database, get_connection, upsert_rotas_lote, normalizar_data, calcular_valor, TENANT_PADRAO
+from tarifas import tabela as tabela_tarifas
+
+# Quantidade de linhas gravadas por transação na importação de arquivos
+TAMANHO_LOTE = 1000
 
-def importar_rotas_existentes():
-    """Importa as rotas já realizadas baseadas na planilha"""
+# Colunas esperadas nos arquivos importados
+COLUNAS = ('data', 'rota', 'carro', 'ilha')
+
+# Separadores aceitos nos arquivos CSV (em caso de empate vale o primeiro)
+SEPARADORES = (',', ';', '\t')
+
+# Primeira célula da linha de total do espelho exportado (ver exportar.py)
+LINHA_TOTAL = 'total'
+
+ILHA_SIM = {'sim', 's', '1', 'true', 'x', 'ilha'}
+ILHA_NAO = {'não', 'nao', 'n', '0', 'false', '', 'sem ilha'}
+
+def importar_rotas_existentes(tenant: int = TENANT_PADRAO):
+    """Importa as rotas já realizadas baseadas na planilha para um usuário (tenant)"""
     
     # Inicializa o banco de dados
     init_database()
     
-    # Limpa rotas duplicadas primeiro
-    limpar_rotas_duplicadas()
-    
     # Dados das rotas baseados na planilha (Agosto + Setembro)
     rotas_dados = [
         # AGOSTO 2025
@@ -72,25 +75,28 @@ def importar_rotas_existentes():
     
     rotas_importadas = 0
     
-    for data, rota, carro, ilha, obs in rotas_dados:
-        try:
-            # Insere a rota no banco
-            rota_id = insert_rota(data, rota, carro, ilha)
-            
-            # Calcula o valor para exibição
-            valor_base = 130 if carro.lower() == "van" else 110
-            valor_final = valor_base + (10 if ilha else 0)
+    try:
+        # Grava todas as rotas em uma única transação; rotas já existentes
+        # (mesma data e nome) são atualizadas em vez de duplicadas
+        resultado = upsert_rotas_lote(
+            [(data, rota, carro, ilha) for data, rota, carro, ilha, obs in rotas_dados], tenant
+        )
+        rotas_importadas = resultado['inseridas'] + resultado['atualizadas']
+        
+        for data, rota, carro, ilha, obs in rotas_dados:
+            # Calcula o valor para exibição (tarifa vigente na data)
+            valor_final = calcular_valor(data, carro, ilha)
             
-            print(f"✅ Rota {rota_id}: {data} | {rota} | {carro} | {'Ilha' if ilha else 'Sem ilha'} | R$ {valor_final:.2f}")
+            print(f"✅ {data} | {rota} | {carro} | {'Ilha' if ilha else 'Sem ilha'} | R$ {valor_final:.2f}")
             print(f"   📝 Observação: {obs}")
-            
-            rotas_importadas += 1
-            
-        except Exception as e:
-            print(f"❌ Erro ao importar rota {rota}: {e}")
+        
+    except Exception as e:
+        print(f"❌ Erro ao importar rotas: {e}")
     
     print("=" * 50)
     print(f"📊 Total de rotas importadas: {rotas_importadas}")
+    if rotas_importadas:
+        print(f"   ➕ Inseridas: {resultado['inseridas']} | 🔄 Atualizadas: {resultado['atualizadas']} | ⏭️ Já existentes: {resultado['ignoradas']}")
     
     # Mostra resumo
     if rotas_importadas > 0:
@@ -100,28 +106,180 @@ def importar_rotas_existentes():
     else:
         print("\n⚠️ Nenhuma rota foi importada")
 
-def verificar_rotas_existentes():
-    """Verifica se já existem rotas no banco"""
-    conn = sqlite3.connect("rotas.db")
-    cursor = conn.cursor()
+def validar_linha(campos) -> Tuple:
+    """
+    Valida e normaliza uma linha do arquivo
+    
+    Args:
+        campos: Sequência (data, rota, carro, ilha) como lida do arquivo
+    
+    Returns:
+        Tupla (data, rota, carro, ilha) pronta para upsert_rotas_lote
+    
+    Raises:
+        ValueError: Se algum campo for inválido ou não houver tarifa para o carro na data
+    """
+    if len(campos) < 4:
+        raise ValueError("linha com menos de 4 colunas")
+    
+    data, rota, carro, ilha = campos[:4]
+    
+    # Data: texto DD/MM/AAAA ou AAAA-MM-DD, ou célula de data do Excel
+    if isinstance(data, (datetime, date)):
+        data = data.strftime("%d/%m/%Y")
+    else:
+        data = str(data or '').strip()
+        try:
+            if '-' in data:
+                data = datetime.strptime(data, "%Y-%m-%d").strftime("%d/%m/%Y")
+            else:
+                data = normalizar_data(data)[0]
+        except ValueError:
+            raise ValueError(f"data inválida: {data!r}")
+    
+    rota = str(rota or '').strip()
+    if not rota:
+        raise ValueError("rota vazia")
+    
+    # Carros válidos são os que têm tarifa cadastrada (ver tarifas.py)
+    chave_carro = str(carro or '').strip().lower()
+    if chave_carro not in tabela_tarifas.carros():
+        raise ValueError(f"carro inválido: {carro!r}")
+    carro_normalizado = chave_carro.capitalize()
+    
+    ilha_texto = str(ilha if ilha is not None else '').strip().lower()
+    if ilha_texto in ILHA_SIM:
+        ilha = True
+    elif ilha_texto in ILHA_NAO:
+        ilha = False
+    else:
+        raise ValueError(f"ilha inválida: {ilha!r}")
+    
+    # Sem tarifa na data a linha é inválida, em vez de abortar o lote inteiro no upsert
+    calcular_valor(data, carro_normalizado, ilha)
+    
+    return (data, rota, carro_normalizado, ilha)
+
+def _ler_csv(caminho: str) -> Iterator[List]:
+    """
+    Lê as linhas de um CSV (separador , ; ou tab detectado automaticamente)
     
-    cursor.execute("SELECT COUNT(*) FROM rotas")
-    count = cursor.fetchone()[0]
+    O separador é o que mais aparece na primeira linha: no CSV exportado
+    (';' com vírgula decimal) o csv.Sniffer confundia a vírgula dos valores
+    com o separador.
+    """
+    with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+        primeira = f.readline()
+        f.seek(0)
+        separador = max(SEPARADORES, key=primeira.count)
+        
+        yield from csv.reader(f, delimiter=separador)
+
+def _ler_xlsx(caminho: str) -> Iterator[List]:
+    """Lê as linhas da primeira planilha de um XLSX em modo somente leitura"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Para importar XLSX instale o openpyxl: pip install openpyxl")
     
-    conn.close()
+    workbook = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+def _ordenar_colunas(linhas: Iterator[List]) -> Iterator[Tuple[int, List]]:
+    """
+    Reordena as colunas pelo cabeçalho, se houver, e numera as linhas
     
-    return count
+    Sem cabeçalho, assume a ordem data, rota, carro, ilha. A linha de total
+    de um espelho exportado (/exportar) é pulada, para que ele possa ser
+    importado de volta.
+    """
+    indices = None
+    for numero, linha in enumerate(linhas, start=1):
+        if not linha or all(c in (None, '') for c in linha):
+            continue
+        if str(linha[0] or '').strip().lower() == LINHA_TOTAL:
+            continue
+        
+        if indices is None:
+            nomes = [str(c or '').strip().lower() for c in linha]
+            if all(coluna in nomes for coluna in COLUNAS):
+                indices = [nomes.index(coluna) for coluna in COLUNAS]
+                continue
+            indices = list(range(len(COLUNAS)))
+        
+        yield numero, [linha[i] if i < len(linha) else None for i in indices]
 
-def limpar_todas_rotas():
-    """Remove todas as rotas do banco de dados"""
-    conn = sqlite3.connect("rotas.db")
-    cursor = conn.cursor()
+def importar_arquivo(caminho: str, tamanho_lote: int = TAMANHO_LOTE, tenant: int = TENANT_PADRAO) -> dict:
+    """
+    Importa rotas de um arquivo CSV ou XLSX em lotes
     
-    cursor.execute("DELETE FROM rotas")
-    rotas_removidas = cursor.rowcount
+    A memória usada é limitada pelo tamanho do lote, não pelo tamanho do
+    arquivo. Linhas inválidas são ignoradas e reportadas; rotas que já
+    existem (mesma data e nome) são atualizadas ou ignoradas, nunca duplicadas.
+    
+    Args:
+        caminho: Caminho do arquivo (.csv ou .xlsx)
+        tamanho_lote: Linhas gravadas por transação
+        tenant: Dono das rotas importadas (id do usuário no Telegram)
+    
+    Returns:
+        Dicionário com 'inseridas', 'atualizadas', 'ignoradas', 'invalidas',
+        'erros' (até 20), 'segundos' e 'linhas_por_segundo'
+    """
+    init_database()
     
-    conn.commit()
-    conn.close()
+    leitor = _ler_xlsx(caminho) if caminho.lower().endswith(('.xlsx', '.xlsm')) else _ler_csv(caminho)
+    
+    inicio = time.perf_counter()
+    totais = {'inseridas': 0, 'atualizadas': 0, 'ignoradas': 0}
+    invalidas = 0
+    erros = []
+    lote = []
+    
+    for numero, campos in _ordenar_colunas(leitor):
+        try:
+            lote.append(validar_linha(campos))
+        except ValueError as e:
+            invalidas += 1
+            if len(erros) < 20:
+                erros.append(f"linha {numero}: {e}")
+            continue
+        
+        if len(lote) >= tamanho_lote:
+            _somar(totais, upsert_rotas_lote(lote, tenant))
+            lote = []
+    
+    _somar(totais, upsert_rotas_lote(lote, tenant))
+    
+    segundos = time.perf_counter() - inicio
+    processadas = sum(totais.values())
+    return {
+        **totais,
+        'invalidas': invalidas,
+        'erros': erros,
+        'segundos': segundos,
+        'linhas_por_segundo': processadas / segundos if segundos > 0 else 0.0
+    }
+
+def _somar(totais: dict, resultado: dict):
+    """Acumula o resultado de um lote nos totais da importação"""
+    for chave in totais:
+        totais[chave] += resultado[chave]
+
+def verificar_rotas_existentes(tenant: int = TENANT_PADRAO) -> int:
+    """Conta as rotas de um usuário (tenant) já gravadas no banco"""
+    conn = get_connection()
+    return conn.execute('SELECT COUNT(*) FROM rotas WHERE tenant = ?', (tenant,)).fetchone()[0]
+
+def limpar_todas_rotas(tenant: int = TENANT_PADRAO) -> int:
+    """Remove todas as rotas de um usuário (tenant); as dos outros não são tocadas"""
+    conn = get_connection()
+    with conn:
+        rotas_removidas = conn.execute('DELETE FROM rotas WHERE tenant = ?', (tenant,)).rowcount
     
     if rotas_removidas > 0:
         print(f"🗑️ Removidas {rotas_removidas} rotas existentes")
@@ -133,22 +291,43 @@ def main():
     print("🤖 Importador de Rotas - RoteiroBot")
     print("=" * 50)
     
-    # Verifica se já existem rotas
-    rotas_existentes = verificar_rotas_existentes()
+    # Com um arquivo como argumento, importa o arquivo (sem limpar o banco)
+    if len(sys.argv) > 1:
+        caminho = sys.argv[1]
+        tenant = int(sys.argv[2]) if len(sys.argv) > 2 else TENANT_PADRAO
+        print(f"📂 Importando {caminho} para o usuário {tenant}...")
+        resultado = importar_arquivo(caminho, tenant=tenant)
+        
+        for erro in resultado['erros']:
+            print(f"⚠️ {erro}")
+        
+        print("=" * 50)
+        print(f"➕ Rotas inseridas: {resultado['inseridas']}")
+        print(f"🔄 Rotas atualizadas: {resultado['atualizadas']}")
+        print(f"⏭️ Rotas já existentes: {resultado['ignoradas']}")
+        print(f"❌ Linhas inválidas: {resultado['invalidas']}")
+        print(f"⏱️ {resultado['segundos']:.2f} s ({resultado['linhas_por_segundo']:.0f} linhas/s)")
+        return
+    
+    # Sem arquivo, a planilha embutida vai para TENANT_PADRAO; só as rotas
+    # desse usuário são substituídas
+    init_database()
+    tenant = TENANT_PADRAO
+    rotas_existentes = verificar_rotas_existentes(tenant)
     
     if rotas_existentes > 0:
-        print(f"⚠️ Já existem {rotas_existentes} rotas no banco de dados.")
-        print("🔄 Vou limpar todas as rotas e importar as novas da planilha.")
+        print(f"⚠️ Já existem {rotas_existentes} rotas do usuário {tenant} no banco de dados.")
+        print("🔄 Vou limpar as rotas desse usuário e importar as novas da planilha.")
         resposta = input("Deseja continuar? (s/n): ").lower()
         if resposta not in ['s', 'sim', 'y', 'yes']:
             print("❌ Importação cancelada.")
             return
         
-        # Limpa todas as rotas existentes
-        limpar_todas_rotas()
+        # Limpa as rotas existentes do usuário
+        limpar_todas_rotas(tenant)
     
     # Importa as rotas
-    importar_rotas_existentes()
+    importar_rotas_existentes(tenant)
 
 if __name__ == "__main__":
     main()
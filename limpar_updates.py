@@ -2,15 +2,47 @@
 """
 Script para limpar updates pendentes do bot do Telegram
 Execute este script quando houver erro HTTP 409 Conflict
+
+Também fornece limpar_estado_bot(), a rotina de limpeza usada na
+inicialização por main.py, render_main.py, run_bot.py, monitor_bot.py
+e fix_conflict.py.
 """
 
 import os
+import time
 import asyncio
+import logging
 from telegram import Bot
-from dotenv import load_dotenv
 
-# Carrega variáveis de ambiente
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+async def limpar_estado_bot(bot: Bot, remover_webhook: bool = True) -> float:
+    """
+    Remove o webhook e confirma toda a fila de updates pendentes
+    
+    get_updates(offset=-1) devolve apenas o último update e descarta todos
+    os anteriores; confirmá-lo (offset = id + 1) esvazia a fila. São no
+    máximo três chamadas à API, sem pausas fixas, em vez de uma por update.
+    
+    Args:
+        bot: Instância do bot
+        remover_webhook: Se deve remover o webhook (desligar no modo webhook)
+        
+    Returns:
+        Duração da limpeza em segundos
+    """
+    inicio = time.perf_counter()
+    
+    if remover_webhook:
+        await bot.delete_webhook(drop_pending_updates=True)
+        
+    updates = await bot.get_updates(offset=-1, limit=1, timeout=0)
+    if updates:
+        await bot.get_updates(offset=updates[-1].update_id + 1, limit=1, timeout=0)
+        
+    duracao = time.perf_counter() - inicio
+    logger.info(f"Estado do bot limpo em {duracao * 1000:.0f} ms")
+    return duracao
 
 async def limpar_updates():
     """Limpa todos os updates pendentes do bot"""
@@ -19,31 +51,24 @@ async def limpar_updates():
     if not token:
         print("❌ Token do Telegram não encontrado!")
         return
-    
+        
     bot = Bot(token=token)
     
     try:
-        # Obtém updates pendentes
-        updates = await bot.get_updates()
-        print(f"📥 Encontrados {len(updates)} updates pendentes")
+        duracao = await limpar_estado_bot(bot, remover_webhook=False)
+        print(f"✅ Updates limpos com sucesso em {duracao * 1000:.0f} ms!")
         
-        if updates:
-            # Obtém o ID do último update
-            last_update_id = updates[-1].update_id
-            print(f"🔄 Limpando updates até ID: {last_update_id}")
-            
-            # Limpa os updates
-            await bot.get_updates(offset=last_update_id + 1)
-            print("✅ Updates limpos com sucesso!")
-        else:
-            print("✅ Nenhum update pendente encontrado")
-            
     except Exception as e:
         print(f"❌ Erro ao limpar updates: {e}")
     finally:
         await bot.close()
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    
+    # Carrega variáveis de ambiente
+    load_dotenv()
+    
     print("🧹 Limpando updates pendentes do bot...")
     asyncio.run(limpar_updates())
     print("🎉 Processo concluído!")
@@ -0,0 +1,257 @@
+"""
+Métricas do RoteiroBot no formato de texto do Prometheus
+
+Registro em memória, sem dependências, exportado em GET /metrics pelo
+servidor HTTP do bot (webhook_server; no modo polling, na porta
+METRICAS_PORTA). O que é medido:
+
+- roteirobot_handler_segundos / _erros_total: cada handler de handlers.py
+  (instrumentar_handlers, chamado por criar_application)
+- roteirobot_db_segundos / _espera_segundos / _erros_total: cada função do db
+  executada pelo db_async, com o tempo de espera na fila da thread
+- roteirobot_telegram_api_segundos / _erros_total: cada chamada à API do
+  Telegram feita pelo LimitadorEnvio (todas, menos o getUpdates)
+- roteirobot_reinicios_total: reinícios do laço RoteiroBot.start_bot
+- roteirobot_fila_updates, roteirobot_updates_aguardando,
+  roteirobot_updates_em_andamento: profundidade das filas de updates
+
+As métricas podem ser atualizadas de qualquer thread (as leituras do banco
+rodam no pool do db_async).
+"""
+
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Limites (segundos) dos buckets dos histogramas de latência
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escapar(valor: str) -> str:
+    """Escapa o valor de um rótulo para o formato de texto do Prometheus"""
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _formatar_rotulos(nomes: Sequence[str], valores: Sequence[str]) -> str:
+    if not nomes:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)) + '}'
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+class _Metrica:
+    """Base das métricas: nome, ajuda, rótulos e valores por combinação de rótulos"""
+    
+    tipo = ''
+    
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.valores: Dict[Tuple[str, ...], object] = {}
+        self.trava = threading.Lock()
+    
+    def _chave(self, rotulos: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(rotulos.get(nome, '')) for nome in self.rotulos)
+    
+    def exportar(self) -> List[str]:
+        """Linhas da métrica no formato de texto do Prometheus"""
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} {self.tipo}']
+        with self.trava:
+            itens = sorted(self.valores.items())
+        for chave, valor in itens:
+            linhas.extend(self._linhas(chave, valor))
+        return linhas
+    
+    def _linhas(self, chave: Tuple[str, ...], valor) -> List[str]:
+        return [f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(valor)}']
+
+class Contador(_Metrica):
+    """Valor que só cresce (eventos, erros)"""
+    
+    tipo = 'counter'
+    
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self.trava:
+            self.valores[chave] = self.valores.get(chave, 0) + valor
+
+class Medidor(_Metrica):
+    """Valor instantâneo; com funcao, é lido na hora da exportação"""
+    
+    tipo = 'gauge'
+    
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                 funcao: Optional[Callable[[], float]] = None):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao
+    
+    def definir(self, valor: float, **rotulos):
+        with self.trava:
+            self.valores[self._chave(rotulos)] = valor
+    
+    def exportar(self) -> List[str]:
+        if self.funcao is not None:
+            try:
+                self.definir(self.funcao())
+            except Exception:
+                pass
+        return super().exportar()
+
+class Histograma(_Metrica):
+    """Distribuição de durações em buckets acumulados, com soma e contagem"""
+    
+    tipo = 'histogram'
+    
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observar(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self.trava:
+            serie = self.valores.get(chave)
+            if serie is None:
+                # Contagem por bucket (o último é +Inf) e soma
+                serie = self.valores[chave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+    
+    def _linhas(self, chave: Tuple[str, ...], valor) -> List[str]:
+        contagens, soma = valor
+        nomes = self.rotulos + ('le',)
+        linhas = []
+        acumulado = 0
+        for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+            acumulado += contagem
+            rotulos = _formatar_rotulos(nomes, chave + (_formatar_numero(limite),))
+            linhas.append(f'{self.nome}_bucket{rotulos} {acumulado}')
+        rotulos = _formatar_rotulos(self.rotulos, chave)
+        linhas.append(f'{self.nome}_sum{rotulos} {_formatar_numero(soma)}')
+        linhas.append(f'{self.nome}_count{rotulos} {acumulado}')
+        return linhas
+
+class Registro:
+    """Conjunto de métricas exportadas juntas"""
+    
+    def __init__(self):
+        self.metricas: Dict[str, _Metrica] = {}
+    
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        """Adiciona uma métrica (uma já registrada com o mesmo nome é mantida)"""
+        return self.metricas.setdefault(metrica.nome, metrica)
+    
+    def contador(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Contador:
+        return self.registrar(Contador(nome, ajuda, rotulos))
+    
+    def medidor(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                funcao: Optional[Callable[[], float]] = None) -> Medidor:
+        return self.registrar(Medidor(nome, ajuda, rotulos, funcao))
+    
+    def histograma(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                   buckets: Sequence[float] = BUCKETS_PADRAO) -> Histograma:
+        return self.registrar(Histograma(nome, ajuda, rotulos, buckets))
+    
+    def exportar(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)"""
+        linhas = []
+        for metrica in self.metricas.values():
+            linhas.extend(metrica.exportar())
+        return '\n'.join(linhas) + '\n'
+
+registro = Registro()
+
+# Handlers
+HANDLER_SEGUNDOS = registro.histograma(
+    'roteirobot_handler_segundos', 'Duração dos handlers do bot', ('handler',)
+)
+HANDLER_ERROS = registro.contador(
+    'roteirobot_handler_erros_total', 'Exceções levantadas pelos handlers', ('handler',)
+)
+
+# Banco de dados
+DB_SEGUNDOS = registro.histograma(
+    'roteirobot_db_segundos', 'Duração das funções do db executadas pelo db_async', ('funcao', 'tipo')
+)
+DB_ESPERA = registro.histograma(
+    'roteirobot_db_espera_segundos', 'Espera na fila das threads do db_async', ('tipo',)
+)
+DB_ERROS = registro.contador(
+    'roteirobot_db_erros_total', 'Exceções levantadas pelas funções do db', ('funcao',)
+)
+
+# API do Telegram
+TELEGRAM_SEGUNDOS = registro.histograma(
+    'roteirobot_telegram_api_segundos', 'Duração das chamadas à API do Telegram', ('endpoint',)
+)
+TELEGRAM_ERROS = registro.contador(
+    'roteirobot_telegram_api_erros_total', 'Erros das chamadas à API do Telegram', ('endpoint', 'erro')
+)
+
+# Reinícios e filas
+REINICIOS = registro.contador(
+    'roteirobot_reinicios_total', 'Reinícios do laço principal do bot', ('motivo',)
+)
+FILA_UPDATES = registro.medidor(
+    'roteirobot_fila_updates', 'Updates recebidos esperando a Application'
+)
+UPDATES_AGUARDANDO = registro.medidor(
+    'roteirobot_updates_aguardando', 'Updates esperando a vez do seu chat'
+)
+UPDATES_EM_ANDAMENTO = registro.medidor(
+    'roteirobot_updates_em_andamento', 'Updates sendo tratados'
+)
+
+def medir_handler(callback: Callable) -> Callable:
+    """Envolve um callback de handler medindo a duração e as exceções"""
+    if getattr(callback, 'metricas_medido', False):
+        return callback
+    
+    nome = getattr(callback, '__name__', type(callback).__name__)
+    
+    @functools.wraps(callback)
+    async def medido(update, context):
+        inicio = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERROS.inc(handler=nome)
+            raise
+        finally:
+            HANDLER_SEGUNDOS.observar(time.perf_counter() - inicio, handler=nome)
+    
+    medido.metricas_medido = True
+    return medido
+
+def instrumentar_handlers(application):
+    """
+    Mede todos os handlers registrados, inclusive os de ConversationHandler
+    
+    Args:
+        application: Application com os handlers já registrados
+    """
+    from telegram.ext import ConversationHandler
+    
+    pendentes = [handler for grupo in application.handlers.values() for handler in grupo]
+    while pendentes:
+        handler = pendentes.pop()
+        if isinstance(handler, ConversationHandler):
+            pendentes.extend(handler.entry_points)
+            pendentes.extend(handler.fallbacks)
+            for handlers_estado in handler.states.values():
+                pendentes.extend(handlers_estado)
+        else:
+            handler.callback = medir_handler(handler.callback)
+
+def observar_filas(application):
+    """Liga os medidores de fila à Application (lidos a cada exportação)"""
+    FILA_UPDATES.funcao = application.update_queue.qsize
+    processador = application.update_processor
+    if hasattr(processador, 'aguardando'):
+        UPDATES_AGUARDANDO.funcao = lambda: processador.aguardando
+        UPDATES_EM_ANDAMENTO.funcao = lambda: processador.em_andamento
@@ -11,6 +11,7 @@ from datetime import datetime
 from telegram import Bot
 from telegram.error import Conflict, NetworkError
 from config import TELEGRAM_BOT_TOKEN
+from limpar_updates import limpar_estado_bot
 
 # Configuração de logging
 logging.basicConfig(
@@ -93,28 +94,10 @@ class BotMonitor:
         try:
             print("🔧 Resolvendo conflito automaticamente...")
             
-            # Remove webhook
-            await self.bot.delete_webhook(drop_pending_updates=True)
-            print("✅ Webhook removido")
+            # Remove webhook e confirma a fila de updates de uma vez
+            duracao = await limpar_estado_bot(self.bot)
+            print(f"✅ Webhook removido e updates limpos ({duracao * 1000:.0f} ms)")
             
-            # Aguarda
-            await asyncio.sleep(3)
-            
-            # Limpa updates pendentes
-            updates = await self.bot.get_updates(limit=100, timeout=1)
-            if updates:
-                print(f"📨 Limpando {len(updates)} updates pendentes...")
-                for update in updates:
-                    try:
-                        await self.bot.get_updates(
-                            offset=update.update_id + 1, 
-                            limit=1, 
-                            timeout=1
-                        )
-                    except:
-                        pass
-            
-            await asyncio.sleep(2)
             print("✅ Conflito resolvido automaticamente")
             return True
             
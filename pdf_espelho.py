@@ -0,0 +1,383 @@
+"""
+Espelho de pagamento em PDF
+
+Gera o PDF do espelho de um período (rotas, resumo por carro e total) a
+partir de db.get_rotas_por_periodo, sem dependências externas: o arquivo é
+escrito direto no formato PDF com as fontes padrão Helvetica, que todo
+leitor de PDF já tem (sem embutir fontes).
+
+A renderização roda em um pool de processos (PDF_WORKERS), fora do event
+loop; cada processo monta uma única vez o modelo (fontes, métricas e as
+partes fixas da página). FilaPDF junta pedidos idênticos em andamento e
+guarda os arquivos gerados por (período, tenant, versão dos dados), então
+repetir o download é imediato e um pico de pedidos no dia do pagamento não
+trava o bot.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from cache import CacheRelatorios
+from db import data_para_iso, get_rotas_por_periodo, versao_dados, TENANT_PADRAO
+from db_async import ler
+
+# Processos que renderizam PDFs em paralelo
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', 2))
+
+# Cache dos PDFs gerados (quantidade de arquivos e tempo de vida em segundos)
+PDF_CACHE_ITENS = int(os.environ.get('PDF_CACHE_ITENS', 32))
+PDF_CACHE_TTL = float(os.environ.get('PDF_CACHE_TTL', 3600))
+
+# Página A4 em pontos (1/72 pol.)
+LARGURA_PAGINA, ALTURA_PAGINA = 595, 842
+MARGEM = 40
+
+# Tabela de rotas
+Y_TABELA = 690
+ALTURA_LINHA = 15
+LINHAS_POR_PAGINA = 40
+
+# Colunas da tabela: (título, x, alinhamento 'e'squerda ou 'd'ireita)
+COLUNAS = [
+    ('Data', 45, 'e'),
+    ('Rota', 120, 'e'),
+    ('Carro', 280, 'e'),
+    ('Ilha', 380, 'e'),
+    ('Valor', LARGURA_PAGINA - MARGEM - 5, 'd'),
+]
+
+# Larguras (em 1/1000 do tamanho da fonte) dos caracteres da Helvetica
+# usados nos valores alinhados à direita; os demais usam LARGURA_PADRAO
+LARGURAS_HELVETICA = {
+    ' ': 278, ',': 278, '.': 278, '-': 333, '$': 556, 'R': 722,
+    **{digito: 556 for digito in '0123456789'},
+}
+LARGURA_PADRAO = 556
+
+def formatar_valor(valor: float) -> str:
+    """Formata um valor em reais (ex: R$ 1.234,50)"""
+    texto = f"{valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    return f"R$ {texto}"
+
+def _escapar(texto: str) -> str:
+    """Escapa um texto para uma string literal do PDF"""
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+class ModeloEspelho:
+    """
+    Partes fixas do espelho em PDF, montadas uma vez por processo
+    
+    Guarda os objetos das fontes e os trechos da página que não mudam
+    (faixa do título e cabeçalho da tabela); renderizar() só acrescenta o
+    texto variável de cada página.
+    """
+    
+    def __init__(self):
+        self.fontes = [
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        ]
+        
+        topo = ALTURA_PAGINA - MARGEM
+        self.faixa = (
+            f"q 0.93 g {MARGEM} {topo - 44} {LARGURA_PAGINA - 2 * MARGEM} 44 re f Q\n"
+            + self._texto(MARGEM + 10, topo - 28, "Espelho de Pagamento", 'F2', 16)
+            + self._texto(LARGURA_PAGINA - MARGEM - 80, topo - 26, "RoteiroBot", 'F1', 10)
+        )
+        
+        y = Y_TABELA + ALTURA_LINHA
+        self.cabecalho_tabela = ''.join(
+            self._celula(x, y, titulo, alinhamento, 'F2') for titulo, x, alinhamento in COLUNAS
+        ) + self._linha(y - 5)
+    
+    @staticmethod
+    def _texto(x: float, y: float, texto: str, fonte: str = 'F1', tamanho: float = 9) -> str:
+        """Comando que escreve um texto na posição (x, y)"""
+        return f"BT /{fonte} {tamanho} Tf {x:.2f} {y:.2f} Td ({_escapar(texto)}) Tj ET\n"
+    
+    @staticmethod
+    def _largura(texto: str, tamanho: float) -> float:
+        """Largura de um texto na Helvetica, em pontos"""
+        return sum(LARGURAS_HELVETICA.get(c, LARGURA_PADRAO) for c in texto) * tamanho / 1000
+    
+    def _celula(self, x: float, y: float, texto: str, alinhamento: str,
+                fonte: str = 'F1', tamanho: float = 9) -> str:
+        """Texto alinhado à esquerda de x ou à direita de x"""
+        if alinhamento == 'd':
+            x -= self._largura(texto, tamanho)
+        return self._texto(x, y, texto, fonte, tamanho)
+    
+    @staticmethod
+    def _linha(y: float) -> str:
+        """Linha horizontal entre as margens"""
+        return f"0.5 w {MARGEM} {y:.2f} m {LARGURA_PAGINA - MARGEM} {y:.2f} l S\n"
+    
+    def renderizar(self, dados: Dict) -> Tuple[bytes, int, float]:
+        """
+        Gera o PDF do espelho
+        
+        Args:
+            dados: Dicionário com 'rotas' (como em get_rotas_por_periodo),
+                'data_inicial', 'data_final', 'motorista' e 'gerado_em'
+        
+        Returns:
+            Tupla (conteúdo do PDF, quantidade de rotas, total)
+        """
+        rotas = dados['rotas']
+        total = sum(rota['valor'] for rota in rotas)
+        
+        por_carro: Dict[str, List] = {}
+        for rota in rotas:
+            soma = por_carro.setdefault(rota['carro'], [0, 0.0])
+            soma[0] += 1
+            soma[1] += rota['valor']
+        
+        resumo = self._linhas_resumo(por_carro, len(rotas), total)
+        
+        # Divide as rotas em páginas; o resumo vai no fim da última (ou numa página extra)
+        paginas = [rotas[i:i + LINHAS_POR_PAGINA] for i in range(0, len(rotas), LINHAS_POR_PAGINA)] or [[]]
+        if len(paginas[-1]) + len(resumo) > LINHAS_POR_PAGINA:
+            paginas.append([])
+        
+        conteudos = []
+        for numero, linhas in enumerate(paginas, start=1):
+            partes = [self.faixa, self._info(dados), self.cabecalho_tabela]
+            
+            y = Y_TABELA
+            for rota in linhas:
+                partes.append(self._linha_rota(rota, y))
+                y -= ALTURA_LINHA
+            
+            if numero == len(paginas):
+                if not rotas:
+                    partes.append(self._texto(COLUNAS[0][1], y, "Nenhuma rota encontrada neste período."))
+                    y -= ALTURA_LINHA
+                partes.append(self._resumo(resumo, y))
+            
+            partes.append(self._rodape(numero, len(paginas), dados['gerado_em']))
+            conteudos.append(''.join(partes))
+        
+        return self._montar_pdf(conteudos, dados), len(rotas), total
+    
+    def _info(self, dados: Dict) -> str:
+        """Período e motorista, abaixo da faixa do título"""
+        y = ALTURA_PAGINA - MARGEM - 66
+        texto = self._texto(MARGEM, y, f"Período: {dados['data_inicial']} até {dados['data_final']}", 'F1', 10)
+        if dados.get('motorista'):
+            texto += self._texto(MARGEM, y - 14, f"Motorista: {dados['motorista']}", 'F1', 10)
+        return texto
+    
+    def _linha_rota(self, rota: Dict, y: float) -> str:
+        """Uma linha da tabela de rotas"""
+        valores = [
+            rota['data'], rota['rota'], rota['carro'],
+            'Sim' if rota['ilha'] else 'Não', formatar_valor(rota['valor'])
+        ]
+        return ''.join(
+            self._celula(x, y, texto, alinhamento)
+            for (titulo, x, alinhamento), texto in zip(COLUNAS, valores)
+        )
+    
+    @staticmethod
+    def _linhas_resumo(por_carro: Dict[str, List], quantidade: int, total: float) -> List[Tuple]:
+        """Linhas (texto, valor, fonte) do resumo do fim do espelho"""
+        linhas = [('', '', 'F1'), ('Resumo', '', 'F2')]
+        for carro, (quantidade_carro, total_carro) in sorted(por_carro.items()):
+            linhas.append((f"{carro}: {quantidade_carro} rota(s)", formatar_valor(total_carro), 'F1'))
+        linhas.append((f"Total: {quantidade} rota(s)", formatar_valor(total), 'F2'))
+        return linhas
+    
+    def _resumo(self, linhas: List[Tuple], y: float) -> str:
+        """Resumo por carro e total, a partir da altura y"""
+        partes = [self._linha(y + ALTURA_LINHA - 5)]
+        for texto, valor, fonte in linhas:
+            if texto:
+                partes.append(self._texto(COLUNAS[0][1], y, texto, fonte, 10))
+            if valor:
+                partes.append(self._celula(COLUNAS[-1][1], y, valor, 'd', fonte, 10))
+            y -= ALTURA_LINHA
+        return ''.join(partes)
+    
+    def _rodape(self, numero: int, paginas: int, gerado_em: str) -> str:
+        """Data de geração e número da página"""
+        return (
+            self._linha(MARGEM + 12)
+            + self._texto(MARGEM, MARGEM, f"Gerado em {gerado_em}", 'F1', 8)
+            + self._texto(LARGURA_PAGINA - MARGEM - 60, MARGEM, f"Página {numero} de {paginas}", 'F1', 8)
+        )
+    
+    def _montar_pdf(self, conteudos: List[str], dados: Dict) -> bytes:
+        """Monta o arquivo PDF (objetos, tabela xref e trailer)"""
+        # 1: catálogo, 2: páginas, 3-4: fontes, 5: informações; depois página + conteúdo
+        primeira = 6
+        kids = ' '.join(f"{primeira + 2 * i} 0 R" for i in range(len(conteudos)))
+        titulo = _escapar(f"Espelho {dados['data_inicial']} a {dados['data_final']}")
+        
+        objetos = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(conteudos)} >>".encode('ascii'),
+            *self.fontes,
+            f"<< /Title ({titulo}) /Producer (RoteiroBot) >>".encode('cp1252', 'replace'),
+        ]
+        
+        for i, conteudo in enumerate(conteudos):
+            stream = zlib.compress(conteudo.encode('cp1252', 'replace'))
+            objetos.append((
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {LARGURA_PAGINA} {ALTURA_PAGINA}] "
+                f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {primeira + 2 * i + 1} 0 R >>"
+            ).encode('ascii'))
+            objetos.append(
+                f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode('ascii')
+                + stream + b'\nendstream'
+            )
+        
+        saida = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        posicoes = []
+        for numero, objeto in enumerate(objetos, start=1):
+            posicoes.append(len(saida))
+            saida += f"{numero} 0 obj\n".encode('ascii') + objeto + b'\nendobj\n'
+        
+        inicio_xref = len(saida)
+        saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode('ascii')
+        saida += ''.join(f"{posicao:010d} 00000 n \n" for posicao in posicoes).encode('ascii')
+        saida += (
+            f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R /Info 5 0 R >>\n"
+            f"startxref\n{inicio_xref}\n%%EOF\n"
+        ).encode('ascii')
+        
+        return bytes(saida)
+
+# Modelo do processo atual (criado pelo initializer do pool)
+_modelo: Optional[ModeloEspelho] = None
+
+def _inicializar_worker():
+    """Initializer dos processos do pool: monta o modelo uma única vez"""
+    global _modelo
+    _modelo = ModeloEspelho()
+
+def renderizar_pdf(dados: Dict) -> Tuple[bytes, int, float]:
+    """Renderiza um espelho no processo atual (ver ModeloEspelho.renderizar)"""
+    if _modelo is None:
+        _inicializar_worker()
+    return _modelo.renderizar(dados)
+
+class FilaPDF:
+    """
+    Fila de geração de PDFs do espelho
+    
+    Pedidos iguais (mesmo período, tenant e versão dos dados) que chegam
+    enquanto um PDF está sendo gerado aguardam a mesma tarefa em vez de
+    gerá-lo de novo. Os PDFs prontos ficam em cache; como a versão dos dados
+    faz parte da chave, qualquer rota gravada pelo tenant faz o próximo
+    pedido gerar um arquivo novo.
+    """
+    
+    def __init__(self, workers: int = PDF_WORKERS):
+        self.workers = workers
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.em_andamento: Dict[Tuple, asyncio.Task] = {}
+        self.arquivos = CacheRelatorios(max_itens=PDF_CACHE_ITENS, ttl=PDF_CACHE_TTL)
+        self.gerados = 0
+        self.agrupados = 0
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Cria o pool de processos no primeiro uso"""
+        if self.pool is None:
+            # spawn: o processo do bot tem threads (db_async), e fork com threads não é seguro
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_worker
+            )
+        return self.pool
+    
+    async def gerar(self, data_inicial: str, data_final: str, tenant: int = TENANT_PADRAO,
+                    motorista: str = '') -> Dict:
+        """
+        Retorna o PDF do espelho de um período, gerando-o se necessário
+        
+        Args:
+            data_inicial: Data inicial (DD/MM/AAAA)
+            data_final: Data final (DD/MM/AAAA)
+            tenant: Dono das rotas (id do usuário no Telegram)
+            motorista: Nome exibido no espelho
+        
+        Returns:
+            Dicionário com 'conteudo' (bytes do PDF), 'nome', 'quantidade' e 'total'
+        """
+        inicio_iso = data_para_iso(data_inicial)
+        fim_iso = data_para_iso(data_final)
+        # A versão vem do banco: gravações de outros processos também mudam a chave
+        chave = (inicio_iso, fim_iso, tenant, await ler(versao_dados, tenant))
+        
+        arquivo = self.arquivos.get(chave)
+        if arquivo is not None:
+            return arquivo
+        
+        tarefa = self.em_andamento.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.create_task(self._gerar(chave, data_inicial, data_final, tenant, motorista))
+            self.em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda _: self.em_andamento.pop(chave, None))
+        else:
+            self.agrupados += 1
+        
+        # shield: se quem pediu desistir, a geração continua para os outros
+        return await asyncio.shield(tarefa)
+    
+    async def _gerar(self, chave: Tuple, data_inicial: str, data_final: str,
+                     tenant: int, motorista: str) -> Dict:
+        """Lê as rotas (thread leitora) e renderiza o PDF (pool de processos)"""
+        rotas = await ler(get_rotas_por_periodo, data_inicial, data_final, tenant)
+        
+        dados = {
+            'rotas': rotas,
+            'data_inicial': data_inicial,
+            'data_final': data_final,
+            'motorista': motorista,
+            'gerado_em': datetime.now().strftime("%d/%m/%Y %H:%M"),
+        }
+        
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            conteudo, quantidade, total = await loop.run_in_executor(pool, renderizar_pdf, dados)
+        except BrokenProcessPool:
+            # Um processo morreu (ex: falta de memória): o próximo pedido cria outro pool
+            if self.pool is pool:
+                self.pool = None
+            raise
+        
+        arquivo = {
+            'conteudo': conteudo,
+            'nome': f"espelho_{chave[0]}_{chave[1]}.pdf",
+            'quantidade': quantidade,
+            'total': total
+        }
+        self.arquivos.set(chave, arquivo)
+        self.gerados += 1
+        return arquivo
+    
+    def estatisticas(self) -> Dict:
+        """Retorna os contadores da fila"""
+        return {
+            'gerados': self.gerados,
+            'agrupados': self.agrupados,
+            'em_andamento': len(self.em_andamento),
+            'cache': self.arquivos.estatisticas(),
+        }
+    
+    def shutdown(self):
+        """Encerra o pool de processos (usar no encerramento do bot)"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+# Instância usada pelos handlers
+fila_pdf = FilaPDF()
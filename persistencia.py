@@ -0,0 +1,202 @@
+"""
+Persistência do estado do bot (user_data e conversas) no SQLite
+
+Sem persistência, um reinício do processo (bot_24_7, bot_runner, os
+reinícios do app.py) apaga o estado das conversas e o user_data: quem estava
+no meio de um /rota perde o registro sem aviso. PersistenciaSQLite guarda
+esse estado na tabela estado_bot do mesmo banco (ver db._migracao_v7_estado_bot).
+
+- Gravação em lote: as alterações que o python-telegram-bot entrega (a cada
+  PERSISTENCIA_INTERVALO segundos) se acumulam em memória e são gravadas
+  juntas, PERSISTENCIA_ATRASO segundos depois, em uma única transação na
+  thread escritora do db_async. Não há escrita por mensagem.
+- Carregamento preguiçoso: na inicialização só as conversas em andamento
+  são lidas; o user_data de cada usuário é lido na primeira mensagem dele
+  depois do reinício (refresh_user_data).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import pickle
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import db
+import db_async
+
+logger = logging.getLogger(__name__)
+
+# Intervalo (s) em que o python-telegram-bot entrega as alterações à persistência
+PERSISTENCIA_INTERVALO = float(os.environ.get('PERSISTENCIA_INTERVALO', 10))
+
+# Espera (s) antes de gravar, para juntar as alterações em uma transação
+PERSISTENCIA_ATRASO = float(os.environ.get('PERSISTENCIA_ATRASO', 1))
+
+# Estado sem alteração há mais dias que isto é descartado ao carregar
+PERSISTENCIA_MAX_DIAS = int(os.environ.get('PERSISTENCIA_MAX_DIAS', 7))
+
+TIPO_USER_DATA = 'user_data'
+
+class PersistenciaSQLite(BasePersistence):
+    """
+    Persistência do python-telegram-bot na tabela estado_bot
+    
+    Guarda apenas user_data e conversas (chat_data, bot_data e callback_data
+    não são usados pelo bot). Os valores são serializados com pickle.
+    """
+    
+    def __init__(self, update_interval: float = PERSISTENCIA_INTERVALO,
+                 atraso: float = PERSISTENCIA_ATRASO):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.atraso = atraso
+        # Alterações ainda não gravadas: (tipo, chave) -> valor serializado (None apaga)
+        self.pendentes: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self.tarefa: Optional[asyncio.Task] = None
+        # Leitura do user_data de cada usuário já carregado (ou em carregamento)
+        self.carregados: Dict[int, asyncio.Future] = {}
+        self.gravacoes = 0
+        self.itens_gravados = 0
+    
+    # user_data (carregado sob demanda)
+    
+    async def get_user_data(self) -> Dict[int, dict]:
+        """Nada é lido na inicialização; ver refresh_user_data"""
+        return {}
+    
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """Carrega o user_data gravado na primeira mensagem do usuário"""
+        carregamento = self.carregados.get(user_id)
+        if carregamento is None:
+            carregamento = asyncio.ensure_future(self._carregar_user_data(user_id, user_data))
+            self.carregados[user_id] = carregamento
+        try:
+            await carregamento
+        except (Exception, asyncio.CancelledError):
+            # Leitura falhou: a próxima mensagem do usuário tenta de novo
+            if self.carregados.get(user_id) is carregamento:
+                del self.carregados[user_id]
+            raise
+    
+    async def _carregar_user_data(self, user_id: int, user_data: dict):
+        """Lê o user_data de um usuário (se ainda não houver alteração pendente)"""
+        chave = (TIPO_USER_DATA, str(user_id))
+        if chave in self.pendentes:
+            return
+        
+        valor = await db_async.ler(db.ler_estado, *chave)
+        if valor is not None:
+            user_data.update(pickle.loads(valor))
+    
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        """Agenda a gravação do user_data de um usuário"""
+        # Usuário sem refresh (nenhum handler tratou a mensagem): o user_data em
+        # memória não foi carregado e gravá-lo apagaria o que está no banco
+        if user_id not in self.carregados:
+            return
+        self._agendar((TIPO_USER_DATA, str(user_id)), pickle.dumps(data) if data else None)
+    
+    async def drop_user_data(self, user_id: int) -> None:
+        """Agenda a remoção do user_data de um usuário"""
+        self._agendar((TIPO_USER_DATA, str(user_id)), None)
+    
+    # Conversas (carregadas na inicialização: são poucas e pequenas)
+    
+    async def get_conversations(self, name: str) -> Dict:
+        """Retorna as conversas em andamento de um ConversationHandler"""
+        linhas = await db_async.ler(db.ler_estados, f'conversa:{name}', PERSISTENCIA_MAX_DIAS)
+        conversas = {tuple(json.loads(chave)): pickle.loads(valor) for chave, valor in linhas}
+        if conversas:
+            logger.info(f"{len(conversas)} conversa(s) '{name}' restaurada(s)")
+        return conversas
+    
+    async def update_conversation(self, name: str, key: Tuple[int, ...], new_state: Optional[object]) -> None:
+        """Agenda a gravação (ou a remoção, quando termina) do estado de uma conversa"""
+        valor = None if new_state is None else pickle.dumps(new_state)
+        self._agendar((f'conversa:{name}', json.dumps(list(key))), valor)
+    
+    # Gravação em lote
+    
+    def _agendar(self, chave: Tuple[str, str], valor: Optional[bytes]):
+        """Guarda uma alteração e agenda a gravação do lote, se ainda não agendada"""
+        self.pendentes[chave] = valor
+        if self.tarefa is None or self.tarefa.done():
+            self.tarefa = asyncio.get_running_loop().create_task(self._gravar_depois())
+    
+    async def _gravar_depois(self):
+        """Espera o atraso (juntando alterações) e grava o lote"""
+        await asyncio.sleep(self.atraso)
+        # Daqui em diante flush() não cancela: ele grava o que chegar depois,
+        # e a thread escritora (FIFO) mantém a ordem das duas gravações
+        self.tarefa = None
+        await self._gravar()
+    
+    async def _gravar(self):
+        """Grava as alterações pendentes em uma única transação"""
+        if not self.pendentes:
+            return
+        
+        pendentes, self.pendentes = self.pendentes, {}
+        gravar = [(tipo, chave, valor) for (tipo, chave), valor in pendentes.items() if valor is not None]
+        apagar = [(tipo, chave) for (tipo, chave), valor in pendentes.items() if valor is None]
+        
+        try:
+            await db_async.escrever(db.salvar_estados, gravar, apagar)
+            self.gravacoes += 1
+            self.itens_gravados += len(pendentes)
+        except Exception as e:
+            logger.error(f"Erro ao gravar o estado do bot: {e}")
+            # Devolve o lote, sem sobrescrever alterações mais novas
+            for chave, valor in pendentes.items():
+                self.pendentes.setdefault(chave, valor)
+    
+    async def flush(self) -> None:
+        """Grava imediatamente o que estiver pendente (chamado no encerramento)"""
+        if self.tarefa is not None:
+            # Ainda esperando o atraso: cancela e grava agora
+            self.tarefa.cancel()
+            self.tarefa = None
+        await self._gravar()
+    
+    def estatisticas(self) -> Dict:
+        """Retorna os contadores da persistência"""
+        return {
+            'gravacoes': self.gravacoes,
+            'itens_gravados': self.itens_gravados,
+            'pendentes': len(self.pendentes),
+            'usuarios_carregados': len(self.carregados),
+        }
+    
+    # Dados não usados pelo bot
+    
+    async def get_chat_data(self) -> Dict:
+        return {}
+    
+    async def get_bot_data(self) -> Dict:
+        return {}
+    
+    async def get_callback_data(self) -> None:
+        return None
+    
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        pass
+    
+    async def update_bot_data(self, data: Dict) -> None:
+        pass
+    
+    async def update_callback_data(self, data) -> None:
+        pass
+    
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+    
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+    
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
@@ -0,0 +1,184 @@
+"""
+Processamento concorrente de updates, em ordem dentro de cada chat
+
+Por padrão o python-telegram-bot trata um update por vez: um /todas ou
+/espelho demorado de um motorista atrasa a resposta de todos os outros.
+ProcessadorUpdates trata até ATUALIZACOES_SIMULTANEAS updates ao mesmo
+tempo, mas nunca dois do mesmo chat: eles esperam na fila do chat e rodam na
+ordem de chegada, então o estado do ConversationHandler (/rota) continua
+consistente.
+
+A vez de cada update no seu chat é reservada assim que a tarefa dele começa,
+antes de esperar por uma vaga: um update de um chat ocupado entra direto na
+fila do chat (sem ocupar vaga) e só disputa uma vaga depois que o anterior
+do mesmo chat terminou, então um update mais novo nunca passa na frente de
+um antigo.
+
+A entrada é limitada por FilaUpdates, a update_queue da Application: ela
+conta os updates recebidos e ainda não concluídos (na fila, esperando a vez
+do chat ou em execução) e, com FILA_UPDATES_MAX deles, o put() espera. Isso
+segura o getUpdates (polling) ou a resposta ao POST do Telegram (webhook)
+até abrir espaço (backpressure).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Updates tratados ao mesmo tempo (1 = um por vez, como antes)
+ATUALIZACOES_SIMULTANEAS = int(os.environ.get('ATUALIZACOES_SIMULTANEAS', 8))
+
+# Máximo de updates recebidos e ainda não concluídos
+FILA_UPDATES_MAX = int(os.environ.get('FILA_UPDATES_MAX', 100))
+
+def _chave_ordem(update: object) -> Optional[Hashable]:
+    """Chat (ou usuário) cujos updates precisam ser tratados em ordem"""
+    if isinstance(update, Update):
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return ('usuario', update.effective_user.id)
+    return None
+
+class FilaUpdates(asyncio.Queue):
+    """
+    update_queue limitada pelos updates ainda não concluídos
+    
+    A Application chama task_done() quando termina de tratar cada update, então
+    a contagem inclui os que já saíram da fila mas ainda esperam ou executam.
+    """
+    
+    def __init__(self, limite: int = FILA_UPDATES_MAX):
+        super().__init__()
+        self.limite = limite
+        self.pendentes = 0
+        self.vaga = asyncio.Event()
+        self.vaga.set()
+        self.max_pendentes = 0
+        self.cheia = 0
+    
+    def full(self) -> bool:
+        return self.pendentes >= self.limite
+    
+    async def put(self, item: object) -> None:
+        """Coloca o update na fila, esperando enquanto houver limite updates pendentes"""
+        if self.full():
+            self.cheia += 1
+            while self.full():
+                await self.vaga.wait()
+        self.put_nowait(item)
+    
+    def put_nowait(self, item: object) -> None:
+        if self.full():
+            raise asyncio.QueueFull
+        super().put_nowait(item)
+        self.pendentes += 1
+        self.max_pendentes = max(self.max_pendentes, self.pendentes)
+        if self.full():
+            self.vaga.clear()
+    
+    def task_done(self) -> None:
+        super().task_done()
+        self.pendentes -= 1
+        if not self.full():
+            self.vaga.set()
+    
+    def estatisticas(self) -> Dict:
+        """Retorna a ocupação da fila de entrada"""
+        return {
+            'pendentes': self.pendentes,
+            'max_pendentes': self.max_pendentes,
+            'limite': self.limite,
+            'cheia': self.cheia,
+        }
+
+class ProcessadorUpdates(BaseUpdateProcessor):
+    """Processador de updates concorrente com ordem por chat"""
+    
+    def __init__(self, simultaneos: int = ATUALIZACOES_SIMULTANEAS):
+        super().__init__(max_concurrent_updates=simultaneos)
+        # Chat -> término do último update do chat (o próximo espera por ele)
+        self.ultimos: Dict[Hashable, asyncio.Future] = {}
+        self.aguardando = 0
+        self.em_andamento = 0
+        self.processados = 0
+        self.max_aguardando = 0
+        self.espera_total = 0.0
+        self.esperas = 0
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass
+    
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """
+        Reserva a vez do update no seu chat e o executa quando chegar a vez
+        
+        Não há await antes da reserva, então a ordem dentro do chat é a ordem em
+        que a Application criou as tarefas (a ordem de chegada). O update só
+        disputa uma vaga depois que o anterior do mesmo chat terminou.
+        """
+        chave = _chave_ordem(update)
+        if chave is None:
+            await super().process_update(update, coroutine)
+            return
+        
+        anterior = self.ultimos.get(chave)
+        vez = self.ultimos[chave] = asyncio.get_running_loop().create_future()
+        try:
+            if anterior is not None:
+                # Chat ocupado: espera o update anterior do chat, sem ocupar vaga
+                self.aguardando += 1
+                self.max_aguardando = max(self.max_aguardando, self.aguardando)
+                desde = time.monotonic()
+                try:
+                    await asyncio.shield(anterior)
+                finally:
+                    self.aguardando -= 1
+                    self.espera_total += time.monotonic() - desde
+                    self.esperas += 1
+            await super().process_update(update, coroutine)
+        except asyncio.CancelledError:
+            # Encerramento: descarta o update se ele ainda não tinha começado
+            coroutine.close()
+            raise
+        finally:
+            vez.set_result(None)
+            if self.ultimos.get(chave) is vez:
+                del self.ultimos[chave]
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Executa um update (já com vaga, na vez do seu chat)"""
+        await self._executar(coroutine)
+    
+    async def _executar(self, coroutine: Awaitable[Any]):
+        """Executa um update (erros dos handlers já são tratados pela Application)"""
+        self.em_andamento += 1
+        try:
+            await coroutine
+        except Exception as e:
+            logger.error(f"Erro ao processar update: {e}")
+        finally:
+            self.em_andamento -= 1
+            self.processados += 1
+    
+    def estatisticas(self) -> Dict:
+        """Retorna os contadores de processamento"""
+        return {
+            'simultaneos': self.max_concurrent_updates,
+            'em_andamento': self.em_andamento,
+            'chats_ativos': len(self.ultimos),
+            'aguardando': self.aguardando,
+            'max_aguardando': self.max_aguardando,
+            'processados': self.processados,
+            'espera_media_ms': round(self.espera_total / self.esperas * 1000, 1) if self.esperas else 0.0,
+        }
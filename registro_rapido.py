@@ -0,0 +1,146 @@
+"""
+Registro rápido de rotas em texto livre (/r)
+
+Lê uma ou mais rotas escritas em sequência, no formato
+    
+    [data] <rota> <carro> [ilha]
+
+por exemplo "/r hoje P10-AM van ilha G20-PM f". A data vale para as rotas
+seguintes até aparecer outra (padrão: hoje). As expressões regulares e as
+tabelas de palavras são montadas uma vez, no import do módulo; os apelidos
+de carro saem das tarifas cadastradas e são remontados quando elas mudam.
+"""
+
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from tarifas import tabela as tabela_tarifas
+
+# Apelidos de carro da última versão da tabela de tarifas: (versão, {apelido: nome gravado})
+_apelidos: Tuple[Optional[int], Dict[str, str]] = (None, {})
+
+# Palavras aceitas logo depois do carro para dizer se teve entrega em ilha
+ILHA = {
+    'ilha': True, 'i': True, '+ilha': True, 'sim': True, 's': True,
+    'nao': False, 'não': False, 'n': False, '-': False,
+}
+
+# Datas relativas -> dias antes de hoje
+DATAS_RELATIVAS = {'hoje': 0, 'hj': 0, 'ontem': 1, 'anteontem': 2}
+
+# DD/MM, DD/MM/AA ou DD/MM/AAAA (também com '-' ou '.')
+_DATA = re.compile(r'(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{4}|\d{2}))?')
+
+# Separadores entre palavras: espaço, quebra de linha, ';' e ','
+_SEPARADORES = re.compile(r'[\s;,]+')
+
+def apelidos_carros() -> Dict[str, str]:
+    """
+    Retorna os apelidos de carro (minúsculas) -> nome gravado
+    
+    Cada carro com tarifa cadastrada aceita o nome inteiro e qualquer começo
+    dele que não seja também começo de outro carro ("v", "fio", "fiorino").
+    Os apelidos só são remontados quando a tabela de tarifas muda.
+    """
+    global _apelidos
+    versao, apelidos = _apelidos
+    if versao != tabela_tarifas.versao:
+        versao = tabela_tarifas.versao
+        carros = tabela_tarifas.carros()
+        apelidos = {}
+        for carro in carros:
+            for tamanho in range(1, len(carro) + 1):
+                prefixo = carro[:tamanho]
+                if prefixo == carro or not any(o != carro and o.startswith(prefixo) for o in carros):
+                    apelidos[prefixo] = carro.capitalize()
+        _apelidos = (versao, apelidos)
+    return apelidos
+
+class LeitorRotas:
+    """
+    Interpreta rotas escritas em texto livre
+    
+    Guarda a data em vigor entre chamadas de ler(): uma data escrita em uma
+    linha vale para as linhas seguintes.
+    """
+    
+    def __init__(self, hoje: Optional[date] = None):
+        self.hoje = hoje or date.today()
+        self.data = self.hoje.strftime("%d/%m/%Y")
+    
+    def ler(self, texto: str) -> List[Tuple[str, str, str, bool]]:
+        """
+        Lê as rotas de um texto
+        
+        Args:
+            texto: Rotas no formato "[data] <rota> <carro> [ilha]", em sequência
+        
+        Returns:
+            Lista de tuplas (data, rota, carro, ilha), como em insert_rota
+        
+        Raises:
+            ValueError: Se uma data for inválida ou uma rota estiver sem carro
+        """
+        palavras = [p for p in _SEPARADORES.split(texto) if p]
+        carros = apelidos_carros()
+        rotas = []
+        nome: List[str] = []
+        
+        i = 0
+        while i < len(palavras):
+            palavra = palavras[i]
+            chave = palavra.lower()
+            i += 1
+            
+            # Data só no começo de uma rota (o nome pode conter números)
+            if not nome:
+                data = self._data(chave)
+                if data:
+                    self.data = data
+                    continue
+            
+            carro = carros.get(chave)
+            if carro is None:
+                nome.append(palavra)
+                continue
+            
+            if not nome:
+                raise ValueError(f"Carro '{palavra}' sem nome de rota antes")
+            
+            ilha = False
+            if i < len(palavras) and palavras[i].lower() in ILHA:
+                ilha = ILHA[palavras[i].lower()]
+                i += 1
+            
+            rotas.append((self.data, ' '.join(nome), carro, ilha))
+            nome = []
+        
+        if nome:
+            opcoes = ' ou '.join(sorted({c.lower() for c in carros.values()}))
+            raise ValueError(f"Rota '{' '.join(nome)}' sem carro (use {opcoes})")
+        
+        return rotas
+    
+    def _data(self, palavra: str) -> Optional[str]:
+        """Converte uma palavra em data DD/MM/AAAA, ou None se não for data"""
+        if palavra in DATAS_RELATIVAS:
+            return (self.hoje - timedelta(days=DATAS_RELATIVAS[palavra])).strftime("%d/%m/%Y")
+        
+        match = _DATA.fullmatch(palavra)
+        if not match:
+            return None
+        
+        dia, mes, ano = match.groups()
+        try:
+            if ano is None:
+                # Sem ano: a ocorrência mais recente que não está no futuro
+                dia_mes = date(self.hoje.year, int(mes), int(dia))
+                if dia_mes > self.hoje:
+                    dia_mes = date(self.hoje.year - 1, int(mes), int(dia))
+            else:
+                dia_mes = date(int(ano) + (2000 if len(ano) == 2 else 0), int(mes), int(dia))
+        except ValueError:
+            raise ValueError(f"Data inválida: {palavra}")
+        
+        return dia_mes.strftime("%d/%m/%Y")
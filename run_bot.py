@@ -12,6 +12,7 @@ from datetime import datetime
 from telegram import Bot
 from telegram.error import Conflict, NetworkError
 from config import TELEGRAM_BOT_TOKEN
+from limpar_updates import limpar_estado_bot
 
 # Configuração de logging
 logging.basicConfig(
@@ -77,42 +78,8 @@ class UltimateBotRunner:
         print("🧹 Executando limpeza agressiva...")
         
         try:
-            # Remove webhook
-            await self.bot.delete_webhook(drop_pending_updates=True)
-            print("   📡 Webhook removido")
-            
-            # Aguarda
-            await asyncio.sleep(3)
-            
-            # Limpa updates pendentes
-            total_cleaned = 0
-            for attempt in range(3):
-                try:
-                    updates = await self.bot.get_updates(limit=100, timeout=1)
-                    if updates:
-                        print(f"   📨 Tentativa {attempt + 1}: {len(updates)} updates")
-                        for update in updates:
-                            try:
-                                await self.bot.get_updates(
-                                    offset=update.update_id + 1, 
-                                    limit=1, 
-                                    timeout=1
-                                )
-                                total_cleaned += 1
-                            except:
-                                pass
-                        await asyncio.sleep(2)
-                    else:
-                        break
-                except Exception as e:
-                    print(f"   ⚠️ Erro na tentativa {attempt + 1}: {e}")
-                    await asyncio.sleep(2)
-            
-            if total_cleaned > 0:
-                print(f"   ✅ {total_cleaned} updates limpos")
-            
-            await asyncio.sleep(2)
-            print("   ✅ Limpeza agressiva concluída")
+            duracao = await limpar_estado_bot(self.bot)
+            print(f"   ✅ Limpeza agressiva concluída ({duracao * 1000:.0f} ms)")
             
         except Exception as e:
             print(f"   ❌ Erro durante limpeza: {e}")
@@ -122,25 +89,8 @@ class UltimateBotRunner:
         print("🛡️ Executando limpeza preventiva...")
         
         try:
-            # Remove webhook preventivamente
-            await self.bot.delete_webhook(drop_pending_updates=True)
-            
-            # Limpa updates pendentes
-            updates = await self.bot.get_updates(limit=10, timeout=1)
-            if updates:
-                print(f"   📨 {len(updates)} updates preventivos limpos")
-                for update in updates:
-                    try:
-                        await self.bot.get_updates(
-                            offset=update.update_id + 1, 
-                            limit=1, 
-                            timeout=1
-                        )
-                    except:
-                        pass
-            
-            await asyncio.sleep(1)
-            print("   ✅ Limpeza preventiva concluída")
+            duracao = await limpar_estado_bot(self.bot)
+            print(f"   ✅ Limpeza preventiva concluída ({duracao * 1000:.0f} ms)")
             
         except Exception as e:
             print(f"   ⚠️ Erro na limpeza preventiva: {e}")
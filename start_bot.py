@@ -11,6 +11,7 @@ import os
 from telegram import Bot
 from telegram.error import Conflict
 from config import TELEGRAM_BOT_TOKEN
+from limpar_updates import limpar_estado_bot
 
 # Configuração de logging
 logging.basicConfig(
@@ -38,11 +39,8 @@ async def check_and_fix_conflicts():
             print("⚠️ Conflito detectado! Resolvendo...")
             
             # Remove webhook e limpa updates
-            await bot.delete_webhook(drop_pending_updates=True)
-            print("🧹 Webhook removido e updates limpos")
-            
-            # Aguarda um pouco
-            await asyncio.sleep(2)
+            duracao = await limpar_estado_bot(bot)
+            print(f"🧹 Webhook removido e updates limpos ({duracao * 1000:.0f} ms)")
             
             # Verifica novamente
             try:
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tabela de tarifas do RoteiroBot
+
+As tarifas ficam na tabela `tarifas` do banco (ver db.py), uma linha por
+tipo de carro e período de vigência. Este módulo mantém a versão compilada
+em memória usada a cada rota gravada, e a linha de comando para consultar,
+alterar e reaplicar as tarifas.
+
+Uso:
+    python tarifas.py listar
+    python tarifas.py definir <carro> <valor> <adicional_ilha> <inicio> [fim]
+    python tarifas.py reprecificar <data_inicial> <data_final>
+"""
+
+import sys
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# Tarifas gravadas na criação da tabela (valores usados até a versão 3 do schema)
+TARIFAS_PADRAO = [
+    # (carro, valor, adicional_ilha)
+    ('van', 130.0, 10.0),
+    ('fiorino', 110.0, 10.0),
+]
+
+# Limites usados para vigências abertas
+VIGENCIA_MINIMA = '0001-01-01'
+VIGENCIA_MAXIMA = '9999-12-31'
+
+class TabelaTarifas:
+    """
+    Tarifas compiladas em memória
+    
+    Para cada carro guarda as vigências ordenadas pelo início; a busca de uma
+    data é um bisect nessa lista (normalmente com um ou dois itens), sem
+    acesso ao banco. É recompilada por db.recarregar_tarifas() sempre que a
+    tabela muda.
+    
+    As buscas rodam sem lock em várias threads (event loop e threads do
+    db_async): compilar() publica as listas de inícios e de vigências juntas,
+    numa única tupla atribuída de uma vez, e cada busca lê essa tupla uma vez
+    só, então nunca mistura uma versão antiga com uma nova.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (inícios por carro, vigências por carro), sempre trocados juntos
+        self._tabela: Tuple[Dict[str, List[str]], Dict[str, List[Tuple[str, str, float, float]]]] = ({}, {})
+        self.versao = 0
+    
+    def compilar(self, linhas: List[Tuple]):
+        """
+        Substitui as tarifas em memória
+        
+        Args:
+            linhas: Tuplas (carro, valor, adicional_ilha, inicio_iso, fim_iso ou None)
+        """
+        vigencias: Dict[str, List[Tuple[str, str, float, float]]] = {}
+        for carro, valor, adicional, inicio, fim in sorted(linhas, key=lambda l: (l[0], l[3])):
+            vigencias.setdefault(carro.lower(), []).append(
+                (inicio, fim or VIGENCIA_MAXIMA, float(valor), float(adicional))
+            )
+        inicios = {carro: [v[0] for v in lista] for carro, lista in vigencias.items()}
+        
+        with self.lock:
+            self._tabela = (inicios, vigencias)
+            self.versao += 1
+    
+    def buscar(self, carro: str, data_iso: str) -> Optional[Tuple[float, float]]:
+        """Retorna (valor, adicional_ilha) vigentes no dia, ou None se não houver"""
+        return self._buscar(self._tabela, carro.lower(), data_iso)
+    
+    @staticmethod
+    def _buscar(tabela: Tuple, chave: str, data_iso: str) -> Optional[Tuple[float, float]]:
+        inicios, vigencias = tabela
+        lista = inicios.get(chave)
+        if not lista:
+            return None
+        
+        posicao = bisect_right(lista, data_iso) - 1
+        if posicao < 0:
+            return None
+        
+        inicio, fim, valor, adicional = vigencias[chave][posicao]
+        if data_iso > fim:
+            return None
+        return valor, adicional
+    
+    def calcular(self, carro: str, data_iso: str, ilha: bool) -> float:
+        """
+        Calcula o valor de uma rota
+        
+        Raises:
+            ValueError: Se não houver tarifa para o carro na data
+        """
+        tarifa = self.buscar(carro, data_iso)
+        if tarifa is None:
+            raise ValueError(f"Sem tarifa cadastrada para {carro} em {data_iso}")
+        
+        valor, adicional = tarifa
+        return valor + (adicional if ilha else 0.0)
+    
+    def carros(self) -> List[str]:
+        """Retorna os carros (em minúsculas) com alguma tarifa cadastrada, em qualquer data"""
+        return sorted(self._tabela[1])
+    
+    def vigentes(self, data_iso: str) -> Dict[str, Tuple[float, float]]:
+        """Retorna {carro: (valor, adicional_ilha)} das tarifas vigentes no dia"""
+        tabela = self._tabela
+        resultado = {}
+        for carro in tabela[1]:
+            tarifa = self._buscar(tabela, carro, data_iso)
+            if tarifa is not None:
+                resultado[carro] = tarifa
+        return resultado
+
+# Instância usada pelo módulo db
+tabela = TabelaTarifas()
+
+def _formatar_data(data_iso: Optional[str]) -> str:
+    """Converte AAAA-MM-DD para DD/MM/AAAA (vigência aberta vira '...')"""
+    if not data_iso or data_iso in (VIGENCIA_MINIMA, VIGENCIA_MAXIMA):
+        return '...'
+    ano, mes, dia = data_iso.split('-')
+    return f"{dia}/{mes}/{ano}"
+
+def main():
+    """Linha de comando para consultar e alterar as tarifas"""
+    from db import init_database, listar_tarifas, definir_tarifa, reprecificar_periodo
+    
+    init_database()
+    argumentos = sys.argv[1:]
+    comando = argumentos[0] if argumentos else 'listar'
+    
+    try:
+        if comando == 'listar':
+            print("💰 Tarifas cadastradas:")
+            print("=" * 50)
+            for tarifa in listar_tarifas():
+                print(
+                    f"🚐 {tarifa['carro'].capitalize():<8} | R$ {tarifa['valor']:.2f} "
+                    f"(+R$ {tarifa['adicional_ilha']:.2f} ilha) | "
+                    f"{_formatar_data(tarifa['inicio'])} a {_formatar_data(tarifa['fim'])}"
+                )
+        
+        elif comando == 'definir' and len(argumentos) in (5, 6):
+            carro, valor, adicional, inicio = argumentos[1:5]
+            fim = argumentos[5] if len(argumentos) == 6 else None
+            definir_tarifa(carro, float(valor), float(adicional), inicio, fim)
+            print(f"✅ Tarifa de {carro} definida a partir de {inicio}")
+            print(f"💡 Rotas já gravadas mantêm o valor antigo; use: python tarifas.py reprecificar {inicio} <data_final>")
+        
+        elif comando == 'reprecificar' and len(argumentos) == 3:
+            alteradas = reprecificar_periodo(argumentos[1], argumentos[2])
+            print(f"✅ {alteradas} rota(s) reprecificada(s) de {argumentos[1]} a {argumentos[2]}")
+        
+        else:
+            print(__doc__)
+            sys.exit(1)
+    
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
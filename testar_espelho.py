@@ -3,7 +3,7 @@
 Script para testar a função de espelho
 """
 
-from db import get_rotas_por_periodo, get_total_periodo
+from db import get_espelho
 
 def testar_espelho():
     """Testa a função de espelho"""
@@ -17,8 +17,9 @@ def testar_espelho():
     print(f"Período: {data_inicial} até {data_final}")
     
     try:
-        rotas = get_rotas_por_periodo(data_inicial, data_final)
-        total = get_total_periodo(data_inicial, data_final)
+        espelho = get_espelho(data_inicial, data_final)
+        rotas = espelho['rotas']
+        total = espelho['total']
         
         print(f"Rotas encontradas: {len(rotas)}")
         print(f"Total: R$ {total:.2f}")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Script para testar o modo webhook localmente
+
+Simula o Telegram: envia um Update JSON por POST para o servidor do bot
+(iniciado com BOT_MODE=webhook) e verifica o /healthz.
+
+Uso: python testar_webhook.py [url_base] [chat_id]
+"""
+
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from config import WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET
+
+def enviar(url: str, payload: dict = None, secret: str = '') -> tuple:
+    """Faz a requisição e retorna (status, corpo)"""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(url, data=data, method='POST' if data else 'GET')
+    request.add_header('Content-Type', 'application/json')
+    if secret:
+        request.add_header('X-Telegram-Bot-Api-Secret-Token', secret)
+        
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode('utf-8')
+
+def update_comando(texto: str, chat_id: int) -> dict:
+    """Monta um Update do Telegram com uma mensagem de comando"""
+    return {
+        'update_id': int(time.time()),
+        'message': {
+            'message_id': 1,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Teste'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Teste'},
+            'text': texto,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(texto.split()[0])}],
+        },
+    }
+
+def testar_webhook():
+    """Testa o health check, o token secreto e a entrega de um update"""
+    base = sys.argv[1].rstrip('/') if len(sys.argv) > 1 else f"http://127.0.0.1:{WEBHOOK_PORT}"
+    chat_id = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    
+    print("Testando modo webhook...")
+    print("=" * 50)
+    
+    status, corpo = enviar(base + '/healthz')
+    print(f"GET /healthz -> {status} {corpo}")
+    
+    if not WEBHOOK_SECRET:
+        print("⚠️  WEBHOOK_SECRET não definido: o bot gerou um token próprio e vai recusar os POSTs (403)")
+        
+    status, corpo = enviar(base + WEBHOOK_PATH, update_comando('/start', chat_id), 'token-errado')
+    print(f"POST com token errado -> {status} (esperado 403)")
+        
+    inicio = time.perf_counter()
+    status, corpo = enviar(base + WEBHOOK_PATH, update_comando('/start', chat_id), WEBHOOK_SECRET)
+    duracao = (time.perf_counter() - inicio) * 1000
+    print(f"POST /start -> {status} {corpo} ({duracao:.1f} ms)")
+
+if __name__ == "__main__":
+    testar_webhook()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do RoteiroBot sem rede, contra a Bot API falsa (api_falsa.py)
+
+Sobe a Bot API falsa, inicia o bot de verdade (app.py, em outro processo,
+com banco novo numa pasta temporária e TELEGRAM_API_URL apontando para a
+API falsa) e simula milhares de motoristas ao mesmo tempo. Cada motorista
+repete, em cada rodada:
+    
+    /rota -> botão "Hoje" -> digita o nome -> botão do carro
+    /espelho <7 dias>
+    /todas
+
+Cada passo espera a resposta do bot antes do próximo, como uma pessoa. No
+fim sai um JSON com updates/s, latência das respostas (p50/p90/p99) por
+passo e as taxas de erro (timeouts e respostas "❌").
+
+Uso:
+    python teste_carga.py                             # 200 motoristas, 3 rodadas
+    python teste_carga.py --motoristas 2000 --rodadas 5 --rampa 10
+    python teste_carga.py --modo webhook --taxa-429 0.01
+    python teste_carga.py --com-limites               # mantém os limites de envio do Telegram
+
+Sem --com-limites os limites de envio (envio.py) são desligados no bot: o
+teste mede a capacidade do bot, não o limite de 30 mensagens/s do Telegram.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from api_falsa import ApiTelegramFalsa
+from benchmark import percentil
+
+# Token falso usado pelo bot durante o teste
+TOKEN_TESTE = '123456:TESTE-DE-CARGA'
+
+# Primeiro id (chat e usuário) dos motoristas simulados
+PRIMEIRO_MOTORISTA = 100000
+
+# Espera máxima (s) pelo bot pronto e pela resposta de cada passo
+TIMEOUT_INICIO = 60
+TIMEOUT_RESPOSTA = 30
+
+class Estatisticas:
+    """Latências e erros de todos os motoristas"""
+    
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.erros: Counter = Counter()
+        self.enviados = 0
+        self.respondidos = 0
+    
+    def registrar(self, passo: str, latencia: float, texto: str):
+        self.respondidos += 1
+        self.latencias[passo].append(latencia)
+        if texto.startswith('❌'):
+            self.erros[f'{passo}:resposta_erro'] += 1
+    
+    def resumo(self, duracao: float) -> Dict:
+        todas = sorted(l for valores in self.latencias.values() for l in valores)
+        erros = sum(self.erros.values())
+        return {
+            'duracao_s': round(duracao, 2),
+            'updates_enviados': self.enviados,
+            'respostas': self.respondidos,
+            'updates_por_s': round(self.respondidos / duracao, 1) if duracao else 0.0,
+            'latencia_ms': dict(
+                geral=_percentis(todas),
+                **{passo: _percentis(sorted(valores)) for passo, valores in sorted(self.latencias.items())}
+            ),
+            'erros': dict(self.erros),
+            'taxa_erros': round(erros / self.enviados, 4) if self.enviados else 0.0,
+        }
+
+def _percentis(valores: List[float]) -> Dict:
+    return {
+        'n': len(valores),
+        'p50': round(percentil(valores, 50) * 1000, 1),
+        'p90': round(percentil(valores, 90) * 1000, 1),
+        'p99': round(percentil(valores, 99) * 1000, 1),
+        'max': round(valores[-1] * 1000, 1) if valores else 0.0,
+    }
+
+class Motorista:
+    """Um motorista simulado: um chat privado que usa o bot passo a passo"""
+    
+    def __init__(self, api: ApiTelegramFalsa, chat_id: int, estatisticas: Estatisticas,
+                 timeout: float = TIMEOUT_RESPOSTA):
+        self.api = api
+        self.chat_id = chat_id
+        self.estatisticas = estatisticas
+        self.timeout = timeout
+        self.rotas = 0
+    
+    async def _passo(self, passo: str, entregar) -> Optional[dict]:
+        """Entrega um update e espera a resposta do bot (None em caso de timeout)"""
+        self.estatisticas.enviados += 1
+        inicio = time.perf_counter()
+        entregar()
+        try:
+            _, mensagem = await self.api.proxima_resposta(self.chat_id, self.timeout)
+        except asyncio.TimeoutError:
+            self.estatisticas.erros[f'{passo}:timeout'] += 1
+            self.api.descartar_respostas(self.chat_id)
+            return None
+        self.estatisticas.registrar(passo, time.perf_counter() - inicio, mensagem.get('text', ''))
+        return mensagem
+    
+    def _botao(self, mensagem: dict, prefixo: str) -> Optional[str]:
+        """callback_data do primeiro botão da mensagem que começa com prefixo"""
+        for linha in mensagem.get('reply_markup', {}).get('inline_keyboard', []):
+            for botao in linha:
+                if botao.get('callback_data', '').startswith(prefixo):
+                    return botao['callback_data']
+        return None
+    
+    async def _clicar(self, passo: str, mensagem: dict, prefixo: str) -> Optional[dict]:
+        dados = self._botao(mensagem, prefixo)
+        if dados is None:
+            self.estatisticas.erros[f'{passo}:sem_botao'] += 1
+            return None
+        return await self._passo(passo, lambda: self.api.clicar(self.chat_id, mensagem, dados))
+    
+    async def rota(self):
+        """/rota completo, pelos botões, digitando um nome novo"""
+        mensagem = await self._passo('rota', lambda: self.api.enviar_texto(self.chat_id, '/rota'))
+        if mensagem is None:
+            return
+        mensagem = await self._clicar('rota_data', mensagem, 'rota:data:')
+        if mensagem is None:
+            return
+        
+        self.rotas += 1
+        nome = f'P{self.rotas}-{"AM" if self.rotas % 2 else "PM"}'
+        editada = await self._passo('rota_nome', lambda: self.api.enviar_texto(self.chat_id, nome))
+        if editada is None:
+            return
+        # A resposta ao texto é a edição da mensagem do /rota (com os botões de carro)
+        await self._clicar('rota_carro', dict(mensagem, **editada), 'rota:carro:')
+    
+    async def espelho(self):
+        hoje = date.today()
+        inicio = (hoje - timedelta(days=6)).strftime('%d/%m/%Y')
+        comando = f"/espelho {inicio} {hoje.strftime('%d/%m/%Y')}"
+        await self._passo('espelho', lambda: self.api.enviar_texto(self.chat_id, comando))
+    
+    async def todas(self):
+        await self._passo('todas', lambda: self.api.enviar_texto(self.chat_id, '/todas'))
+    
+    async def executar(self, rodadas: int, atraso_inicial: float):
+        await asyncio.sleep(atraso_inicial)
+        for _ in range(rodadas):
+            await self.rota()
+            await self.espelho()
+            await self.todas()
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def _iniciar_bot(args, porta_api: int, pasta: str) -> asyncio.subprocess.Process:
+    """Inicia app.py em outro processo, apontado para a API falsa"""
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_BOT_TOKEN': TOKEN_TESTE,
+        'TELEGRAM_API_URL': f'http://127.0.0.1:{porta_api}',
+        'BOT_MODE': args.modo,
+        'PYTHONUNBUFFERED': '1',
+    })
+    if args.modo == 'webhook':
+        porta_bot = _porta_livre()
+        env.update({
+            'WEBHOOK_URL': f'http://127.0.0.1:{porta_bot}',
+            'WEBHOOK_HOST': '127.0.0.1',
+            'PORT': str(porta_bot),
+        })
+    if not args.com_limites:
+        for variavel in ('ENVIO_GLOBAL_POR_SEGUNDO', 'ENVIO_CHAT_POR_SEGUNDO', 'ENVIO_GRUPO_POR_SEGUNDO'):
+            env[variavel] = '1000000'
+    
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    log = open(os.path.join(pasta, 'bot.log'), 'wb')
+    return await asyncio.create_subprocess_exec(
+        sys.executable, app, cwd=pasta, env=env, stdout=log, stderr=asyncio.subprocess.STDOUT
+    )
+
+async def _parar_bot(processo: asyncio.subprocess.Process):
+    """Pede o encerramento limpo do bot (SIGTERM) e espera"""
+    if processo.returncode is not None:
+        return
+    if os.name == 'nt':
+        processo.terminate()
+    else:
+        processo.send_signal(signal.SIGTERM)
+    try:
+        await asyncio.wait_for(processo.wait(), 30)
+    except asyncio.TimeoutError:
+        processo.kill()
+        await processo.wait()
+
+async def executar(args) -> Dict:
+    """Executa o teste de carga e retorna o resumo"""
+    pasta = tempfile.mkdtemp(prefix='roteirobot-carga-')
+    api = ApiTelegramFalsa(port=_porta_livre(), taxa_429=args.taxa_429, semente=args.semente)
+    await api.start()
+    processo = await _iniciar_bot(args, api.port, pasta)
+    
+    try:
+        pronto = api.webhook_ativo if args.modo == 'webhook' else api.polling_ativo
+        espera = asyncio.ensure_future(pronto.wait())
+        fim = asyncio.ensure_future(processo.wait())
+        await asyncio.wait({espera, fim}, timeout=TIMEOUT_INICIO, return_when=asyncio.FIRST_COMPLETED)
+        fim.cancel()
+        if not espera.done():
+            espera.cancel()
+            with open(os.path.join(pasta, 'bot.log'), encoding='utf-8', errors='replace') as f:
+                print(f.read()[-3000:], file=sys.stderr)
+            raise RuntimeError("O bot não ficou pronto (log acima)")
+        
+        print(f"🚛 {args.motoristas} motoristas, {args.rodadas} rodada(s), modo {args.modo}...", file=sys.stderr)
+        estatisticas = Estatisticas()
+        aleatorio = random.Random(args.semente)
+        motoristas = [
+            Motorista(api, PRIMEIRO_MOTORISTA + i, estatisticas, args.timeout)
+            for i in range(args.motoristas)
+        ]
+        
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            m.executar(args.rodadas, aleatorio.uniform(0, args.rampa)) for m in motoristas
+        ))
+        duracao = time.perf_counter() - inicio
+    finally:
+        await _parar_bot(processo)
+        await api.stop()
+        shutil.rmtree(pasta, ignore_errors=True)
+    
+    resumo = estatisticas.resumo(duracao)
+    resumo['parametros'] = {
+        'motoristas': args.motoristas,
+        'rodadas': args.rodadas,
+        'rampa_s': args.rampa,
+        'modo': args.modo,
+        'com_limites': args.com_limites,
+        'taxa_429': args.taxa_429,
+    }
+    resumo['api'] = api.estatisticas()
+    return resumo
+
+def main(argv=None):
+    """Linha de comando do teste de carga"""
+    parser = argparse.ArgumentParser(description="Teste de carga do RoteiroBot contra a Bot API falsa")
+    parser.add_argument('--motoristas', type=int, default=200, help="motoristas simultâneos")
+    parser.add_argument('--rodadas', type=int, default=3, help="rodadas (/rota, /espelho, /todas) por motorista")
+    parser.add_argument('--rampa', type=float, default=5.0, help="segundos para todos os motoristas começarem")
+    parser.add_argument('--modo', choices=['polling', 'webhook'], default='polling')
+    parser.add_argument('--taxa-429', type=float, default=0.0,
+                        help="fração dos envios que recebe 429 (RetryAfter)")
+    parser.add_argument('--com-limites', action='store_true',
+                        help="mantém os limites de envio do Telegram no bot (envio.py)")
+    parser.add_argument('--timeout', type=float, default=TIMEOUT_RESPOSTA, help="espera máxima por resposta (s)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="grava o JSON do resultado neste arquivo")
+    args = parser.parse_args(argv)
+    
+    resumo = asyncio.run(executar(args))
+    texto = json.dumps(resumo, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    print(texto)
+
+if __name__ == "__main__":
+    main()
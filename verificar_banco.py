@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 """
 Script para verificar o conteúdo do banco de dados
+
+Uso:
+    python verificar_banco.py                        # mostra as rotas
+    python verificar_banco.py --reconstruir-totais   # recalcula totais_diarios
+    python verificar_banco.py --mover-tenant <id>    # passa as rotas do tenant 0 para o usuário <id>
+    python verificar_banco.py --mover-tenant <id> <origem>
 """
 
 import sqlite3
-from db import init_database
+import sys
+from db import init_database, reconstruir_totais, mover_tenant
 
 def verificar_banco():
     """Verifica o conteúdo do banco de dados"""
@@ -36,5 +43,31 @@ def verificar_banco():
     
     conn.close()
 
+def reparar_totais():
+    """Recalcula a tabela de totais diários a partir das rotas"""
+    init_database()
+    
+    linhas = reconstruir_totais()
+    print(f"✅ Totais diários reconstruídos: {linhas} linha(s) (dia × carro × ilha)")
+
+def mover_rotas(destino: int, origem: int = 0):
+    """Passa as rotas do tenant de origem (padrão 0) para o usuário de destino"""
+    init_database()
+    
+    resultado = mover_tenant(destino, origem)
+    print(f"✅ {resultado['movidas']} rota(s) movidas do tenant {origem} para o {destino}")
+    if resultado['mantidas']:
+        print(f"⚠️ {resultado['mantidas']} rota(s) ficaram no tenant {origem}: o {destino} já tinha a mesma rota na mesma data")
+
 if __name__ == "__main__":
-    verificar_banco()
+    argumentos = sys.argv[1:]
+    if '--reconstruir-totais' in argumentos:
+        reparar_totais()
+    elif '--mover-tenant' in argumentos:
+        valores = argumentos[argumentos.index('--mover-tenant') + 1:]
+        if not valores:
+            print("❌ Uso: python verificar_banco.py --mover-tenant <id_do_usuario> [tenant_origem]")
+            sys.exit(1)
+        mover_rotas(int(valores[0]), int(valores[1]) if len(valores) > 1 else 0)
+    else:
+        verificar_banco()
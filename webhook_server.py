@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP assíncrono embutido para o modo webhook do RoteiroBot
+
+Recebe os updates que o Telegram envia por POST, verifica o token
+secreto e os entrega na fila de updates da Application. Na mesma porta
+responde GET /healthz para o health check da plataforma (Render/Railway) e
+GET /metrics com as métricas no formato do Prometheus (ver metricas.py).
+No modo polling o mesmo servidor pode rodar sem caminho de updates, só com
+/healthz e /metrics.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+from typing import Dict, Optional, Tuple, Union
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo aceito para o corpo de uma requisição
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXTO = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    429: 'Too Many Requests',
+}
+
+class WebhookServer:
+    """Servidor HTTP mínimo (asyncio puro) para updates do Telegram"""
+    
+    def __init__(self, application: Application, path: Optional[str], secret_token: str = '',
+                 host: str = '0.0.0.0', port: int = 8080):
+        self.application = application
+        # Sem caminho (polling): não recebe updates, só /healthz e /metrics
+        self.path = path if path is None or path.startswith('/') else '/' + path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.updates_recebidos = 0
+        
+    async def start(self):
+        """Abre a porta e começa a aceitar conexões"""
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Servidor webhook ouvindo em {self.host}:{self.port}{self.path or '/metrics'}")
+        
+    async def stop(self):
+        """Fecha a porta e aguarda as conexões abertas"""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Atende as requisições de uma conexão (com keep-alive)"""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                    
+                method, path, headers, body = request
+                status, payload = await self._route(method, path, headers, body)
+                
+                # Corpo grande demais não foi lido: a conexão não pode ser reaproveitada
+                keep_alive = headers.get('connection', '').lower() != 'close' and body is not None
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.warning(f"Erro na conexão do webhook: {e}")
+        finally:
+            writer.close()
+            
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Lê uma requisição HTTP/1.1; retorna None quando o cliente fecha"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+            
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return None
+            
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+            
+        length = int(headers.get('content-length', 0) or 0)
+        if length > MAX_BODY_BYTES:
+            return method, target, headers, None
+        body = await reader.readexactly(length) if length else b''
+        
+        return method, target.split('?', 1)[0], headers, body
+        
+    async def _route(self, method: str, path: str, headers: Dict[str, str],
+                     body: Optional[bytes]) -> Tuple[int, Union[dict, str]]:
+        """Decide a resposta de uma requisição"""
+        if path == '/metrics':
+            if method not in ('GET', 'HEAD'):
+                return 405, {'ok': False}
+            from metricas import registro
+            return 200, registro.exportar()
+            
+        if path == '/healthz':
+            if method not in ('GET', 'HEAD'):
+                return 405, {'ok': False}
+            from cache import relatorios
+            resposta = {
+                'ok': True,
+                'updates': self.updates_recebidos,
+                'cache': relatorios.estatisticas()
+            }
+            processador = self.application.update_processor
+            if hasattr(processador, 'estatisticas'):
+                resposta['processamento'] = processador.estatisticas()
+            fila = self.application.update_queue
+            if hasattr(fila, 'estatisticas'):
+                resposta['fila'] = fila.estatisticas()
+            limitador = self.application.bot.rate_limiter
+            if hasattr(limitador, 'estatisticas'):
+                resposta['envio'] = limitador.estatisticas()
+            return 200, resposta
+            
+        if self.path is None or path != self.path:
+            return 404, {'ok': False}
+            
+        if method != 'POST':
+            return 405, {'ok': False}
+            
+        if self.secret_token:
+            recebido = headers.get('x-telegram-bot-api-secret-token', '')
+            if not hmac.compare_digest(recebido, self.secret_token):
+                logger.warning("Webhook recebido com token secreto inválido")
+                return 403, {'ok': False}
+                
+        if body is None:
+            return 413, {'ok': False}
+            
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            logger.warning(f"Update inválido recebido no webhook: {e}")
+            return 400, {'ok': False}
+            
+        await self.application.update_queue.put(update)
+        self.updates_recebidos += 1
+        return 200, {'ok': True}
+        
+    def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Union[dict, str], keep_alive: bool):
+        """Escreve a resposta HTTP com corpo JSON (ou texto, para /metrics)"""
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = 'application/json'
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXTO.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+async def run_webhook(application: Application, webhook_url: str, path: str, secret_token: str = '',
+                      host: str = '0.0.0.0', port: int = 8080, stop_event: Optional[asyncio.Event] = None):
+    """
+    Executa a Application recebendo updates por webhook até stop_event ser sinalizado
+    
+    Args:
+        application: Application já configurada com os handlers
+        webhook_url: URL pública base (sem o caminho); vazia para não registrar o webhook
+        path: Caminho que recebe os updates
+        secret_token: Token secreto exigido no header do Telegram (vazio: gera um
+            token aleatório para esta execução)
+        host: Endereço do servidor local
+        port: Porta do servidor local
+        stop_event: Evento que encerra o servidor (padrão: roda para sempre)
+    """
+    stop_event = stop_event or asyncio.Event()
+    if not secret_token:
+        # Sem token qualquer um poderia enviar updates forjados em nome de um motorista
+        secret_token = secrets.token_urlsafe(32)
+        logger.warning("WEBHOOK_SECRET não definido: usando um token secreto gerado para esta execução")
+    server = WebhookServer(application, path, secret_token, host, port)
+    
+    async with application:
+        if webhook_url:
+            await application.bot.set_webhook(
+                url=webhook_url + server.path,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Webhook registrado em {webhook_url}{server.path}")
+            
+        await application.start()
+        await server.start()
+        try:
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            await application.stop()